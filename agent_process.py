@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+VLM代理子进程入口 - 在独立进程中执行任务，避免与GUI线程争用GIL
+"""
+
+from model_manager import get_model_manager
+from vlm_agent import VLMAgent
+
+
+def run(task_description, task_id, status_queue, pause_event, config_path="model_config.json", max_steps=50):
+    """
+    在子进程中执行任务，并通过队列向GUI进程回传消息
+    消息格式：
+    - ("log", message): 代理的状态输出
+    - ("callback", msg_type, task_id, message): 代理的状态回调（如 task_paused）
+    - ("task_complete", task_id, status): 任务结束，之后不再有消息
+    :param task_description: 任务描述
+    :param task_id: GUI中的任务ID，随消息一起回传
+    :param status_queue: multiprocessing.Queue，用于向GUI进程回传消息
+    :param pause_event: multiprocessing.Event，由GUI的继续按钮触发
+    :param config_path: 模型配置文件路径
+    :param max_steps: 最大执行步骤数
+    """
+    try:
+        # 先用指定路径初始化全局模型管理器，VLMAgent会复用该实例
+        get_model_manager(config_path)
+        agent = VLMAgent()
+
+        # 设置回调和事件
+        agent.step_update_callback = lambda msg_type, tid, message=None: status_queue.put(("callback", msg_type, tid, message))
+        agent.log_callback = lambda message: status_queue.put(("log", message))
+        agent.pause_event = pause_event
+        agent.current_task_id = task_id
+        agent.is_paused = False
+
+        agent.run_task(task_description, max_steps=max_steps)
+        status_queue.put(("task_complete", task_id, "完成"))
+    except Exception as e:
+        status_queue.put(("task_complete", task_id, f"失败: {str(e)}"))
@@ -5,23 +5,63 @@ VLM 电脑操作工具 - 极简GUI界面
 """
 
 import os
+import re
 import sys
 import time
-import json
+import asyncio
 import threading
 import queue
+import multiprocessing
+import collections
 import tkinter as tk
 from tkinter import ttk
 import argparse
-from openai import OpenAI
 
 # 添加当前目录到Python路径
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from vlm_agent import VLMAgent
+import agent_process
 from model_manager import get_model_manager
+from utils import step_utils
+from utils.step_utils import ACTION_KEYWORDS, STEP_INDICATORS
+
+# 模型批量返回描述时可能附带的序号前缀，如 "[1] "、"1. "、"2、"
+_STEP_NUMBER_PREFIX = re.compile(r"^(?:\[\d+\]|\d+[.、:：)）])\s*")
+
+# 步骤提取去重：记录的消息指纹数量上限，以及相同消息的跳过时间窗口（秒）
+_RECENT_FP_MAXSIZE = 128
+_RECENT_FP_TTL = 5.0
+
+# 步骤提取时每条消息允许的输出token数（每条描述不超过20个字）
+_EXTRACT_TOKENS_PER_MESSAGE = 30
+
+# 任务列表中保留的步骤行数上限，超出后删除最早的步骤行
+_MAX_STEP_ROWS = 500
+
+# 主线程处理状态队列的间隔（毫秒），其他线程只向队列投递消息，不直接调用Tk
+# 刚处理过消息时很可能还有后续消息，按较短间隔检查；队列为空时退回较长间隔，空闲时不频繁唤醒
+_STATUS_POLL_ACTIVE_MS = 50
+_STATUS_POLL_IDLE_MS = 500
+
+# 步骤提取前的快速预过滤：消息开头不含任何动作词/步骤指示词的前两个字符时直接跳过
+_KW_BIGRAMS = frozenset(keyword[:2].lower() for keyword in ACTION_KEYWORDS + STEP_INDICATORS)
+_KW_BIGRAM_RE = re.compile("|".join(re.escape(bigram) for bigram in sorted(_KW_BIGRAMS)))
+_PREFILTER_SPAN = 256
+
+# 代理的流程输出，不参与步骤提取
+_SKIP_PREFIXES = ("--- 步骤", "检测到工具调用", "工具执行结果")
+
 
 class MinimalGUI:
+    __slots__ = (
+        "root", "api_key", "task_queue", "status_queue", "current_task", "is_running", "task_steps",
+        "current_task_id", "current_pause_event", "pause_event",
+        "main_frame", "task_tree", "continue_button",
+        "pause_frame", "pause_title", "pause_message", "guide_list", "pause_continue_button", "_original_geometry",
+        "_step_rows", "_extract_queue", "_extract_worker", "_recent_fps",
+        "_clf_client", "_clf_model_name", "_aio_loop", "_hms_cache",
+    )
+    
     def __init__(self, root):
         self.root = root
         self.root.title("任务列表")
@@ -31,12 +71,22 @@ class MinimalGUI:
         
         # 初始化变量
         self.api_key = None
-        self.agent = None
         self.task_queue = queue.Queue()
         self.status_queue = queue.Queue()
         self.current_task = None
         self.is_running = False
         self.task_steps = {}  # 存储每个任务的步骤ID列表
+        self._step_rows = collections.deque()  # 按插入顺序记录步骤行 (step_id, task_id)
+        
+        # 步骤信息提取：日志消息先入队，由单个后台线程合并后批量调用模型
+        self._extract_queue = queue.Queue()
+        self._recent_fps = collections.OrderedDict()  # 最近提取过的消息指纹 -> 提取时间
+        self._clf_client = None
+        self._clf_model_name = None
+        self._aio_loop = None  # 分类模型异步客户端所在的事件循环
+        self._hms_cache = (None, "")  # 最近一次格式化的时间 (秒, "HH:MM:SS")
+        self._extract_worker = threading.Thread(target=self._run_extract_worker, daemon=True)
+        self._extract_worker.start()
         
         # 创建极简界面
         self.create_minimal_widgets()
@@ -103,8 +153,8 @@ class MinimalGUI:
         
         # 当前任务ID
         self.current_task_id = None
-        # 暂停事件
-        self.pause_event = threading.Event()
+        # 暂停事件（跨进程共享给代理子进程）
+        self.pause_event = multiprocessing.Event()
         
         # 创建暂停界面（初始隐藏）
         self.create_pause_frame()
@@ -184,24 +234,26 @@ class MinimalGUI:
     def step_update_callback(self, msg_type, task_id, message=None):
         """处理来自VLMAgent的状态更新回调"""
         if msg_type == "task_paused":
-            self.status_queue.put(("task_paused", task_id, message or ""))
-            self.root.after(0, lambda: self.show_pause_interface(message or "需要用户操作"))
+            self._post_status(("task_paused", task_id, message or ""))
+            self._post_status(("show_pause", message or "需要用户操作"))
+        
+    def _on_agent_log(self, message):
+        """处理来自VLMAgent的状态输出，将模型响应交给步骤提取队列"""
+        if not message or message.startswith(_SKIP_PREFIXES):
+            return
+        # 不可能包含关键步骤的消息不进入提取队列，省去后续的模型调用
+        if not _KW_BIGRAM_RE.search(message[:_PREFILTER_SPAN].lower()):
+            return
+        # 交给后台线程批量提取关键步骤信息
+        self.extract_and_send_step(self.current_task_id, message, self.current_task)
         
     def load_api_key(self):
-        """从 model_config.json 加载配置"""
-        config_file = "model_config.json"
-        if os.path.exists(config_file):
-            try:
-                with open(config_file, "r", encoding="utf-8") as f:
-                    config = json.load(f)
-                    # 从 vision_model 或 classification_model 获取 api_key
-                    vision_config = config.get("vision_model", {})
-                    classification_config = config.get("classification_model", {})
-                    api_key = vision_config.get("apikey") or classification_config.get("apikey")
-                    if api_key:
-                        self.api_key = api_key
-            except Exception:
-                pass
+        """从模型管理器加载API密钥（优先 vision_model，其次 classification_model）"""
+        try:
+            model_manager = get_model_manager()
+            self.api_key = model_manager.get_api_key("vision_model") or model_manager.get_api_key("classification_model")
+        except Exception:
+            pass
     
     def continue_task(self):
         """继续执行暂停的任务"""
@@ -217,145 +269,150 @@ class MinimalGUI:
         
         # 更新任务状态为执行中
         if self.current_task_id:
-            values = list(self.task_tree.item(self.current_task_id)["values"])
-            values[1] = "执行中"
-            self.task_tree.item(self.current_task_id, values=values)
+            self.task_tree.set(self.current_task_id, "状态", "执行中")
     
     def notify_paused(self, task_id, reason):
         """通知任务已暂停"""
-        self.status_queue.put(("task_paused", task_id, reason))
+        self._post_status(("task_paused", task_id, reason))
     
     def extract_and_send_step(self, task_id, message, task_description):
-        """提取关键步骤信息并添加到GUI"""
-        step_info = self.extract_step_info_with_ai(message, task_description)
-        if step_info:
-            self.status_queue.put(("model_response", task_id, step_info))
+        """将消息加入提取队列，由后台线程批量提取关键步骤信息并添加到GUI"""
+        # 短时间内重复出现的消息不再提取，避免多余的模型调用
+        fingerprint = hash(message[:128])
+        now = time.monotonic()
+        last_seen = self._recent_fps.get(fingerprint)
+        if last_seen is not None and now - last_seen < _RECENT_FP_TTL:
+            return
+        
+        self._recent_fps[fingerprint] = now
+        self._recent_fps.move_to_end(fingerprint)
+        if len(self._recent_fps) > _RECENT_FP_MAXSIZE:
+            self._recent_fps.popitem(last=False)
+        
+        self._extract_queue.put((task_id, message, task_description))
     
-    def extract_step_info_with_ai(self, message, task_description):
-        """使用AI提取关键步骤信息"""
-        try:
+    def _run_extract_worker(self):
+        """步骤信息提取工作线程：合并200ms内到达的消息，一次API调用完成提取"""
+        while True:
+            batch = [self._extract_queue.get()]
+            while True:
+                try:
+                    batch.append(self._extract_queue.get(timeout=0.2))
+                except queue.Empty:
+                    break
+            
+            # 按任务分组，保持消息原有顺序
+            groups = {}
+            for task_id, message, task_description in batch:
+                if task_id not in groups:
+                    groups[task_id] = (task_description, [])
+                groups[task_id][1].append(message)
+            
+            for task_id, (task_description, messages) in groups.items():
+                for step_info in self.extract_step_info_with_ai(messages, task_description):
+                    # 时间戳在工作线程中格式化，GUI线程直接使用
+                    self._post_status(("model_response", task_id, step_info, self._now_hms()))
+    
+    def _now_hms(self):
+        """
+        获取当前时间的 "HH:MM:SS" 字符串，同一秒内复用上次的格式化结果
+        :return: 时间字符串
+        """
+        now = int(time.time())
+        cached_sec, formatted = self._hms_cache
+        if now != cached_sec:
+            formatted = time.strftime("%H:%M:%S", time.localtime(now))
+            self._hms_cache = (now, formatted)
+        return formatted
+    
+    def _ensure_classification_client(self):
+        """
+        获取分类模型的异步客户端和模型名称，首次调用时解析并缓存在实例上
+        同时启动运行该客户端的后台事件循环
+        :return: (client, model_name)
+        """
+        if self._clf_client is None:
             # 获取模型管理器
             model_manager = get_model_manager()
             
-            # 获取分类模型客户端
-            client = model_manager.get_client("classification_model")
-            if not client:
-                # 如果客户端未初始化，手动创建
-                classification_config = model_manager.get_model_config("classification_model")
-                api_key = model_manager.get_api_key("classification_model")
-                base_url = classification_config.get("base_url") if classification_config else "https://dashscope.aliyuncs.com/compatible-mode/v1"
-                client = OpenAI(
-                    api_key=api_key,
-                    base_url=base_url
-                )
+            # 获取分类模型异步客户端，未初始化时由模型管理器创建并缓存
+            # 先创建客户端，创建失败时不会启动事件循环，下次调用也不会重复启动
+            client = model_manager.ensure_async_client("classification_model")
             
             # 获取模型名称
             model_name = model_manager.get_model_name("classification_model")
             
-            # 构造提示词 - 简化版
+            # 所有提取请求都提交到同一个事件循环，共享异步客户端的连接池
+            if self._aio_loop is None:
+                self._aio_loop = asyncio.new_event_loop()
+                threading.Thread(target=self._aio_loop.run_forever, daemon=True).start()
+            
+            self._clf_model_name = model_name
+            self._clf_client = client
+        return self._clf_client, self._clf_model_name
+    
+    def extract_step_info_with_ai(self, messages, task_description):
+        """
+        使用AI批量提取关键步骤信息
+        :param messages: AI响应消息列表
+        :param task_description: 任务描述
+        :return: 步骤信息列表（每条非空描述一项）
+        """
+        try:
+            client, model_name = self._ensure_classification_client()
+            
+            numbered_messages = "\n".join(f"[{i}] {message}" for i, message in enumerate(messages, 1))
+            
+            # 构造提示词 - 多条消息合并为一次请求
             prompt = f"""
 任务：{task_description}
 
-请用一句话描述当前AI正在做什么，不超过20个字。
-只返回描述，不要返回任务完成状态。
+下面共有{len(messages)}条AI响应，请按顺序为每条响应用一句话描述当前AI正在做什么，每句不超过20个字。
+每条描述单独占一行，只返回描述，不要返回任务完成状态。
+如果某条响应没有可描述的操作，该行返回"无"。
 
 AI响应：
-{message}
+{numbered_messages}
 
 当前执行：
 """
             
-            # 调用API
-            response = client.chat.completions.create(
-                model=model_name,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
+            # 调用API，在后台事件循环中执行并等待结果
+            future = asyncio.run_coroutine_threadsafe(
+                client.chat.completions.create(
+                    model=model_name,
+                    messages=[
+                        {"role": "user", "content": prompt}
+                    ],
+                    # 限制输出长度，响应时间主要取决于生成的token数
+                    max_tokens=_EXTRACT_TOKENS_PER_MESSAGE * len(messages),
+                    temperature=0
+                ),
+                self._aio_loop
             )
+            response = future.result()
             
-            # 提取响应
-            step_info = response.choices[0].message.content.strip()
+            # 提取响应，每行对应一条步骤信息
+            content = response.choices[0].message.content or ""
+            step_infos = []
+            for line in content.splitlines():
+                step_info = _STEP_NUMBER_PREFIX.sub("", line.strip())
+                # 如果AI返回"无"或空内容，跳过该行
+                if not step_info or step_info == "无" or step_info.lower() == "none":
+                    continue
+                step_infos.append(step_info)
             
-            # 如果AI返回"无"或空内容，返回None
-            if not step_info or step_info == "无" or step_info.lower() == "none":
-                return None
-                
             # 返回提取的步骤信息
-            return step_info
+            return step_infos
             
         except Exception as e:
-            # 如果API调用失败，返回None
+            # 如果API调用失败，返回空列表
             print(f"提取步骤信息失败: {e}")
-            return None
+            return []
     
     def extract_step_info(self, message):
         """从模型响应中提取关键步骤信息"""
-        # 转换为小写便于匹配
-        lower_msg = message.lower()
-        
-        # 定义关键动作关键词
-        action_keywords = [
-            "打开", "搜索", "点击", "输入", "关闭", "切换", "启动", "运行", "执行", "找到", "选择", "确认", "访问", "进入", "导航",
-            "open", "search", "click", "type", "close", "switch", "start", "run", "execute", "find", "select", "confirm", "visit", "enter", "navigate"
-        ]
-        
-        # 定义步骤指示词
-        step_indicators = [
-            "首先", "然后", "接下来", "之后", "最后", "现在", "我需要", "我将", "第一步", "第二步", "第三步",
-            "first", "then", "next", "after", "finally", "now", "i need to", "i will", "step 1", "step 2", "step 3"
-        ]
-        
-        # 定义目标关键词
-        target_keywords = [
-            "浏览器", "网页", "网站", "搜索", "链接", "地址", "url", "tab", "窗口",
-            "browser", "web", "website", "search", "link", "address", "url", "tab", "window"
-        ]
-        
-        # 检查是否包含步骤指示词
-        for indicator in step_indicators:
-            if indicator in lower_msg:
-                # 提取包含指示词的句子
-                sentences = message.split("。")
-                for sentence in sentences:
-                    if indicator in sentence.lower():
-                        # 清理并返回步骤信息
-                        step = sentence.strip()
-                        if step and len(step) > 5:  # 确保有意义的步骤
-                            return step[:50] + "..." if len(step) > 50 else step
-        
-        # 检查是否包含动作+目标的组合
-        for action in action_keywords:
-            if action in lower_msg:
-                for target in target_keywords:
-                    if target in lower_msg:
-                        # 提取包含动作和目标的句子
-                        sentences = message.split("。")
-                        for sentence in sentences:
-                            if action in sentence.lower() and target in sentence.lower():
-                                # 清理并返回步骤信息
-                                step = sentence.strip()
-                                if step and len(step) > 5:
-                                    return step[:50] + "..." if len(step) > 50 else step
-        
-        # 检查是否包含关键动作
-        for keyword in action_keywords:
-            if keyword in lower_msg:
-                # 提取包含关键词的句子或短语
-                sentences = message.split("。")
-                for sentence in sentences:
-                    if keyword in sentence.lower():
-                        # 清理并返回步骤信息
-                        step = sentence.strip()
-                        if step and len(step) > 5:  # 确保有意义的步骤
-                            return step[:50] + "..." if len(step) > 50 else step
-        
-        # 如果没有找到明确的动作，尝试提取第一句话
-        sentences = message.split("。")
-        if sentences and len(sentences[0].strip()) > 10:
-            first_sentence = sentences[0].strip()
-            return first_sentence[:50] + "..." if len(first_sentence) > 50 else first_sentence
-        
-        return None
+        return step_utils.extract_step_info(message)
     
     def execute_task(self, task_description):
         """执行任务"""
@@ -382,79 +439,106 @@ AI响应：
                     # 队列为空，退出工作线程
                     break
                 
-                # 添加任务到树形视图
-                task_id = self.task_tree.insert("", tk.END, values=(
-                    time.strftime("%H:%M:%S"),
-                    "执行中",
-                    task_description[:30] + "..." if len(task_description) > 30 else task_description
-                ))
+                # 添加任务到树形视图：由主线程创建任务行，通过应答队列取回行ID
+                reply = queue.Queue(maxsize=1)
+                self._post_status(("task_started", task_description, reply))
+                task_id = reply.get()
+                if task_id is None:
+                    continue
                 
-                # 存储当前任务ID
+                # 存储当前任务ID和描述
                 self.current_task_id = task_id
+                self.current_task = task_description
                 # 存储当前任务的步骤ID列表
                 self.task_steps[task_id] = [task_id]
                 # 存储当前任务的暂停事件
                 self.current_pause_event = self.pause_event
                 
                 try:
-                    # 初始化代理
-                    if not self.agent:
-                        self.agent = VLMAgent()  # 不再需要传递api_key，因为VLMAgent会从配置中加载
-                    
-                    # 设置回调和事件
-                    self.agent.step_update_callback = self.step_update_callback
-                    self.agent.pause_event = self.pause_event
-                    self.agent.current_task_id = task_id
-                    self.agent.is_paused = False
-                    
-                    # 使用更安全的方法捕获print输出
-                    import builtins
-                    original_print = builtins.print
-                    
-                    def gui_print(*args, **kwargs):
-                        # 在控制台输出
-                        original_print(*args, **kwargs)
-                        
-                        # 将模型响应发送到GUI
-                        message = " ".join(map(str, args))
-                        if message and not message.startswith("--- 步骤") and not message.startswith("检测到工具调用") and not message.startswith("工具执行结果"):
-                            # 使用AI提取关键步骤信息
-                            threading.Thread(target=self.extract_and_send_step, args=(task_id, message, task_description), daemon=True).start()
-                    
-                    # 临时替换print函数
-                    builtins.print = gui_print
+                    # 在子进程中执行任务，当前线程负责转发子进程消息
+                    agent_queue = multiprocessing.Queue()
+                    process = multiprocessing.Process(
+                        target=agent_process.run,
+                        args=(task_description, task_id, agent_queue, self.pause_event),
+                        daemon=True
+                    )
+                    process.start()
+                    self._relay_agent_messages(process, agent_queue, task_id)
+                    process.join()
                     
-                    try:
-                        self.agent.run_task(task_description, max_steps=50)
-                        self.status_queue.put(("task_complete", task_id, "完成"))
-                    except Exception as e:
-                        self.status_queue.put(("task_complete", task_id, f"失败: {str(e)}"))
-                    finally:
-                        # 恢复原始print方法
-                        builtins.print = original_print
-                        
                 except Exception as e:
-                    self.status_queue.put(("task_complete", task_id, f"失败: {str(e)}"))
+                    self._post_status(("task_complete", task_id, f"失败: {str(e)}"))
                 
             except Exception:
                 break
         
         self.is_running = False
     
+    def _relay_agent_messages(self, process, agent_queue, task_id):
+        """转发代理子进程的消息，直到任务结束或子进程退出"""
+        process_exited = False
+        while True:
+            try:
+                msg_type, *args = agent_queue.get(timeout=0.5)
+            except queue.Empty:
+                if process.is_alive():
+                    continue
+                if process_exited:
+                    # 子进程已退出且没有留下结束消息
+                    self._post_status(("task_complete", task_id, f"失败: 代理进程异常退出({process.exitcode})"))
+                    return
+                # 再等待一轮，确保子进程退出前写入的消息已全部读取
+                process_exited = True
+                continue
+            
+            if msg_type == "log":
+                self._on_agent_log(*args)
+            elif msg_type == "callback":
+                self.step_update_callback(*args)
+            elif msg_type == "task_complete":
+                self._post_status((msg_type, *args))
+                return
+    
+    def _post_status(self, msg):
+        """投递状态消息，可在任意线程调用；Tk不是线程安全的，消息由主线程定时处理"""
+        self.status_queue.put(msg)
+    
     def update_status(self):
-        """更新状态"""
+        """在主线程中定时处理状态队列，有消息时缩短下次检查的间隔"""
+        handled = self._drain_status()
+        
+        self.root.after(_STATUS_POLL_ACTIVE_MS if handled else _STATUS_POLL_IDLE_MS, self.update_status)
+    
+    def _drain_status(self):
+        """
+        处理状态队列中的所有消息
+        :return: 是否处理了消息
+        """
+        handled = False
         try:
             while True:
                 try:
                     # 从状态队列获取消息，不阻塞
                     msg_type, *args = self.status_queue.get_nowait()
+                    handled = True
+                    
+                    if msg_type == "task_started":
+                        task_description, reply = args
+                        task_id = None
+                        try:
+                            task_id = self.task_tree.insert("", tk.END, values=(
+                                self._now_hms(),
+                                "执行中",
+                                task_description[:30] + "..." if len(task_description) > 30 else task_description
+                            ))
+                        finally:
+                            # 创建失败时也要应答，避免工作线程一直等待
+                            reply.put(task_id)
                     
-                    if msg_type == "task_complete":
+                    elif msg_type == "task_complete":
                         task_id, status = args
                         # 更新任务状态
-                        values = list(self.task_tree.item(task_id)["values"])
-                        values[1] = status
-                        self.task_tree.item(task_id, values=values)
+                        self.task_tree.set(task_id, "状态", status)
                         
                         # 禁用继续按钮
                         self.continue_button.config(state=tk.DISABLED)
@@ -470,24 +554,28 @@ AI响应：
                     elif msg_type == "task_paused":
                         task_id, reason = args
                         # 更新任务状态为暂停
-                        values = list(self.task_tree.item(task_id)["values"])
-                        values[1] = "暂停"
-                        self.task_tree.item(task_id, values=values)
+                        self.task_tree.set(task_id, "状态", "暂停")
                         
                         # 启用继续按钮
                         self.continue_button.config(state=tk.NORMAL)
                         
+                    elif msg_type == "show_pause":
+                        reason, = args
+                        self.show_pause_interface(reason)
+                        
                     elif msg_type == "model_response":
-                        task_id, response = args
+                        task_id, response, timestamp = args
                         # 为每个步骤创建新的条目
                         step_id = self.task_tree.insert("", tk.END, values=(
-                            time.strftime("%H:%M:%S"),
+                            timestamp,
                             "执行中",
                             response
                         ))
                         # 将步骤ID添加到当前任务的步骤列表中
                         if task_id in self.task_steps:
                             self.task_steps[task_id].append(step_id)
+                        self._step_rows.append((step_id, task_id))
+                        self._evict_step_rows()
                         
                         # 自动滚动到底部，显示最新步骤
                         self.task_tree.see(step_id)
@@ -496,11 +584,21 @@ AI响应：
                     break
         except Exception:
             pass
-        
-        # 每100ms更新一次
-        self.root.after(100, self.update_status)
+        return handled
+
+    def _evict_step_rows(self):
+        """步骤行超过上限时删除最早的步骤行，任务行本身保留"""
+        while len(self._step_rows) > _MAX_STEP_ROWS:
+            step_id, task_id = self._step_rows.popleft()
+            self.task_tree.delete(step_id)
+            steps = self.task_steps.get(task_id)
+            if steps and step_id in steps:
+                steps.remove(step_id)
 
 def main():
+    # 代理在子进程中运行，打包为可执行文件时需要
+    multiprocessing.freeze_support()
+    
     parser = argparse.ArgumentParser(description="VLM 电脑操作工具")
     parser.add_argument("--task", type=str, help="任务描述")
     args = parser.parse_args()
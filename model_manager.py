@@ -5,14 +5,51 @@
 """
 
 import os
-import json
 import logging
+import threading
 from typing import Dict, Any, Optional
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI, DefaultHttpxClient, DefaultAsyncHttpxClient
+
+from utils import json_utils
+
+class _CompactJsonRequestMixin:
+    """
+    用 json_utils.dumps_compact（安装了 orjson 时使用 orjson）序列化请求体，
+    替代 httpx 默认的标准库 json；请求中的base64截图较大，序列化耗时明显。
+    SDK 已自行序列化请求体（传入 content）时不做处理；SDK 的默认请求头已包含 Content-Type
+    """
+    
+    def build_request(self, method, url, *, json=None, content=None, **kwargs):
+        if json is not None and content is None:
+            try:
+                content = json_utils.dumps_compact(json)
+            except TypeError:
+                # orjson 不支持的类型交给 httpx 处理
+                pass
+            else:
+                json = None
+        return super().build_request(method, url, json=json, content=content, **kwargs)
+
+class _CompactJsonHttpxClient(_CompactJsonRequestMixin, DefaultHttpxClient):
+    pass
+
+class _CompactJsonAsyncHttpxClient(_CompactJsonRequestMixin, DefaultAsyncHttpxClient):
+    pass
+
+def _http_client_options(async_client=False):
+    """
+    创建OpenAI客户端时额外传入的参数
+    安装了 orjson 时使用以 orjson 序列化请求体的HTTP客户端，否则使用SDK默认的客户端
+    """
+    if json_utils.orjson is None:
+        return {}
+    return {"http_client": _CompactJsonAsyncHttpxClient() if async_client else _CompactJsonHttpxClient()}
 
 class ModelManager:
     """模型管理器类，用于加载配置并管理不同类型的模型"""
     
+    __slots__ = ("config_path", "config", "clients", "async_clients", "api_keys", "_lock")
+    
     def __init__(self, config_path: str = "model_config.json"):
         """
         初始化模型管理器
@@ -21,7 +58,9 @@ class ModelManager:
         self.config_path = config_path
         self.config = None
         self.clients = {}  # 存储不同模型的客户端
+        self.async_clients = {}  # 存储不同模型的异步客户端
         self.api_keys = {}  # 存储API密钥
+        self._lock = threading.RLock()  # 保护配置和客户端的读写
         
         # 加载配置
         self.load_config()
@@ -36,8 +75,8 @@ class ModelManager:
         """加载模型配置"""
         try:
             if os.path.exists(self.config_path):
-                with open(self.config_path, "r", encoding="utf-8") as f:
-                    self.config = json.load(f)
+                with open(self.config_path, "rb") as f:
+                    self.config = json_utils.loads(f.read())
             else:
                 raise FileNotFoundError(f"配置文件不存在: {self.config_path}")
         except Exception as e:
@@ -57,24 +96,26 @@ class ModelManager:
     
     def init_clients(self):
         """初始化模型客户端"""
-        if not self.config:
-            return
-            
-        for model_type, model_config in self.config.items():
-            api_key = self.api_keys.get(model_type)
-            if not api_key:
-                logging.warning(f"模型 {model_type} 的API密钥未找到，跳过初始化")
-                continue
+        with self._lock:
+            if not self.config:
+                return
                 
-            try:
-                # 创建OpenAI客户端
-                client = OpenAI(
-                    api_key=api_key,
-                    base_url=model_config.get("base_url")
-                )
-                self.clients[model_type] = client
-            except Exception as e:
-                logging.error(f"初始化模型 {model_type} 客户端失败: {e}")
+            for model_type, model_config in self.config.items():
+                api_key = self.api_keys.get(model_type)
+                if not api_key:
+                    logging.warning(f"模型 {model_type} 的API密钥未找到，跳过初始化")
+                    continue
+                    
+                try:
+                    # 创建OpenAI客户端
+                    client = OpenAI(
+                        api_key=api_key,
+                        base_url=model_config.get("base_url"),
+                        **_http_client_options()
+                    )
+                    self.clients[model_type] = client
+                except Exception as e:
+                    logging.error(f"初始化模型 {model_type} 客户端失败: {e}")
     
     def get_client(self, model_type: str) -> Optional[OpenAI]:
         """
@@ -82,7 +123,51 @@ class ModelManager:
         :param model_type: 模型类型，如 "vision_model" 或 "classification_model"
         :return: OpenAI客户端实例
         """
-        return self.clients.get(model_type)
+        with self._lock:
+            return self.clients.get(model_type)
+    
+    def ensure_client(self, model_type: str) -> Optional[OpenAI]:
+        """
+        获取指定类型的模型客户端，未初始化时创建并缓存
+        :param model_type: 模型类型，如 "vision_model" 或 "classification_model"
+        :return: OpenAI客户端实例
+        """
+        client = self.clients.get(model_type)
+        if client:
+            return client
+        
+        with self._lock:
+            client = self.clients.get(model_type)
+            if not client:
+                model_config = self.get_model_config(model_type)
+                base_url = model_config.get("base_url") if model_config else "https://dashscope.aliyuncs.com/compatible-mode/v1"
+                client = OpenAI(
+                    api_key=self.get_api_key(model_type),
+                    base_url=base_url,
+                    **_http_client_options()
+                )
+                self.clients[model_type] = client
+        return client
+    
+    def ensure_async_client(self, model_type: str) -> AsyncOpenAI:
+        """
+        获取指定类型的模型异步客户端，未初始化时创建并缓存
+        异步客户端绑定首次使用它的事件循环，调用方应始终在同一个事件循环中使用
+        :param model_type: 模型类型，如 "vision_model" 或 "classification_model"
+        :return: AsyncOpenAI客户端实例
+        """
+        with self._lock:
+            client = self.async_clients.get(model_type)
+            if not client:
+                model_config = self.get_model_config(model_type)
+                base_url = model_config.get("base_url") if model_config else "https://dashscope.aliyuncs.com/compatible-mode/v1"
+                client = AsyncOpenAI(
+                    api_key=self.get_api_key(model_type),
+                    base_url=base_url,
+                    **_http_client_options(async_client=True)
+                )
+                self.async_clients[model_type] = client
+        return client
     
     def get_model_config(self, model_type: str) -> Optional[Dict[str, Any]]:
         """
@@ -115,13 +200,15 @@ class ModelManager:
     
     def reload_config(self):
         """重新加载配置"""
-        self.config = None
-        self.clients = {}
-        self.api_keys = {}
-        
-        self.load_config()
-        self.load_api_keys()
-        self.init_clients()
+        with self._lock:
+            self.config = None
+            self.clients = {}
+            self.async_clients = {}
+            self.api_keys = {}
+            
+            self.load_config()
+            self.load_api_keys()
+            self.init_clients()
     
     def update_model_config(self, model_type: str, new_config: Dict[str, Any]):
         """
@@ -129,21 +216,22 @@ class ModelManager:
         :param model_type: 模型类型
         :param new_config: 新的配置
         """
-        if not self.config:
-            self.config = {}
-            
-        self.config[model_type] = new_config
-        
-        # 保存配置到文件
-        try:
-            with open(self.config_path, "w", encoding="utf-8") as f:
-                json.dump(self.config, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            logging.error(f"保存模型配置失败: {e}")
-            return
+        with self._lock:
+            if not self.config:
+                self.config = {}
+                
+            self.config[model_type] = new_config
             
-        # 重新初始化客户端
-        self.init_clients()
+            # 保存配置到文件
+            try:
+                with open(self.config_path, "wb") as f:
+                    f.write(json_utils.dumps(self.config))
+            except Exception as e:
+                logging.error(f"保存模型配置失败: {e}")
+                return
+                
+            # 重新初始化客户端
+            self.init_clients()
     
     def list_available_models(self) -> Dict[str, Dict[str, Any]]:
         """
@@ -166,6 +254,7 @@ class ModelManager:
 
 # 全局模型管理器实例
 _model_manager = None
+_mm_lock = threading.Lock()
 
 def get_model_manager(config_path: str = "model_config.json") -> ModelManager:
     """
@@ -175,5 +264,7 @@ def get_model_manager(config_path: str = "model_config.json") -> ModelManager:
     """
     global _model_manager
     if _model_manager is None:
-        _model_manager = ModelManager(config_path)
+        with _mm_lock:
+            if _model_manager is None:
+                _model_manager = ModelManager(config_path)
     return _model_manager
\ No newline at end of file
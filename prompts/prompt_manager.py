@@ -6,11 +6,45 @@ RAG Prompt管理器
 """
 
 import os
-import json
 import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 
+from utils import json_utils
+
+
+# 并行读取prompt文件的线程数
+_LOAD_WORKERS = 8
+
+# 内存中最多保留的应用/系统prompt数量，超出后淘汰最久未使用的，需要时再从文件读取
+_PROMPT_CACHE_SIZE = 64
+
+
+class _LRUDict(OrderedDict):
+    """容量有限的字典，超出容量时淘汰最久未使用的条目"""
+    
+    def __init__(self, maxsize: int):
+        super().__init__()
+        self.maxsize = maxsize
+    
+    def get(self, key, default=None):
+        try:
+            value = self[key]
+            self.move_to_end(key)
+        except KeyError:
+            return default
+        return value
+    
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        while len(self) > self.maxsize:
+            self.popitem(last=False)
+
 
 class PromptManager:
     """RAG Prompt管理器"""
@@ -31,51 +65,76 @@ class PromptManager:
         self.applicants_dir.mkdir(exist_ok=True)
         self.systems_dir.mkdir(exist_ok=True)
         
-        # 加载所有prompt缓存
-        self.applicant_prompts = {}
-        self.system_prompts = {}
+        # prompt文件路径（名称 -> 路径），以及最近使用的prompt内容缓存
+        self._applicant_paths = {}
+        self._system_paths = {}
+        self.applicant_prompts = _LRUDict(_PROMPT_CACHE_SIZE)
+        self.system_prompts = _LRUDict(_PROMPT_CACHE_SIZE)
         self.applicant_index = {}
         self.system_index = {}
         
-        self._load_all_prompts()
-        logging.info(f"Prompt管理器初始化完成，应用数量: {len(self.applicant_prompts)}, 系统数量: {len(self.system_prompts)}")
+        # 组合prompt缓存，绑定在实例上，添加prompt时清空
+        self._combined_cache = lru_cache(maxsize=128)(self._build_combined_prompt)
+        
+        # prompt文件在第一次查询时才加载，构造时不读取目录
+        self._loaded = False
+        self._load_lock = threading.Lock()
+    
+    def _ensure_loaded(self):
+        """首次使用时加载所有prompt文件，之后直接返回"""
+        if self._loaded:
+            return
+        with self._load_lock:
+            if not self._loaded:
+                self._load_all_prompts()
+                self._loaded = True
     
     def _load_all_prompts(self):
         """加载所有prompt文件"""
         self._load_applicant_prompts()
         self._load_system_prompts()
+        logging.info(f"Prompt管理器加载完成，应用数量: {len(self._applicant_paths)}, 系统数量: {len(self._system_paths)}")
     
-    def _load_applicant_prompts(self):
-        """加载应用专用prompt"""
-        for applicant_file in self.applicants_dir.glob('*.json'):
+    @staticmethod
+    def _read_prompt_files(directory: Path, kind: str) -> List[Tuple[str, Dict]]:
+        """
+        并行读取目录下的所有prompt文件，读取失败的文件记录日志后跳过
+        :param directory: prompt目录
+        :param kind: 用于日志的类别名称，如 "应用"、"系统"
+        :return: [(name, data), ...]，按文件遍历顺序排列
+        """
+        def read(prompt_file: Path):
             try:
-                with open(applicant_file, 'r', encoding='utf-8') as f:
-                    applicant_data = json.load(f)
-                    applicant_name = applicant_file.stem
-                    self.applicant_prompts[applicant_name] = applicant_data
-                    
-                    # 构建索引
-                    self._build_applicant_index(applicant_name, applicant_data)
-                    
-                logging.info(f"加载应用prompt: {applicant_name}")
+                return prompt_file.stem, json_utils.load_file(prompt_file)
             except Exception as e:
-                logging.error(f"加载应用prompt失败 {applicant_file}: {e}")
+                logging.error(f"加载{kind}prompt失败 {prompt_file}: {e}")
+                return None
+        
+        prompt_files = list(directory.glob('*.json'))
+        with ThreadPoolExecutor(max_workers=_LOAD_WORKERS) as executor:
+            return [result for result in executor.map(read, prompt_files) if result is not None]
+    
+    def _load_applicant_prompts(self):
+        """加载应用专用prompt"""
+        for applicant_name, applicant_data in self._read_prompt_files(self.applicants_dir, "应用"):
+            self._applicant_paths[applicant_name] = self.applicants_dir / f"{applicant_name}.json"
+            self.applicant_prompts[applicant_name] = applicant_data
+            
+            # 构建索引
+            self._build_applicant_index(applicant_name, applicant_data)
+            
+            logging.info(f"加载应用prompt: {applicant_name}")
     
     def _load_system_prompts(self):
         """加载系统专用prompt"""
-        for system_file in self.systems_dir.glob('*.json'):
-            try:
-                with open(system_file, 'r', encoding='utf-8') as f:
-                    system_data = json.load(f)
-                    system_name = system_file.stem
-                    self.system_prompts[system_name] = system_data
-                    
-                    # 构建索引
-                    self._build_system_index(system_name, system_data)
-                    
-                logging.info(f"加载系统prompt: {system_name}")
-            except Exception as e:
-                logging.error(f"加载系统prompt失败 {system_file}: {e}")
+        for system_name, system_data in self._read_prompt_files(self.systems_dir, "系统"):
+            self._system_paths[system_name] = self.systems_dir / f"{system_name}.json"
+            self.system_prompts[system_name] = system_data
+            
+            # 构建索引
+            self._build_system_index(system_name, system_data)
+            
+            logging.info(f"加载系统prompt: {system_name}")
     
     def _build_applicant_index(self, applicant_name: str, applicant_data: Dict):
         """构建应用prompt索引"""
@@ -97,14 +156,46 @@ class PromptManager:
                 self.system_index[keyword] = []
             self.system_index[keyword].append(system_name)
     
+    @staticmethod
+    def _remove_from_index(index: Dict[str, List[str]], name: str):
+        """从关键词索引中移除指定名称的所有条目"""
+        for keyword in list(index):
+            names = index[keyword]
+            if name in names:
+                names.remove(name)
+                if not names:
+                    del index[keyword]
+    
+    @staticmethod
+    def _get_prompt_data(cache: _LRUDict, paths: Dict[str, Path], name: str, kind: str) -> Optional[Dict]:
+        """
+        从缓存获取prompt数据，已被淘汰的重新从文件读取
+        :param cache: prompt内容缓存
+        :param paths: 名称到文件路径的映射
+        :param name: 应用或系统名称
+        :param kind: 用于日志的类别名称，如 "应用"、"系统"
+        :return: prompt数据或None
+        """
+        data = cache.get(name)
+        if data is None and name in paths:
+            try:
+                data = json_utils.load_file(paths[name])
+            except Exception as e:
+                logging.error(f"加载{kind}prompt失败 {paths[name]}: {e}")
+                return None
+            cache[name] = data
+        return data
+    
     def get_applicant_prompt(self, applicant_name: str) -> Optional[str]:
         """
         获取指定应用的prompt
         :param applicant_name: 应用名称
         :return: 应用prompt文本或None
         """
-        if applicant_name in self.applicant_prompts:
-            return self.applicant_prompts[applicant_name].get('prompt', '')
+        self._ensure_loaded()
+        applicant_data = self._get_prompt_data(self.applicant_prompts, self._applicant_paths, applicant_name, "应用")
+        if applicant_data is not None:
+            return applicant_data.get('prompt', '')
         return None
     
     def get_system_prompt(self, system_name: str) -> Optional[str]:
@@ -113,25 +204,39 @@ class PromptManager:
         :param system_name: 系统名称
         :return: 系统prompt文本或None
         """
-        if system_name in self.system_prompts:
-            return self.system_prompts[system_name].get('prompt', '')
+        self._ensure_loaded()
+        system_data = self._get_prompt_data(self.system_prompts, self._system_paths, system_name, "系统")
+        if system_data is not None:
+            return system_data.get('prompt', '')
         return None
     
+    @staticmethod
+    def _iter_unique(index: Dict[str, List[str]], get_prompt, keywords: List[str], seen: set):
+        """
+        按关键词顺序遍历倒排列表，每个名称只产出一次
+        :param index: 关键词索引
+        :param get_prompt: 按名称获取prompt文本的函数
+        :param keywords: 关键词列表
+        :param seen: 已产出的名称，调用方可在多次遍历间共享
+        :return: 生成 (name, prompt)
+        """
+        for keyword in keywords:
+            for name in index.get(keyword, ()):
+                if name in seen:
+                    continue
+                seen.add(name)
+                prompt = get_prompt(name)
+                if prompt:
+                    yield name, prompt
+    
     def search_applicant_prompts(self, keywords: List[str]) -> List[Tuple[str, str]]:
         """
         搜索相关应用prompt
         :param keywords: 关键词列表
         :return: [(applicant_name, prompt), ...]
         """
-        results = []
-        for keyword in keywords:
-            if keyword in self.applicant_index:
-                for applicant_name in self.applicant_index[keyword]:
-                    if applicant_name not in [r[0] for r in results]:  # 避免重复
-                        prompt = self.get_applicant_prompt(applicant_name)
-                        if prompt:
-                            results.append((applicant_name, prompt))
-        return results
+        self._ensure_loaded()
+        return list(self._iter_unique(self.applicant_index, self.get_applicant_prompt, keywords, set()))
     
     def search_system_prompts(self, keywords: List[str]) -> List[Tuple[str, str]]:
         """
@@ -139,14 +244,54 @@ class PromptManager:
         :param keywords: 关键词列表
         :return: [(system_name, prompt), ...]
         """
+        self._ensure_loaded()
+        return list(self._iter_unique(self.system_index, self.get_system_prompt, keywords, set()))
+    
+    @staticmethod
+    def _match_all_keywords(index: Dict[str, List[str]], keywords: List[str]) -> List[str]:
+        """
+        返回同时命中所有关键词的名称，按名称排序
+        :param index: 关键词索引
+        :param keywords: 关键词列表
+        :return: [name, ...]
+        """
+        if not keywords:
+            return []
+        # 从最短的倒排列表开始求交集
+        postings = sorted((index.get(keyword, ()) for keyword in keywords), key=len)
+        matched = set(postings[0])
+        for names in postings[1:]:
+            if not matched:
+                break
+            matched.intersection_update(names)
+        return sorted(matched)
+    
+    def search_applicant_prompts_by_all(self, keywords: List[str]) -> List[Tuple[str, str]]:
+        """
+        搜索同时匹配所有关键词的应用prompt
+        :param keywords: 关键词列表
+        :return: [(applicant_name, prompt), ...]，按应用名称排序
+        """
+        self._ensure_loaded()
         results = []
-        for keyword in keywords:
-            if keyword in self.system_index:
-                for system_name in self.system_index[keyword]:
-                    if system_name not in [r[0] for r in results]:  # 避免重复
-                        prompt = self.get_system_prompt(system_name)
-                        if prompt:
-                            results.append((system_name, prompt))
+        for applicant_name in self._match_all_keywords(self.applicant_index, keywords):
+            prompt = self.get_applicant_prompt(applicant_name)
+            if prompt:
+                results.append((applicant_name, prompt))
+        return results
+    
+    def search_system_prompts_by_all(self, keywords: List[str]) -> List[Tuple[str, str]]:
+        """
+        搜索同时匹配所有关键词的系统prompt
+        :param keywords: 关键词列表
+        :return: [(system_name, prompt), ...]，按系统名称排序
+        """
+        self._ensure_loaded()
+        results = []
+        for system_name in self._match_all_keywords(self.system_index, keywords):
+            prompt = self.get_system_prompt(system_name)
+            if prompt:
+                results.append((system_name, prompt))
         return results
     
     def get_combined_prompt(self, platform_keywords: List[str] = None, 
@@ -159,6 +304,23 @@ class PromptManager:
         :param base_prompt: 基础prompt
         :return: 组合后的prompt文本
         """
+        # 关键词的顺序决定各指南的拼接顺序，因此保持原顺序作为缓存键
+        return self._combined_cache(
+            tuple(platform_keywords or ()),
+            tuple(system_keywords or ()),
+            base_prompt
+        )
+    
+    def _build_combined_prompt(self, platform_keywords: Tuple[str, ...],
+                               system_keywords: Tuple[str, ...],
+                               base_prompt: Optional[str]) -> str:
+        """
+        拼接组合prompt，结果由 get_combined_prompt 缓存
+        :param platform_keywords: 应用关键词
+        :param system_keywords: 系统关键词
+        :param base_prompt: 基础prompt
+        :return: 组合后的prompt文本
+        """
         combined_parts = []
         
         # 添加基础prompt
@@ -167,15 +329,17 @@ class PromptManager:
         
         # 添加应用相关prompt
         if platform_keywords:
-            applicant_prompts = self.search_applicant_prompts(platform_keywords)
-            for applicant_name, applicant_prompt in applicant_prompts:
+            self._ensure_loaded()
+            for applicant_name, applicant_prompt in self._iter_unique(
+                    self.applicant_index, self.get_applicant_prompt, platform_keywords, set()):
                 combined_parts.append(f"\n\n=== {applicant_name.upper()} 应用专用操作指南 ===")
                 combined_parts.append(applicant_prompt)
         
         # 添加系统相关prompt
         if system_keywords:
-            system_prompts = self.search_system_prompts(system_keywords)
-            for system_name, system_prompt in system_prompts:
+            self._ensure_loaded()
+            for system_name, system_prompt in self._iter_unique(
+                    self.system_index, self.get_system_prompt, system_keywords, set()):
                 combined_parts.append(f"\n\n=== {system_name.upper()} 系统专用操作指南 ===")
                 combined_parts.append(system_prompt)
         
@@ -183,29 +347,37 @@ class PromptManager:
     
     def get_available_applicants(self) -> List[str]:
         """获取所有可用的应用列表"""
-        return list(self.applicant_prompts.keys())
+        self._ensure_loaded()
+        return list(self._applicant_paths)
     
     def get_available_systems(self) -> List[str]:
         """获取所有可用的系统列表"""
-        return list(self.system_prompts.keys())
+        self._ensure_loaded()
+        return list(self._system_paths)
     
     def get_applicant_info(self, applicant_name: str) -> Optional[Dict]:
         """获取应用详细信息"""
-        return self.applicant_prompts.get(applicant_name)
+        self._ensure_loaded()
+        return self._get_prompt_data(self.applicant_prompts, self._applicant_paths, applicant_name, "应用")
     
     def get_system_info(self, system_name: str) -> Optional[Dict]:
         """获取系统详细信息"""
-        return self.system_prompts.get(system_name)
+        self._ensure_loaded()
+        return self._get_prompt_data(self.system_prompts, self._system_paths, system_name, "系统")
     
     def add_applicant_prompt(self, applicant_name: str, prompt_data: Dict):
         """添加新的应用prompt"""
+        self._ensure_loaded()
         try:
             applicant_file = self.applicants_dir / f"{applicant_name}.json"
-            with open(applicant_file, 'w', encoding='utf-8') as f:
-                json.dump(prompt_data, f, ensure_ascii=False, indent=2)
+            applicant_file.write_bytes(json_utils.dumps(prompt_data))
             
-            # 重新加载
-            self._load_applicant_prompts()
+            # 只更新该应用的缓存和索引
+            self._applicant_paths[applicant_name] = applicant_file
+            self.applicant_prompts[applicant_name] = prompt_data
+            self._remove_from_index(self.applicant_index, applicant_name)
+            self._build_applicant_index(applicant_name, prompt_data)
+            self._combined_cache.cache_clear()
             logging.info(f"添加应用prompt: {applicant_name}")
         except Exception as e:
             logging.error(f"添加应用prompt失败 {applicant_name}: {e}")
@@ -213,21 +385,32 @@ class PromptManager:
     
     def add_system_prompt(self, system_name: str, prompt_data: Dict):
         """添加新的系统prompt"""
+        self._ensure_loaded()
         try:
             system_file = self.systems_dir / f"{system_name}.json"
-            with open(system_file, 'w', encoding='utf-8') as f:
-                json.dump(prompt_data, f, ensure_ascii=False, indent=2)
+            system_file.write_bytes(json_utils.dumps(prompt_data))
             
-            # 重新加载
-            self._load_system_prompts()
+            # 只更新该系统的缓存和索引
+            self._system_paths[system_name] = system_file
+            self.system_prompts[system_name] = prompt_data
+            self._remove_from_index(self.system_index, system_name)
+            self._build_system_index(system_name, prompt_data)
+            self._combined_cache.cache_clear()
             logging.info(f"添加系统prompt: {system_name}")
         except Exception as e:
             logging.error(f"添加系统prompt失败 {system_name}: {e}")
             raise
 
 
+# 全局PromptManager实例
+_prompt_manager = None
+_pm_lock = threading.Lock()
+
 def get_prompt_manager() -> PromptManager:
     """获取全局PromptManager实例"""
-    if not hasattr(get_prompt_manager, '_instance'):
-        get_prompt_manager._instance = PromptManager()
-    return get_prompt_manager._instance
\ No newline at end of file
+    global _prompt_manager
+    if _prompt_manager is None:
+        with _pm_lock:
+            if _prompt_manager is None:
+                _prompt_manager = PromptManager()
+    return _prompt_manager
\ No newline at end of file
@@ -5,9 +5,16 @@
 """
 
 import os
-import json
+import re
 import shutil
+import filecmp
 import argparse
+import time
+
+from utils import json_utils
+
+# 可切换的配置文件 model_config.<名称>.json，不包括 model_config.json 本身
+_CONFIG_FILE_PATTERN = re.compile(r"^model_config\.(?!json$)(.+)\.json$")
 
 def switch_model_config(config_name):
     """
@@ -26,19 +33,23 @@ def switch_model_config(config_name):
         return False
     
     try:
-        # 备份当前配置
-        if os.path.exists(target_config):
-            backup_config = f"model_config.backup.{int(time.time())}.json"
-            shutil.copy2(target_config, backup_config)
-            print(f"当前配置已备份到 {backup_config}")
-        
-        # 复制新配置
-        shutil.copy2(source_config, target_config)
-        print(f"已切换到 {config_name} 配置")
+        # 内容完全相同时无需备份和复制
+        if os.path.exists(target_config) and filecmp.cmp(source_config, target_config, shallow=False):
+            print(f"当前已是 {config_name} 配置")
+        else:
+            # 备份当前配置
+            if os.path.exists(target_config):
+                backup_config = f"model_config.backup.{int(time.time())}.json"
+                shutil.copy2(target_config, backup_config)
+                print(f"当前配置已备份到 {backup_config}")
+            
+            # 复制新配置
+            shutil.copy2(source_config, target_config)
+            print(f"已切换到 {config_name} 配置")
         
         # 显示新配置内容
-        with open(target_config, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        with open(target_config, "rb") as f:
+            config = json_utils.loads(f.read())
             
         print("\n当前模型配置:")
         for model_type, model_config in config.items():
@@ -61,13 +72,10 @@ def switch_model_config(config_name):
 
 def list_available_configs():
     """列出所有可用的配置"""
-    configs = []
-    
-    # 查找所有 model_config.*.json 文件
-    for file in os.listdir("."):
-        if file.startswith("model_config.") and file.endswith(".json") and file != "model_config.json":
-            config_name = file[12:-5]  # 提取中间部分作为配置名称
-            configs.append(config_name)
+    # 查找所有 model_config.*.json 文件，提取中间部分作为配置名称
+    with os.scandir(".") as entries:
+        configs = [match.group(1) for entry in entries
+                   if entry.is_file() and (match := _CONFIG_FILE_PATTERN.match(entry.name))]
     
     if not configs:
         print("没有找到可用的配置文件")
@@ -86,8 +94,8 @@ def show_current_config():
         return
     
     try:
-        with open(config_file, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        with open(config_file, "rb") as f:
+            config = json_utils.loads(f.read())
             
         print("\n当前模型配置:")
         for model_type, model_config in config.items():
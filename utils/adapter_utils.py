@@ -1,11 +1,19 @@
 import os
-import json
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import json_utils
+
+# 并行读取适配器文件的线程数
+_LOAD_WORKERS = 8
 
 class AdapterUtils:
     def __init__(self):
         self.adapters_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'adapters')
         self.adapters = {}  # 存储加载的适配器
+        self._rule_index = {}  # 适配器ID -> {目标类型: 坐标调整}
+        self.version = 0  # 每登记一个适配器加1，供缓存了调整量的调用方判断是否失效
         self.load_all_adapters()
     
     def load_all_adapters(self):
@@ -17,10 +25,15 @@ class AdapterUtils:
                 logging.warning(f"适配器目录不存在: {self.adapters_dir}")
                 return
             
-            for filename in os.listdir(self.adapters_dir):
-                if filename.endswith('.json'):
-                    file_path = os.path.join(self.adapters_dir, filename)
-                    self.load_adapter(file_path)
+            file_paths = [os.path.join(self.adapters_dir, filename)
+                          for filename in os.listdir(self.adapters_dir) if filename.endswith('.json')]
+            
+            # 并行读取文件，按原顺序登记
+            with ThreadPoolExecutor(max_workers=_LOAD_WORKERS) as executor:
+                adapter_datas = list(executor.map(self._read_adapter, file_paths))
+            for file_path, adapter_data in zip(file_paths, adapter_datas):
+                if adapter_data is not None:
+                    self._register_adapter(file_path, adapter_data)
             
             logging.info(f"成功加载 {len(self.adapters)} 个适配器")
         except Exception as e:
@@ -30,16 +43,42 @@ class AdapterUtils:
         """
         加载单个适配器配置文件
         """
+        adapter_data = self._read_adapter(file_path)
+        if adapter_data is not None:
+            self._register_adapter(file_path, adapter_data)
+    
+    def _read_adapter(self, file_path):
+        """
+        读取并解析适配器配置文件，失败时记录日志并返回None
+        """
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                adapter_data = json.load(f)
-            
-            # 使用文件名（不带扩展名）作为适配器ID
-            adapter_id = os.path.splitext(os.path.basename(file_path))[0]
-            self.adapters[adapter_id] = adapter_data
-            logging.info(f"成功加载适配器: {adapter_id} - {adapter_data.get('name', '未命名')}")
+            return json_utils.load_file(file_path)
         except Exception as e:
             logging.error(f"加载适配器文件 {file_path} 失败: {str(e)}")
+            return None
+    
+    def _register_adapter(self, file_path, adapter_data):
+        """
+        登记已解析的适配器
+        """
+        # 使用文件名（不带扩展名）作为适配器ID
+        adapter_id = os.path.splitext(os.path.basename(file_path))[0]
+        self.adapters[adapter_id] = adapter_data
+        self._rule_index[adapter_id] = self._build_rule_index(adapter_data)
+        self.version += 1
+        logging.info(f"成功加载适配器: {adapter_id} - {adapter_data.get('name', '未命名')}")
+    
+    @staticmethod
+    def _build_rule_index(adapter_data):
+        """
+        按规则的 type 和 target 建立索引，同一目标类型只保留第一条匹配的规则
+        """
+        rule_index = {}
+        for rule in adapter_data.get('rules', []):
+            adjustment = rule.get('adjustment', {})
+            rule_index.setdefault(rule.get('type'), adjustment)
+            rule_index.setdefault(rule.get('target'), adjustment)
+        return rule_index
     
     def get_adapter(self, adapter_id):
         """
@@ -53,6 +92,20 @@ class AdapterUtils:
         """
         return self.adapters
     
+    def get_adjustment(self, adapter_id, target_type):
+        """
+        获取适配器对指定目标类型的坐标偏移量
+        
+        返回:
+        - (offset_x, offset_y)，没有对应规则时为 (0, 0)
+        """
+        if not adapter_id or adapter_id not in self.adapters:
+            return 0, 0
+        adjustment = self._rule_index[adapter_id].get(target_type)
+        if adjustment is None:
+            return 0, 0
+        return adjustment.get('x', 0), adjustment.get('y', 0)
+    
     def apply_adjustment(self, x, y, adapter_id=None, target_type=None):
         """
         应用坐标调整规则
@@ -68,26 +121,25 @@ class AdapterUtils:
         if not adapter_id or adapter_id not in self.adapters:
             return x, y
         
-        adapter = self.adapters[adapter_id]
-        rules = adapter.get('rules', [])
+        adjustment = self._rule_index[adapter_id].get(target_type)
+        if adjustment is None:
+            return x, y
+        
+        adjusted_x = x + adjustment.get('x', 0)
+        adjusted_y = y + adjustment.get('y', 0)
         
-        for rule in rules:
-            if rule.get('type') == target_type or rule.get('target') == target_type:
-                adjustment = rule.get('adjustment', {})
-                adjusted_x = x + adjustment.get('x', 0)
-                adjusted_y = y + adjustment.get('y', 0)
-                
-                # 确保调整后的坐标仍然在0-1范围内
-                adjusted_x = max(0, min(1, adjusted_x))
-                adjusted_y = max(0, min(1, adjusted_y))
-                
-                logging.info(f"应用适配器 {adapter_id} 的规则到目标 {target_type}，坐标从 ({x:.3f}, {y:.3f}) 调整为 ({adjusted_x:.3f}, {adjusted_y:.3f})")
-                return adjusted_x, adjusted_y
+        # 确保调整后的坐标仍然在0-1范围内
+        adjusted_x = 0.0 if adjusted_x < 0.0 else 1.0 if adjusted_x > 1.0 else adjusted_x
+        adjusted_y = 0.0 if adjusted_y < 0.0 else 1.0 if adjusted_y > 1.0 else adjusted_y
         
-        return x, y
+        # 每次鼠标操作都会调用，未启用INFO日志时跳过字符串格式化
+        if logging.getLogger().isEnabledFor(logging.INFO):
+            logging.info(f"应用适配器 {adapter_id} 的规则到目标 {target_type}，坐标从 ({x:.3f}, {y:.3f}) 调整为 ({adjusted_x:.3f}, {adjusted_y:.3f})")
+        return adjusted_x, adjusted_y
 
 # 创建单例实例
 _adapter_utils_instance = None
+_au_lock = threading.Lock()
 
 def get_adapter_utils():
     """
@@ -95,5 +147,7 @@ def get_adapter_utils():
     """
     global _adapter_utils_instance
     if _adapter_utils_instance is None:
-        _adapter_utils_instance = AdapterUtils()
+        with _au_lock:
+            if _adapter_utils_instance is None:
+                _adapter_utils_instance = AdapterUtils()
     return _adapter_utils_instance
\ No newline at end of file
@@ -4,16 +4,25 @@
 坐标转换工具模块
 """
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 class CoordinateConverter:
     """
     坐标转换类，用于处理截图缩放和实际屏幕坐标之间的转换
     """
     
+    # 距离边缘的安全边距（像素），避免触发 PyAutoGUI fail-safe（屏幕角落）
+    SAFE_MARGIN = 5
+    
     def __init__(self):
         self.original_width = 0
         self.original_height = 0
         self.scaled_width = 0
         self.scaled_height = 0
+        self._update_bounds()
     
     def set_original_resolution(self, width, height):
         """
@@ -21,6 +30,7 @@ class CoordinateConverter:
         """
         self.original_width = width
         self.original_height = height
+        self._update_bounds()
     
     def set_scaled_resolution(self, width, height):
         """
@@ -28,6 +38,40 @@ class CoordinateConverter:
         """
         self.scaled_width = width
         self.scaled_height = height
+        self._update_bounds()
+    
+    def set_resolution(self, original_width, original_height, scaled_width, scaled_height):
+        """
+        同时设置原始屏幕分辨率和缩放后的截图分辨率
+        分辨率没有变化时直接返回，不更新版本号，调用方缓存的转换参数继续有效
+        """
+        if (original_width == self.original_width and original_height == self.original_height
+                and scaled_width == self.scaled_width and scaled_height == self.scaled_height):
+            return
+        self.original_width = original_width
+        self.original_height = original_height
+        self.scaled_width = scaled_width
+        self.scaled_height = scaled_height
+        self._update_bounds()
+    
+    def _update_bounds(self):
+        """
+        预先计算转换时用到的浮点尺寸、裁剪边界和缩放比例，避免每次转换重复计算
+        """
+        # 分辨率每变化一次加1，供缓存了转换参数的调用方判断是否失效
+        self.version = getattr(self, 'version', -1) + 1
+        self._width_f = float(self.original_width)
+        self._height_f = float(self.original_height)
+        self._min_xy = float(self.SAFE_MARGIN)
+        # 分辨率过小（如尚未设置）时上界不低于下界，与 max(下界, min(上界, v)) 结果一致
+        self._max_x = float(max(self.original_width - self.SAFE_MARGIN, self.SAFE_MARGIN))
+        self._max_y = float(max(self.original_height - self.SAFE_MARGIN, self.SAFE_MARGIN))
+        self._has_scaled = self.scaled_width != 0 and self.scaled_height != 0
+        if self._has_scaled:
+            self._x_ratio = self._width_f / float(self.scaled_width)
+            self._y_ratio = self._height_f / float(self.scaled_height)
+        else:
+            self._x_ratio = self._y_ratio = 1.0
     
     def convert_proportion_to_actual(self, x_proportion, y_proportion):
         """
@@ -41,16 +85,13 @@ class CoordinateConverter:
         y_proportion = max(0.0, min(1.0, float(y_proportion)))
         
         # 使用高精度浮点数计算，保留4位小数精度
-        actual_x = float(x_proportion) * float(self.original_width)
-        actual_y = float(y_proportion) * float(self.original_height)
+        actual_x = x_proportion * self._width_f
+        actual_y = y_proportion * self._height_f
         
-        # 确保坐标不超出屏幕范围，使用高精度边界检查
-        # 添加安全边距，避免触发 PyAutoGUI fail-safe（屏幕角落）
-        safe_margin = 5  # 距离边缘5像素的安全边距
-        max_x = float(self.original_width - safe_margin)
-        max_y = float(self.original_height - safe_margin)
-        actual_x = max(float(safe_margin), min(max_x, actual_x))
-        actual_y = max(float(safe_margin), min(max_y, actual_y))
+        # 确保坐标不超出屏幕范围（含安全边距）
+        min_xy = self._min_xy
+        actual_x = min_xy if actual_x < min_xy else self._max_x if actual_x > self._max_x else actual_x
+        actual_y = min_xy if actual_y < min_xy else self._max_y if actual_y > self._max_y else actual_y
         
         # 返回高精度的坐标值，保留4位小数
         return round(actual_x, 4), round(actual_y, 4)
@@ -62,21 +103,34 @@ class CoordinateConverter:
         :param y_relative: 相对y坐标 (基于缩放后的截图)
         :return: (actual_x, actual_y) 实际屏幕坐标
         """
-        if self.scaled_width == 0 or self.scaled_height == 0:
+        if not self._has_scaled:
             return float(x_relative), float(y_relative)
         
-        # 计算坐标缩放比例
-        x_ratio = float(self.original_width) / float(self.scaled_width)
-        y_ratio = float(self.original_height) / float(self.scaled_height)
-        
-        # 转换坐标，使用更精确的浮点数计算
-        actual_x = float(x_relative) * x_ratio
-        actual_y = float(y_relative) * y_ratio
+        # 按预先计算的缩放比例转换坐标
+        actual_x = float(x_relative) * self._x_ratio
+        actual_y = float(y_relative) * self._y_ratio
         
-        # 确保坐标不超出屏幕范围
-        # 添加安全边距，避免触发 PyAutoGUI fail-safe（屏幕角落）
-        safe_margin = 5  # 距离边缘5像素的安全边距
-        actual_x = max(float(safe_margin), min(float(self.original_width - safe_margin), actual_x))
-        actual_y = max(float(safe_margin), min(float(self.original_height - safe_margin), actual_y))
+        # 确保坐标不超出屏幕范围（含安全边距）
+        min_xy = self._min_xy
+        actual_x = min_xy if actual_x < min_xy else self._max_x if actual_x > self._max_x else actual_x
+        actual_y = min_xy if actual_y < min_xy else self._max_y if actual_y > self._max_y else actual_y
         
         return actual_x, actual_y
+    
+    def convert_proportion_to_actual_batch(self, xy):
+        """
+        批量将比例坐标转换为实际屏幕坐标，裁剪规则与 convert_proportion_to_actual 相同
+        安装了 numpy 时一次性向量化裁剪，否则逐个转换
+        :param xy: 形如 [(x_proportion, y_proportion), ...] 的序列或 N×2 数组
+        :return: 安装了 numpy 时为 N×2 的 float64 数组，否则为 [(actual_x, actual_y), ...]
+        """
+        if np is None:
+            return [self.convert_proportion_to_actual(x, y) for x, y in xy]
+        
+        xy = np.clip(np.array(xy, dtype=np.float64).reshape(-1, 2), 0.0, 1.0)
+        xy[:, 0] *= self.original_width
+        xy[:, 1] *= self.original_height
+        
+        # 与单个转换相同的安全边距
+        np.clip(xy, self._min_xy, [self._max_x, self._max_y], out=xy)
+        return np.round(xy, 4, out=xy)
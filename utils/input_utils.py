@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+底层输入模块
+Windows 下直接调用 Win32 API（SetCursorPos / GetCursorPos / SendInput）操作鼠标和输入文本，
+省去 pyautogui 的逐层封装；其他平台使用 pyautogui
+"""
+
+import platform
+import logging
+from time import sleep as _sleep
+
+import pyautogui
+
+IS_WINDOWS = platform.system() == "Windows"
+
+# Win32 函数和结构体，首次使用时初始化
+_win32 = None
+
+INPUT_MOUSE = 0
+INPUT_KEYBOARD = 1
+KEYEVENTF_KEYUP = 0x0002
+KEYEVENTF_UNICODE = 0x0004
+VK_RETURN = 0x0D
+MOUSEEVENTF_MOVE = 0x0001
+MOUSEEVENTF_ABSOLUTE = 0x8000
+MOUSEEVENTF_VIRTUALDESK = 0x4000
+# GetSystemMetrics 虚拟桌面左上角坐标和尺寸
+SM_XVIRTUALSCREEN, SM_YVIRTUALSCREEN, SM_CXVIRTUALSCREEN, SM_CYVIRTUALSCREEN = 76, 77, 78, 79
+
+# 鼠标按钮 -> (按下标志, 抬起标志)
+_BUTTON_FLAGS = {
+    'left': (0x0002, 0x0004),
+    'right': (0x0008, 0x0010),
+    'middle': (0x0020, 0x0040),
+}
+
+
+def _get_win32():
+    """
+    加载 user32 函数并定义 SendInput 需要的结构体
+    :return: (user32, INPUT结构体, INPUT大小, POINT实例)
+    """
+    global _win32
+    if _win32 is None:
+        import ctypes
+        from ctypes import wintypes
+
+        class KEYBDINPUT(ctypes.Structure):
+            _fields_ = [("wVk", wintypes.WORD), ("wScan", wintypes.WORD), ("dwFlags", wintypes.DWORD),
+                        ("time", wintypes.DWORD), ("dwExtraInfo", ctypes.c_size_t)]
+
+        class MOUSEINPUT(ctypes.Structure):
+            _fields_ = [("dx", wintypes.LONG), ("dy", wintypes.LONG), ("mouseData", wintypes.DWORD),
+                        ("dwFlags", wintypes.DWORD), ("time", wintypes.DWORD), ("dwExtraInfo", ctypes.c_size_t)]
+
+        class _INPUTUNION(ctypes.Union):
+            # 联合体大小需与系统定义一致，按最大的 MOUSEINPUT 对齐
+            _fields_ = [("ki", KEYBDINPUT), ("mi", MOUSEINPUT)]
+
+        class INPUT(ctypes.Structure):
+            _fields_ = [("type", wintypes.DWORD), ("u", _INPUTUNION)]
+
+        user32 = ctypes.windll.user32
+        user32.SendInput.argtypes = (wintypes.UINT, ctypes.POINTER(INPUT), ctypes.c_int)
+        user32.SendInput.restype = wintypes.UINT
+        user32.SetCursorPos.argtypes = (ctypes.c_int, ctypes.c_int)
+        user32.GetCursorPos.argtypes = (ctypes.POINTER(wintypes.POINT),)
+        _win32 = (user32, INPUT, ctypes.sizeof(INPUT), wintypes.POINT())
+    return _win32
+
+
+def _win32_position():
+    user32, _, _, point = _get_win32()
+    user32.GetCursorPos(point)
+    return point.x, point.y
+
+
+def _fail_safe_check():
+    """
+    与 pyautogui 相同的安全检查：鼠标位于屏幕角落时中止操作
+    """
+    if pyautogui.FAILSAFE and _win32_position() in pyautogui.FAILSAFE_POINTS:
+        raise pyautogui.FailSafeException("鼠标移动到屏幕角落，触发安全模式，操作已中止")
+
+
+def _send_mouse_flags(flags, dx=0, dy=0):
+    """
+    一次提交多个鼠标事件，dx/dy 只在标志包含 MOUSEEVENTF_ABSOLUTE 时生效
+    """
+    user32, INPUT, input_size, _ = _get_win32()
+    inputs = (INPUT * len(flags))()
+    for event, flag in zip(inputs, flags):
+        event.type = INPUT_MOUSE
+        event.u.mi.dx = dx
+        event.u.mi.dy = dy
+        event.u.mi.dwFlags = flag
+    return user32.SendInput(len(inputs), inputs, input_size)
+
+
+def _to_absolute(x, y):
+    """
+    将屏幕坐标转换为 SendInput 使用的虚拟桌面归一化坐标（0-65535）
+    向上取整，保证系统换算回像素时落在同一个像素上
+    """
+    metrics = _get_win32()[0].GetSystemMetrics
+    left, top = metrics(SM_XVIRTUALSCREEN), metrics(SM_YVIRTUALSCREEN)
+    width, height = metrics(SM_CXVIRTUALSCREEN), metrics(SM_CYVIRTUALSCREEN)
+    dx = (int(round(x)) - left) * 65536 // width + 1
+    dy = (int(round(y)) - top) * 65536 // height + 1
+    return min(dx, 65535), min(dy, 65535)
+
+
+def position():
+    """
+    获取当前鼠标位置
+    """
+    if not IS_WINDOWS:
+        return pyautogui.position()
+    return _win32_position()
+
+
+def move_to(x, y):
+    """
+    将鼠标瞬间移动到屏幕坐标 (x, y)
+    """
+    if not IS_WINDOWS:
+        pyautogui.moveTo(x, y, duration=0, _pause=False)
+        return
+    _fail_safe_check()
+    _get_win32()[0].SetCursorPos(int(round(x)), int(round(y)))
+
+
+def mouse_down(button="left"):
+    """
+    在当前鼠标位置按下鼠标按钮
+    """
+    if not IS_WINDOWS:
+        pyautogui.mouseDown(button=button, _pause=False)
+        return
+    _fail_safe_check()
+    _send_mouse_flags((_BUTTON_FLAGS[button][0],))
+
+
+def mouse_up(button="left"):
+    """
+    在当前鼠标位置释放鼠标按钮
+    """
+    if not IS_WINDOWS:
+        pyautogui.mouseUp(button=button, _pause=False)
+        return
+    _fail_safe_check()
+    _send_mouse_flags((_BUTTON_FLAGS[button][1],))
+
+
+def move_and_release(x, y, button="left"):
+    """
+    将鼠标移动到屏幕坐标 (x, y) 并释放鼠标按钮
+    Windows 下移动和释放合并为一个输入事件提交，中间不会插入其他事件
+    """
+    if not IS_WINDOWS:
+        pyautogui.mouseUp(x, y, button=button, _pause=False)
+        return
+    _fail_safe_check()
+    dx, dy = _to_absolute(x, y)
+    _send_mouse_flags((MOUSEEVENTF_MOVE | MOUSEEVENTF_ABSOLUTE | MOUSEEVENTF_VIRTUALDESK | _BUTTON_FLAGS[button][1],),
+                      dx, dy)
+
+
+def click(button="left", clicks=1, interval=0.0):
+    """
+    在当前鼠标位置点击，每次点击的按下和抬起一起提交
+    """
+    if not IS_WINDOWS:
+        pyautogui.click(button=button, clicks=clicks, interval=interval, _pause=False)
+        return
+    _fail_safe_check()
+    for i in range(clicks):
+        if i and interval:
+            _sleep(interval)
+        _send_mouse_flags(_BUTTON_FLAGS[button])
+
+
+def click_and_hotkey(x, y, keys):
+    """
+    在屏幕坐标 (x, y) 处左键点击后按下快捷键，仅支持 Windows
+    点击、按键按下和逆序抬起的事件一次提交，中间不会插入其他事件，也不需要等待
+    :param keys: pyautogui 按键名称序列
+    :return: 是否已提交；非 Windows、存在无法直接映射的按键或事件全部被拦截时返回False，由调用方改用 pyautogui
+    """
+    if not IS_WINDOWS:
+        return False
+    from pyautogui import _pyautogui_win
+
+    # 只处理不需要额外修饰键的按键，其余情况交给 pyautogui
+    vk_codes = []
+    for key in keys:
+        vk_code = _pyautogui_win.keyboardMapping.get(key)
+        if vk_code is None or not 0 < vk_code < 0x100 or pyautogui.isShiftCharacter(key):
+            return False
+        vk_codes.append(vk_code)
+
+    _fail_safe_check()
+    user32, INPUT, input_size, _ = _get_win32()
+    user32.SetCursorPos(int(round(x)), int(round(y)))
+
+    left_down, left_up = _BUTTON_FLAGS['left']
+    inputs = (INPUT * (2 + 2 * len(vk_codes)))()
+    inputs[0].type = inputs[1].type = INPUT_MOUSE
+    inputs[0].u.mi.dwFlags = left_down
+    inputs[1].u.mi.dwFlags = left_up
+    key_events = [(vk_code, 0) for vk_code in vk_codes] + [(vk_code, KEYEVENTF_KEYUP) for vk_code in reversed(vk_codes)]
+    for i, (vk_code, flags) in enumerate(key_events, 2):
+        event = inputs[i]
+        event.type = INPUT_KEYBOARD
+        event.u.ki.wVk = vk_code
+        event.u.ki.dwFlags = flags
+    return user32.SendInput(len(inputs), inputs, input_size) > 0
+
+
+def type_unicode(text):
+    """
+    通过 Win32 SendInput 以 KEYEVENTF_UNICODE 方式输入文本，不经过剪贴板，仅支持 Windows
+    每个 UTF-16 码元一对按下/抬起事件，换行按回车键发送，所有事件一次提交
+    :return: 是否有事件被系统接收，全部被拦截（如目标窗口权限更高）时为False；空文本无需输入，返回True
+    """
+    if not text:
+        return True
+    user32, INPUT, input_size, _ = _get_win32()
+
+    # (虚拟键码, 扫描码/字符, 标志)，\r\n 视为一次换行
+    keys = []
+    for char in text.replace('\r\n', '\n'):
+        if char in '\r\n':
+            keys.append((VK_RETURN, 0, 0))
+            continue
+        data = char.encode('utf-16-le')
+        # 基本平面外的字符拆成代理对逐个发送
+        for i in range(0, len(data), 2):
+            keys.append((0, int.from_bytes(data[i:i + 2], 'little'), KEYEVENTF_UNICODE))
+
+    inputs = (INPUT * (2 * len(keys)))()
+    for i, (vk, scan, flags) in enumerate(keys):
+        for event, extra_flags in ((inputs[2 * i], 0), (inputs[2 * i + 1], KEYEVENTF_KEYUP)):
+            event.type = INPUT_KEYBOARD
+            event.u.ki.wVk = vk
+            event.u.ki.wScan = scan
+            event.u.ki.dwFlags = flags | extra_flags
+    sent = user32.SendInput(len(inputs), inputs, input_size)
+    if 0 < sent < len(inputs):
+        logging.warning(f"SendInput只提交了 {sent}/{len(inputs)} 个输入事件")
+    return sent > 0
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+JSON读写工具模块
+安装了 orjson 时使用 orjson，否则使用标准库 json
+"""
+
+import json
+import mmap
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 超过该大小的文件用mmap交给orjson直接解析，省去一次读入内存的复制
+_MMAP_THRESHOLD = 64 * 1024
+
+
+def loads(data):
+    """
+    解析JSON
+    :param data: UTF-8编码的bytes或str
+    :return: 解析后的对象
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def load_file(path):
+    """
+    读取并解析JSON文件
+    :param path: 文件路径
+    :return: 解析后的对象
+    """
+    with open(path, 'rb') as f:
+        # 标准库json不支持从buffer解析，只有orjson时才使用mmap
+        if orjson is not None and os.fstat(f.fileno()).st_size > _MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return orjson.loads(memoryview(mm))
+        return loads(f.read())
+
+
+def dumps(obj):
+    """
+    序列化为缩进2格、不转义非ASCII字符的JSON
+    :param obj: 要序列化的对象
+    :return: UTF-8编码的bytes
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+
+
+def dumps_compact(obj):
+    """
+    序列化为紧凑的JSON，不转义非ASCII字符，用于网络请求体
+    :param obj: 要序列化的对象
+    :return: UTF-8编码的bytes
+    """
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
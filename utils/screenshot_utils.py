@@ -8,14 +8,78 @@ import pyautogui
 from PIL import Image
 import io
 import base64
+import threading
+import logging
+
+try:
+    import mss
+    import mss.exception
+    # 截图失败时抛出的异常类型
+    _CAPTURE_ERRORS = (OSError, PermissionError, mss.exception.ScreenShotError)
+except ImportError:
+    mss = None
+    _CAPTURE_ERRORS = (OSError, PermissionError)
+
+try:
+    import cv2
+    import numpy as np
+except ImportError:
+    cv2 = None
+
+# 截图编码格式: 名称 -> (PIL格式, MIME类型, 保存参数)
+_IMAGE_FORMATS = {
+    "jpeg": ("JPEG", "image/jpeg", {"quality": 85}),
+    "png": ("PNG", "image/png", {}),
+}
 
 class ScreenshotUtils:
     """
     屏幕截图工具类，用于获取屏幕截图和处理图像
     """
     
-    def __init__(self, max_size=1024):
+    def __init__(self, max_size=1024, resample=Image.Resampling.BILINEAR, image_format="jpeg"):
+        """
+        :param max_size: 缩放后截图的最大边长
+        :param resample: 缩放使用的重采样滤镜，Image.Resampling.NEAREST 最快但细小文字易失真
+        :param image_format: 截图编码格式，"jpeg"（默认，编码快、体积小）或 "png"（无损）
+        """
         self.max_size = max_size
+        self.resample = resample
+        self._pil_format, self.mime_type, self._save_options = _IMAGE_FORMATS[image_format.lower()]
+        # mss实例不能跨线程使用，每个线程各自持有一个
+        self._thread_local = threading.local()
+    
+    def _grab_screen(self):
+        """
+        截取主显示器画面，安装了 mss 时使用 mss，否则使用 pyautogui
+        :return: RGB模式的PIL图像
+        """
+        if mss is None:
+            return pyautogui.screenshot()
+        
+        sct = getattr(self._thread_local, 'sct', None)
+        if sct is None:
+            sct = self._thread_local.sct = mss.mss()
+        shot = sct.grab(sct.monitors[1])
+        # 直接按BGRX解码原始像素，省去中间的RGB转换
+        return Image.frombytes('RGB', shot.size, shot.bgra, 'raw', 'BGRX')
+    
+    def _scale_down(self, screenshot):
+        """
+        将截图等比缩小到最大边长不超过 max_size，不放大
+        安装了 opencv-python 时使用 cv2.resize（INTER_AREA，多线程SIMD），否则使用 PIL thumbnail 原地缩放
+        :return: 缩放后的PIL图像
+        """
+        if cv2 is None or screenshot.mode != 'RGB':
+            screenshot.thumbnail((self.max_size, self.max_size), self.resample)
+            return screenshot
+        
+        width, height = screenshot.size
+        scale = min(self.max_size / width, self.max_size / height)
+        if scale >= 1:
+            return screenshot
+        new_size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        return Image.fromarray(cv2.resize(np.asarray(screenshot), new_size, interpolation=cv2.INTER_AREA))
     
     def capture_screenshot(self, coordinate_converter=None, scale_screenshot=True):
         """
@@ -27,48 +91,52 @@ class ScreenshotUtils:
         """
         try:
             # 获取原始屏幕截图
-            screenshot = pyautogui.screenshot()
+            screenshot = self._grab_screen()
             original_width, original_height = screenshot.size
             
             # 决定是否缩放图片
             if scale_screenshot:
                 # 缩小图片尺寸以减少API调用的数据量，但保持宽高比
-                width, height = screenshot.size
-                if width > height:
-                    new_width = min(self.max_size, width)
-                    new_height = int(height * new_width / width)
-                else:
-                    new_height = min(self.max_size, height)
-                    new_width = int(width * new_height / height)
-                
-                scaled_screenshot = screenshot.resize((new_width, new_height))
-                scaled_width, scaled_height = new_width, new_height
+                scaled_screenshot = self._scale_down(screenshot)
+                scaled_width, scaled_height = scaled_screenshot.size
             else:
                 # 不缩放，直接使用原始截图
                 scaled_screenshot = screenshot
                 scaled_width, scaled_height = original_width, original_height
             
-            # 更新坐标转换器的分辨率信息
+            # 更新坐标转换器的分辨率信息，分辨率不变时转换器不会重新计算
             if coordinate_converter:
-                coordinate_converter.set_original_resolution(original_width, original_height)
-                coordinate_converter.set_scaled_resolution(scaled_width, scaled_height)
+                coordinate_converter.set_resolution(original_width, original_height, scaled_width, scaled_height)
             
             # 将截图保存到内存缓冲区
             img_buffer = io.BytesIO()
-            scaled_screenshot.save(img_buffer, format='PNG')
+            if self._pil_format == 'JPEG' and scaled_screenshot.mode != 'RGB':
+                # JPEG不支持透明通道，截图也不需要
+                scaled_screenshot = scaled_screenshot.convert('RGB')
+            scaled_screenshot.save(img_buffer, format=self._pil_format, **self._save_options)
             img_buffer.seek(0)
             
             return img_buffer, original_width, original_height, scaled_width, scaled_height
             
-        except (OSError, PermissionError) as e:
+        except _CAPTURE_ERRORS as e:
              # 屏幕截图失败，通常是由于权限不足
-             error_msg = f"屏幕截图失败: {str(e)}"
-             print(f"❌ {error_msg}")
-             print("💡 任务已自动变为暂停状态，请手动处理后继续")
+             logging.error("屏幕截图失败: %s，任务已自动变为暂停状态，请手动处理后继续", e)
              
              # 抛出更明确的异常
              raise PermissionError(f"屏幕截图失败，任务已暂停。原始错误: {str(e)}")
     
+    def capture_screenshot_base64(self, coordinate_converter=None, scale_screenshot=True):
+        """
+        截取当前屏幕截图并直接编码为base64，只需要base64时优先使用此方法
+        :param coordinate_converter: 坐标转换器实例，如果提供会自动更新分辨率信息
+        :param scale_screenshot: 是否缩放截图，默认为True。如果为False，则使用原始分辨率
+        :return: (base64_image, original_width, original_height, scaled_width, scaled_height)
+        :raises: PermissionError 当屏幕截图权限不足时抛出
+        """
+        img_buffer, original_width, original_height, scaled_width, scaled_height = \
+            self.capture_screenshot(coordinate_converter, scale_screenshot)
+        return self.encode_image_to_base64(img_buffer), original_width, original_height, scaled_width, scaled_height
+    
     @staticmethod
     def encode_image_to_base64(image_buffer):
         """
@@ -76,4 +144,6 @@ class ScreenshotUtils:
         :param image_buffer: 图片内存缓冲区
         :return: base64编码的字符串
         """
-        return base64.b64encode(image_buffer.read()).decode('utf-8')
+        # 直接使用缓冲区视图，避免复制整张图片；base64输出只含ASCII字符
+        with image_buffer.getbuffer() as view:
+            return base64.b64encode(view).decode('ascii')
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+步骤信息提取工具模块 - 从模型响应中按关键词提取关键步骤
+"""
+
+import re
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# 定义关键动作关键词
+ACTION_KEYWORDS = (
+    "打开", "搜索", "点击", "输入", "关闭", "切换", "启动", "运行", "执行", "找到", "选择", "确认", "访问", "进入", "导航",
+    "open", "search", "click", "type", "close", "switch", "start", "run", "execute", "find", "select", "confirm", "visit", "enter", "navigate"
+)
+
+# 定义步骤指示词
+STEP_INDICATORS = (
+    "首先", "然后", "接下来", "之后", "最后", "现在", "我需要", "我将", "第一步", "第二步", "第三步",
+    "first", "then", "next", "after", "finally", "now", "i need to", "i will", "step 1", "step 2", "step 3"
+)
+
+# 定义目标关键词
+TARGET_KEYWORDS = (
+    "浏览器", "网页", "网站", "搜索", "链接", "地址", "url", "tab", "窗口",
+    "browser", "web", "website", "search", "link", "address", "window"
+)
+
+
+def _compile_keywords(keywords):
+    """将关键词列表编译为忽略大小写的正则选择分支"""
+    return re.compile(r"(?:" + "|".join(re.escape(keyword) for keyword in keywords) + r")", re.IGNORECASE)
+
+
+_ACTION_RE = _compile_keywords(ACTION_KEYWORDS)
+_INDICATOR_RE = _compile_keywords(STEP_INDICATORS)
+_TARGET_RE = _compile_keywords(TARGET_KEYWORDS)
+
+
+def _build_keyword_automaton():
+    """将三类关键词构建为一个Aho-Corasick自动机，未安装pyahocorasick时返回None"""
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for tier, keywords in (("indicator", STEP_INDICATORS), ("action", ACTION_KEYWORDS), ("target", TARGET_KEYWORDS)):
+        for keyword in keywords:
+            keyword = keyword.casefold()
+            # 同一关键词可能属于多个类别（如"搜索"），合并记录
+            if keyword in automaton:
+                automaton.add_word(keyword, automaton.get(keyword) | {tier})
+            else:
+                automaton.add_word(keyword, frozenset((tier,)))
+    automaton.make_automaton()
+    return automaton
+
+
+_KEYWORD_AUTOMATON = _build_keyword_automaton()
+
+
+def _matched_tiers(message):
+    """
+    对整条消息扫描一次，返回出现过关键词的类别集合
+    :param message: 模型响应文本
+    :return: "indicator"、"action"、"target" 的子集
+    """
+    if _KEYWORD_AUTOMATON is not None:
+        tiers = set()
+        for _, found in _KEYWORD_AUTOMATON.iter(message.casefold()):
+            tiers |= found
+        return tiers
+    
+    tiers = set()
+    if _INDICATOR_RE.search(message):
+        tiers.add("indicator")
+    if _ACTION_RE.search(message):
+        tiers.add("action")
+    if _TARGET_RE.search(message):
+        tiers.add("target")
+    return tiers
+
+
+def extract_step_info(message):
+    """
+    从模型响应中提取关键步骤信息
+    :param message: 模型响应文本
+    :return: 不超过50个字符的步骤描述，未找到时返回None
+    """
+    # 先对整条消息扫描一次，只对命中的类别逐句检查
+    tiers = _matched_tiers(message)
+    # 只切分一次句子，关键词匹配交给预编译的正则（忽略大小写）
+    sentences = [sentence.strip() for sentence in message.split("。")]
+    
+    # 检查是否包含步骤指示词
+    if "indicator" in tiers:
+        for step in sentences:
+            if len(step) > 5 and _INDICATOR_RE.search(step):
+                return step[:50] + "..." if len(step) > 50 else step
+    
+    # 检查是否包含动作+目标的组合
+    if "action" in tiers and "target" in tiers:
+        for step in sentences:
+            if len(step) > 5 and _ACTION_RE.search(step) and _TARGET_RE.search(step):
+                return step[:50] + "..." if len(step) > 50 else step
+    
+    # 检查是否包含关键动作
+    if "action" in tiers:
+        for step in sentences:
+            if len(step) > 5 and _ACTION_RE.search(step):
+                return step[:50] + "..." if len(step) > 50 else step
+    
+    # 如果没有找到明确的动作，尝试提取第一句话
+    if sentences and len(sentences[0]) > 10:
+        first_sentence = sentences[0]
+        return first_sentence[:50] + "..." if len(first_sentence) > 50 else first_sentence
+    
+    return None
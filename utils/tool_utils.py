@@ -5,12 +5,179 @@
 """
 
 import re
-import time
+import math
+from time import sleep as _sleep, perf_counter_ns as _perf_counter_ns
 import pyautogui
 import subprocess
+import shutil
 import platform
 import os
+import logging
+from collections import Counter
+from functools import lru_cache
 from utils.adapter_utils import get_adapter_utils
+from utils import input_utils
+
+# 常用的 pyautogui 函数绑定为模块级名称，每次调用省去一次模块属性查找
+_move_to = pyautogui.moveTo
+_drag_to = pyautogui.dragTo
+_click = pyautogui.click
+_mouse_down = pyautogui.mouseDown
+_mouse_up = pyautogui.mouseUp
+_scroll = pyautogui.scroll
+_press = pyautogui.press
+_hotkey = pyautogui.hotkey
+_typewrite = pyautogui.typewrite
+_screen_size = pyautogui.size
+_ease_in_out_quad = pyautogui.easeInOutQuad
+
+# 鼠标位置偏差超过2像素时的最大微调次数
+_MAX_CORRECTIONS = 2
+
+# 鼠标操作 -> (已移动时的描述, 未移动时的描述, 操作描述, 多次点击的间隔)
+_MOUSE_ACTIONS = {
+    'click': ("已移动并", "直接", "{clicks}次{button}键点击", 0.03),
+    'double_click': ("高精度移动后", "原地", "进行{button}键双击", 0.05),
+    'hover': ("高精度移动后", "原地", "悬停", None),
+    'down': ("高精度移动后", "原地", "按下{button}键", None),
+    'up': ("高精度移动后", "原地", "释放{button}键", None),
+}
+
+# 鼠标操作路径通过 input_utils 直接操作鼠标（Windows 下调用 Win32 API），
+# 其余调用传入 _pause=False，都不经过 pyautogui.PAUSE 的全局等待，需要的等待由 _POST_ACTION_DELAYS 显式控制
+
+# 各操作完成后等待界面响应的时间（秒）
+_POST_ACTION_DELAYS = {
+    'click': 0.08,
+    'taskbar_click': 0.4,  # 任务栏应用启动需要更长时间
+    'double_click': 0.15,
+    'scroll': 0.1,
+    'type': 0.1,
+    'down': 0.05,
+    'up': 0.05,
+}
+# 设置环境变量 TOOLUTILS_SPEED=fast 时所有等待时间乘以该系数
+_FAST_DELAY_FACTOR = 0.3
+
+# 鼠标移动平均耗时超过该值（纳秒）时视为系统繁忙，跳过位置微调，只保留最终目标
+_SLOW_MOVE_NS = 20_000_000
+# 移动耗时指数移动平均的平滑系数
+_MOVE_LATENCY_ALPHA = 0.2
+
+# 快捷键按键别名
+_HOTKEY_ALIASES = {'win': 'winleft', 'windows': 'winleft'}
+# 批量操作快捷键，执行前后需要额外等待
+_BATCH_SHORTCUTS = frozenset({('ctrl', 'a'), ('ctrl', 'c'), ('ctrl', 'v'), ('ctrl', 'x'), ('ctrl', 'z'), ('ctrl', 'y')})
+
+# Linux 下按顺序尝试的终端程序
+_LINUX_TERMINALS = ("gnome-terminal", "konsole", "xterm", "terminal")
+# 找到的终端程序路径，首次打开终端时查找
+_linux_terminal = None
+
+# 精确等待时最后忙等的时长（纳秒），系统定时器精度较低时 sleep 可能多睡数毫秒
+_SPIN_TAIL_NS = 2_000_000
+
+# 工具调用标签
+_TOOL_CALL_TAG = '<|tool_call|>'
+
+# 工具调用扫描优先使用基于DFA的 RE2（google-re2），线性时间且不回溯；未安装时使用标准库 re
+try:
+    import re2 as _scan_re
+except ImportError:
+    _scan_re = re
+
+# 工具调用解析用的正则，预编译避免每次解析重复查找缓存
+# 三种格式合并为一个分支正则，一次扫描完成匹配，同一位置按分支顺序优先：
+# full  完整格式 <|tool_call|>function_name(params)<|tool_call|>
+# simple 简化格式 function_name(params)<|tool_call|>
+# bare  无标签格式，只匹配行尾或句末的已知工具，避免误匹配
+# RE2不支持前瞻断言，行尾/句末条件写成非捕获分组，调用内容只取命名分组
+_BARE_CALL_PATTERN = r'(?P<bare>(?:mouse_click|type_text|scroll_window|close_window|clear_input|wait|press_hotkey|pause_task|complete_task)\s*\([^)]*\))(?:\s*\n|$|\.)'
+_TOOL_CALL_RE = _scan_re.compile(
+    r'(?s)<\|tool_call\|>(?P<full>.*?)<\|tool_call\|>'
+    r'|(?P<simple>[a-zA-Z_][a-zA-Z0-9_]*\s*\([^)]*\))\s*<\|tool_call\|>'
+    r'|' + _BARE_CALL_PATTERN
+)
+# 响应中没有标签时只可能是无标签格式
+_BARE_CALL_RE = _scan_re.compile(_BARE_CALL_PATTERN)
+# 函数名和参数
+_FUNCTION_RE = re.compile(r'^\s*([a-zA-Z_][a-zA-Z0-9_]*)\s*\((.*?)\)\s*$')
+# 参数名和值，支持字符串值；值的类型由匹配到的分组决定
+_ARG_RE = re.compile(r'\s*([a-zA-Z_][a-zA-Z0-9_]*)\s*=\s*(?:"(?P<str>[^"]*)"|(?P<float>\d+\.\d+)|(?P<int>\d+)|(?P<word>\w+))\s*')
+# 参数值分组 -> 类型转换
+_ARG_CONVERTERS = {'str': str, 'float': float, 'int': int, 'word': str}
+
+def _clamp(value, low, high):
+    """
+    将数值限制在 [low, high] 内，结果与 max(low, min(high, value)) 相同，省去两次内置函数调用
+    """
+    value = high if value > high else value
+    return low if value < low else value
+
+def _find_linux_terminal():
+    """
+    查找可用的终端程序，找到后缓存；没有找到时返回None，下次调用重新查找
+    """
+    global _linux_terminal
+    if _linux_terminal is None:
+        _linux_terminal = next(filter(None, map(shutil.which, _LINUX_TERMINALS)), None)
+    return _linux_terminal
+
+def _launch_windows_terminal(command):
+    """
+    在新的命令提示符窗口中执行命令
+    """
+    if not command:
+        # 不需要传参时通过 ShellExecute 启动，省去 subprocess 的进程和管道设置
+        os.startfile("cmd.exe")
+        return True
+    return subprocess.Popen(["cmd.exe", "/k", command], creationflags=subprocess.CREATE_NEW_CONSOLE)
+
+def _launch_linux_terminal(command):
+    """
+    在找到的终端程序中执行命令，执行后保留bash会话
+    """
+    # 在PATH中查找可用的终端，避免逐个启动不存在的程序
+    terminal = _find_linux_terminal()
+    if terminal is None:
+        return None
+    if command:
+        return subprocess.Popen([terminal, "-e", f"bash -c '{command}; exec bash'"])
+    return subprocess.Popen([terminal])
+
+def _launch_macos_terminal(command):
+    """
+    在 macOS 终端中执行命令
+    """
+    if command:
+        return subprocess.Popen(["open", "-a", "Terminal", "--args", "-c", command])
+    return subprocess.Popen(["open", "-a", "Terminal"])
+
+# 操作系统 -> 打开终端的函数，返回启动的进程（或True），没有可用终端时返回None
+_TERMINAL_LAUNCHERS = {
+    "Windows": _launch_windows_terminal,
+    "Linux": _launch_linux_terminal,
+    "Darwin": _launch_macos_terminal,
+}
+
+@lru_cache(maxsize=256)
+def _normalize_hotkey(hotkey):
+    """
+    解析快捷键字符串，支持多种格式（如"ctrl+a"或"ctrl + a"），按键名称转为小写并处理常见别名
+    :return: 按键名称元组
+    """
+    return tuple(_HOTKEY_ALIASES.get(part, part) for part in hotkey.replace(' ', '').lower().split('+'))
+
+def _precise_sleep(seconds):
+    """
+    精确等待：先用 sleep 睡到截止时间前 _SPIN_TAIL_NS，剩余部分忙等，避免定时器精度造成的抖动
+    """
+    deadline = _perf_counter_ns() + int(seconds * 1e9)
+    coarse = seconds - _SPIN_TAIL_NS / 1e9
+    if coarse > 0:
+        _sleep(coarse)
+    while _perf_counter_ns() < deadline:
+        pass
 
 class ToolUtils:
     """
@@ -20,6 +187,38 @@ class ToolUtils:
     def __init__(self, coordinate_converter):
         self.coordinate_converter = coordinate_converter
         self.adapter_utils = get_adapter_utils()
+        # 语音工具（可选），由调用方设置后暂停任务时播放语音提示
+        self.voice_utils = None
+        
+        # 屏幕尺寸和操作系统在运行期间基本不变，初始化时获取一次
+        self.refresh_screen_size()
+        self._system = platform.system()
+        self._paste_hotkey = ('command', 'v') if self._system == "Darwin" else ('ctrl', 'v')
+        
+        # 设置环境变量 TOOLUTILS_DEBUG=1 时输出工具调用解析详情
+        self._debug = os.environ.get('TOOLUTILS_DEBUG') == '1'
+        # 设置环境变量 TOOLUTILS_VERIFY_CURSOR=1 时在移动后读取鼠标位置校验偏差
+        # 绝对定位移动一般都能准确到位，默认跳过校验省去一次系统调用
+        self._verify_cursor = os.environ.get('TOOLUTILS_VERIFY_CURSOR') == '1'
+        # 鼠标操作结果是否附带实际位置、移动距离和误差；不校验位置时这些值与目标相同，默认省略
+        # 设置环境变量 TOOLUTILS_VERBOSE=1 时总是附带
+        self.verbose = self._verify_cursor or os.environ.get('TOOLUTILS_VERBOSE') == '1'
+        
+        # 操作后的等待时间，界面不需要等待时可设置 TOOLUTILS_SPEED=fast 缩短
+        delay_factor = _FAST_DELAY_FACTOR if os.environ.get('TOOLUTILS_SPEED') == 'fast' else 1.0
+        self._post_delay = {action: delay * delay_factor for action, delay in _POST_ACTION_DELAYS.items()}
+        
+        # (adapter_id, 目标类型) -> 比例坐标到屏幕坐标的线性变换参数，分辨率或适配器变化时清空
+        self._xform_cache = {}
+        self._xform_version = None
+        
+        # 上一次解析的 (响应文本, 工具调用列表)，同一响应被重复解析时直接复用
+        self._last_parse = (None, [])
+        
+        # 自适应节流：记录鼠标移动耗时的指数移动平均，系统繁忙时减少移动次数
+        self.adaptive = True
+        self._ema_move_latency_ns = 0
+        
         self.tools = {
             'mouse_click': self.mouse_click,
             'double_click': self.double_click,
@@ -41,12 +240,86 @@ class ToolUtils:
             'complete_task': self.complete_task
         }
     
+    def refresh_screen_size(self):
+        """
+        重新获取屏幕尺寸，屏幕分辨率变化后调用
+        """
+        self._screen_width, self._screen_height = _screen_size()
+        # 任务栏通常在屏幕底部5%区域内
+        self._taskbar_y_threshold = self._screen_height * 0.95
+    
+    def _xform(self, adapter_id, kind):
+        """
+        获取适配器调整与坐标转换合并后的线性变换参数
+        actual = proportion * scale + offset，再裁剪到 [min_xy, max]
+        
+        返回:
+        - (scale_x, scale_y, offset_x, offset_y, min_xy, max_x, max_y)
+        """
+        converter = self.coordinate_converter
+        version = (converter.version, self.adapter_utils.version)
+        if version != self._xform_version:
+            self._xform_cache.clear()
+            self._xform_version = version
+        
+        xform = self._xform_cache.get((adapter_id, kind))
+        if xform is None:
+            width = float(converter.original_width)
+            height = float(converter.original_height)
+            offset_x, offset_y = self.adapter_utils.get_adjustment(adapter_id, kind)
+            # 与 apply_adjustment 先裁剪到0-1、convert_proportion_to_actual 再裁剪到安全边距的结果相同
+            margin = float(converter.SAFE_MARGIN)
+            xform = (width, height, offset_x * width, offset_y * height,
+                     margin, max(width - margin, margin), max(height - margin, margin))
+            self._xform_cache[(adapter_id, kind)] = xform
+        return xform
+    
+    def _to_actual(self, x, y, adapter_id, kind):
+        """
+        将比例坐标经过适配器调整后转换为实际屏幕坐标
+        """
+        scale_x, scale_y, offset_x, offset_y, min_xy, max_x, max_y = self._xform(adapter_id, kind)
+        actual_x = float(x) * scale_x + offset_x
+        actual_y = float(y) * scale_y + offset_y
+        actual_x = min_xy if actual_x < min_xy else max_x if actual_x > max_x else actual_x
+        actual_y = min_xy if actual_y < min_xy else max_y if actual_y > max_y else actual_y
+        return actual_x, actual_y
+    
     def parse_tool_calls(self, response_text):
         """
         从模型响应中解析工具调用
         :param response_text: 模型响应文本
         :return: 工具调用列表
         """
+        last_text, tool_calls = self._last_parse
+        if response_text != last_text:
+            tool_calls = self._parse_tool_calls(response_text)
+            self._last_parse = (response_text, tool_calls)
+        # 返回副本，调用方修改结果不会影响缓存
+        return [{'name': call['name'], 'arguments': dict(call['arguments'])} for call in tool_calls]
+    
+    def parse_closed_tool_calls(self, partial_text):
+        """
+        从尚未接收完的模型响应中解析已经闭合的完整格式工具调用
+        遇到其他格式的匹配即停止，之后的内容可能随后续文本变化，留给完整响应解析
+        :param partial_text: 已接收的响应文本
+        :return: 工具调用列表，是完整响应解析结果的前缀
+        """
+        if _TOOL_CALL_TAG not in partial_text:
+            return []
+        end = 0
+        for match in _TOOL_CALL_RE.finditer(partial_text):
+            if match.lastgroup != 'full':
+                break
+            end = match.end()
+        if not end:
+            return []
+        return self._parse_tool_calls(partial_text[:end])
+
+    def _parse_tool_calls(self, response_text):
+        """
+        解析工具调用，parse_tool_calls 的未缓存实现
+        """
         tool_calls = []
         
         # 支持三种工具调用格式：
@@ -54,79 +327,53 @@ class ToolUtils:
         # 2. function_name(param1=value1, param2=value2)<|tool_call|>               (简化格式)
         # 3. function_name(param1=value1, param2=value2)                           (无标签格式)
         
-        # 按优先级匹配，避免重复
-        
-        # 首先匹配完整格式 <|tool_call|>function_name(params)<|tool_call|>
-        pattern1 = r'<\|tool_call\|>([^<\|tool_call\|>]*?)<\|tool_call\|>'
-        matches1 = re.findall(pattern1, response_text, re.DOTALL)
-        
-        # 然后匹配简化格式 function_name(params)<|tool_call|>，排除已被完整格式匹配的内容
-        pattern2 = r'([a-zA-Z_][a-zA-Z0-9_]*\s*\([^)]*\))\s*<\|tool_call\|>'
-        matches2 = re.findall(pattern2, response_text)
-        
-        # 最后匹配无标签格式（只在行尾或句末，避免误匹配）
-        # 限制匹配范围：只匹配行尾或句子结束的无标签工具调用
-        pattern3 = r'(mouse_click|type_text|scroll_window|close_window|clear_input|wait|press_hotkey|pause_task|complete_task)\s*\([^)]*\)(?=\s*\n|$|\.)'
-        matches3 = re.findall(pattern3, response_text)
-        # 重新匹配完整内容以获得参数部分
-        if matches3:
-            full_pattern3 = r'((mouse_click|type_text|scroll_window|close_window|clear_input|wait|press_hotkey|pause_task|complete_task)\s*\([^)]*\))(?=\s*\n|$|\.)'
-            full_matches3 = re.findall(full_pattern3, response_text)
-            matches3 = [match[0] for match in full_matches3]
-        
-        # 合并匹配结果，但避免重复
-        all_matches = []
-        seen_matches = set()
-        
-        for match_list in [matches1, matches2, matches3]:
-            for match in match_list:
-                if match not in seen_matches:
-                    all_matches.append(match)
-                    seen_matches.add(match)
-        
-        print(f"工具调用匹配详情:")
-        print(f"  完整格式匹配: {len(matches1)} 个")
-        print(f"  简化格式匹配: {len(matches2)} 个") 
-        print(f"  无标签格式匹配: {len(matches3)} 个")
-        print(f"  去重后总数: {len(all_matches)} 个")
+        # 每种格式都需要括号，没有括号时不可能有工具调用，直接跳过正则匹配
+        if '(' not in response_text:
+            if self._debug:
+                print("工具调用匹配详情: 响应中没有工具调用")
+            return tool_calls
+        
+        # 单次扫描匹配三种格式，按出现顺序去重
+        call_re = _TOOL_CALL_RE if _TOOL_CALL_TAG in response_text else _BARE_CALL_RE
+        matches = [(m.lastgroup, m.group(m.lastgroup)) for m in call_re.finditer(response_text)]
+        format_counts = Counter(kind for kind, _ in matches)
+        # 去掉完整格式标签内的首尾空白，使相同的调用能够去重；dict保持插入顺序
+        all_matches = list(dict.fromkeys(match.strip() for _, match in matches))
+        
+        debug = self._debug
+        if debug:
+            print(f"工具调用匹配详情:")
+            print(f"  完整格式匹配: {format_counts['full']} 个")
+            print(f"  简化格式匹配: {format_counts['simple']} 个") 
+            print(f"  无标签格式匹配: {format_counts['bare']} 个")
+            print(f"  去重后总数: {len(all_matches)} 个")
         
         for match in all_matches:
             # 解析函数名和参数
-            function_pattern = r'^\s*([a-zA-Z_][a-zA-Z0-9_]*)\s*\((.*?)\)\s*$'
-            function_match = re.match(function_pattern, match)
+            function_match = _FUNCTION_RE.match(match)
             if not function_match:
-                print(f"    跳过无法解析的匹配: {repr(match)}")
+                if debug:
+                    print(f"    跳过无法解析的匹配: {repr(match)}")
                 continue
             
             function_name = function_match.group(1)
             args_str = function_match.group(2)
             
-            print(f"    解析工具调用: {function_name}({args_str})")
+            if debug:
+                print(f"    解析工具调用: {function_name}({args_str})")
             
             # 解析参数
             args = {}
             if args_str.strip():
                 # 匹配参数名和值，支持字符串值
-                arg_pattern = r'\s*([a-zA-Z_][a-zA-Z0-9_]*)\s*=\s*("[^"]*"|\d+\.\d+|\d+|\w+)\s*'
-                arg_matches = re.findall(arg_pattern, args_str)
-                
-                for arg_name, arg_value in arg_matches:
-                    # 处理字符串值
-                    if arg_value.startswith('"') and arg_value.endswith('"'):
-                        arg_value = arg_value[1:-1]
-                    # 处理数值
-                    elif '.' in arg_value:
-                        try:
-                            arg_value = float(arg_value)
-                        except ValueError:
-                            pass
-                    elif arg_value.isdigit():
-                        arg_value = int(arg_value)
-                    
-                    args[arg_name] = arg_value
+                for arg_match in _ARG_RE.finditer(args_str):
+                    # 引号内为字符串，数字按整数或浮点数转换，其余保持原样
+                    kind = arg_match.lastgroup
+                    args[arg_match.group(1)] = _ARG_CONVERTERS[kind](arg_match.group(kind))
                 
-                print(f"      解析后的参数: {args}")
-            else:
+                if debug:
+                    print(f"      解析后的参数: {args}")
+            elif debug:
                 print(f"      无参数")
             
             tool_calls.append({
@@ -142,121 +389,185 @@ class ToolUtils:
         :param tool_calls: 工具调用列表
         :return: 执行结果字符串
         """
-        results = []
-        for call in tool_calls:
+        # 每个工具调用对应一条结果，预先分配好列表
+        results = [None] * len(tool_calls)
+        tools_get = self.tools.get
+        for i, call in enumerate(tool_calls):
             func_name = call["name"]
-            args = call["arguments"]
             
-            if func_name in self.tools:
-                try:
-                    result = self.tools[func_name](**args)
-                    results.append(f"工具 {func_name} 执行结果: {result}")
-                except Exception as e:
-                    results.append(f"执行工具 {func_name} 时出错: {str(e)}")
-            else:
-                results.append(f"未知工具: {func_name}")
+            tool = tools_get(func_name)
+            if tool is None:
+                results[i] = f"未知工具: {func_name}"
+                continue
+            
+            try:
+                result = tool(**call["arguments"])
+                results[i] = f"工具 {func_name} 执行结果: {result}"
+            except Exception as e:
+                results[i] = f"执行工具 {func_name} 时出错: {str(e)}"
         
         return "\n".join(results)
     
-    def mouse_click(self, x, y, button="left", clicks=1, adapter_id=None, move_first=True):
+    def _precise_move_to(self, actual_x, actual_y, move_first, release_button=None):
         """
-        鼠标点击工具 - 使用比例坐标 (0-1之间的浮点数)
+        将鼠标精确移动到目标位置，开启校验且偏差超过2像素时微调
         
         参数:
-        - x, y: 比例坐标
+        - actual_x, actual_y: 目标屏幕坐标（浮点数）
+        - move_first: 是否先移动鼠标 (True先移动，False智能判断，距离超过50像素才移动)
+        - release_button: 不校验位置时，移动的同时释放该鼠标按钮（可选）
+        
+        返回:
+        - (moved, final_x, final_y, distance_to_target, x_error, y_error)
+          移动后且结果不需要报告详情（self.verbose 为False）时 distance_to_target 为None
+        """
+        if move_first and not self.verbose:
+            # 一定会移动且不报告移动距离，无需读取当前位置
+            distance_to_target = None
+        else:
+            # 获取当前鼠标位置（使用浮点数），只比较距离的平方，需要报告时才开方
+            current_x, current_y = input_utils.position()
+            dx = current_x - actual_x
+            dy = current_y - actual_y
+            distance_sq = dx * dx + dy * dy
+            
+            # 智能判断是否需要移动鼠标
+            if not move_first and distance_sq <= 2500.0:
+                # 鼠标已在附近，原地操作
+                return False, current_x, current_y, math.sqrt(distance_sq), abs(dx), abs(dy)
+            distance_to_target = math.sqrt(distance_sq) if self.verbose else None
+        
+        if release_button is not None and not self._verify_cursor:
+            # 移动和释放合并为一次调用
+            input_utils.move_and_release(actual_x, actual_y, release_button)
+            return True, actual_x, actual_y, distance_to_target, 0, 0
+        
+        # 移动鼠标到目标位置，一次移动即可
+        self._timed_move_to(actual_x, actual_y)
+        
+        if not self._verify_cursor:
+            # 不校验时认为鼠标已准确到达目标位置
+            return True, actual_x, actual_y, distance_to_target, 0, 0
+        
+        # 精确验证鼠标位置（使用更高精度的偏差阈值）
+        final_x, final_y = input_utils.position()
+        x_error = abs(final_x - actual_x)
+        y_error = abs(final_y - actual_y)
+        
+        # 如果位置偏差超过2像素，直接移回目标位置进行微调
+        # 每次moveTo都有固定的系统延迟，分多步小幅移动并不会更精确，最多重试有限次数
+        for _ in range(_MAX_CORRECTIONS):
+            dx = final_x - actual_x
+            dy = final_y - actual_y
+            if dx * dx + dy * dy <= 4.0:
+                break
+            # 移动耗时过高时继续微调只会让输入事件积压，放弃微调
+            if self.adaptive and self._ema_move_latency_ns > _SLOW_MOVE_NS:
+                break
+            self._timed_move_to(actual_x, actual_y)
+            final_x, final_y = input_utils.position()
+        
+        return True, final_x, final_y, distance_to_target, x_error, y_error
+    
+    def _timed_move_to(self, x, y):
+        """
+        移动鼠标并更新移动耗时的指数移动平均
+        """
+        start = _perf_counter_ns()
+        input_utils.move_to(x, y)
+        latency = _perf_counter_ns() - start
+        self._ema_move_latency_ns += int((latency - self._ema_move_latency_ns) * _MOVE_LATENCY_ALPHA)
+    
+    def _do_action(self, x, y, action, button="left", clicks=1, adapter_id=None, move_first=True):
+        """
+        鼠标操作的公共实现：转换坐标、移动鼠标并校正偏差，再执行指定操作
+        
+        参数:
+        - x, y: 比例坐标 (0-1)
+        - action: 操作类型 (click/double_click/hover/down/up)
         - button: 鼠标按钮 (left/right)
-        - clicks: 点击次数 (1/2)
+        - clicks: 点击次数，仅 click 使用
         - adapter_id: 适配器ID (可选)
         - move_first: 是否先移动鼠标 (True先移动，False智能判断)
         """
-        # 应用适配器调整
-        adjusted_x, adjusted_y = self.adapter_utils.apply_adjustment(x, y, adapter_id, 'click')
+        moved_text, unmoved_text, action_text, interval = _MOUSE_ACTIONS[action]
+        if action == 'double_click':
+            clicks = 2
+        action_text = action_text.format(clicks=clicks, button=button)
         
-        # 将比例坐标转换为实际屏幕坐标，保留更高精度
-        actual_x, actual_y = self.coordinate_converter.convert_proportion_to_actual(adjusted_x, adjusted_y)
-        
-        # 获取屏幕尺寸
-        screen_width, screen_height = pyautogui.size()
+        # 应用适配器调整，将比例坐标转换为实际屏幕坐标，保留更高精度
+        actual_x, actual_y = self._to_actual(x, y, adapter_id, 'click')
         
         # 确保坐标在屏幕范围内，使用浮点数计算避免过早损失精度
         # 添加安全边距，避免触发 PyAutoGUI fail-safe（屏幕角落）
-        safe_margin = 5  # 距离边缘5像素的安全边距
-        actual_x = max(float(safe_margin), min(float(screen_width - safe_margin), actual_x))
-        actual_y = max(float(safe_margin), min(float(screen_height - safe_margin), actual_y))
+        safe_margin = 5.0  # 距离边缘5像素的安全边距
+        actual_x = _clamp(actual_x, safe_margin, self._screen_width - safe_margin)
+        actual_y = _clamp(actual_y, safe_margin, self._screen_height - safe_margin)
+        
+        # 操作后的等待时间，点击任务栏区域（y坐标接近屏幕底部）时等待更长
+        if action == 'click':
+            delay = self._post_delay['taskbar_click' if actual_y > self._taskbar_y_threshold else 'click']
+        else:
+            delay = self._post_delay.get(action, 0)
         
         try:
-            # 获取当前鼠标位置（使用浮点数）
-            current_x, current_y = pyautogui.position()
-            distance_to_target = ((current_x - actual_x) ** 2 + (current_y - actual_y) ** 2) ** 0.5
-            
-            # 智能判断是否需要移动鼠标
-            if move_first or distance_to_target > 50:  # 距离超过50像素或明确要求移动
-                # 平滑移动鼠标到目标位置（提高精度），使用亚像素精度
-                # 先移动到接近位置
-                intermediate_x = actual_x + (actual_x - current_x) * 0.8
-                intermediate_y = actual_y + (actual_y - current_y) * 0.8
-                
-                if abs(intermediate_x - current_x) > 10 or abs(intermediate_y - current_y) > 10:
-                    pyautogui.moveTo(intermediate_x, intermediate_y, duration=0.05)
-                
-                # 最终精确移动
-                pyautogui.moveTo(actual_x, actual_y, duration=0.05, tween=pyautogui.easeInOutQuad)
-                
-                # 精确验证鼠标位置（使用更高精度的偏差阈值）
-                final_x, final_y = pyautogui.position()
-                x_error = abs(final_x - actual_x)
-                y_error = abs(final_y - actual_y)
-                
-                # 如果位置偏差超过2像素，进行精细微调
-                if x_error > 2 or y_error > 2:
-                    # 计算修正方向
-                    correction_x = actual_x - final_x
-                    correction_y = actual_y - final_y
-                    
-                    # 分步微调，避免过度校正
-                    steps = max(int(max(x_error, y_error) / 2), 1)  # 每步最多移动2像素
-                    step_x = correction_x / steps
-                    step_y = correction_y / steps
-                    
-                    for i in range(steps):
-                        temp_x = final_x + step_x * (i + 1)
-                        temp_y = final_y + step_y * (i + 1)
-                        pyautogui.moveTo(temp_x, temp_y, duration=0.02)
-                    
-                    # 最终验证
-                    final_x, final_y = pyautogui.position()
-                
-                move_action = "已移动并"
+            # 移动鼠标到目标位置并校正偏差
+            # 释放鼠标时移动和释放可以合并执行，合并后事件不会交错，不需要再等待
+            release_button = button if action == 'up' else None
+            moved, final_x, final_y, distance_to_target, x_error, y_error = self._precise_move_to(actual_x, actual_y, move_first, release_button)
+            if release_button is not None and moved and not self._verify_cursor:
+                delay = 0
             else:
-                # 鼠标已在附近，直接点击
-                final_x, final_y = current_x, current_y
-                move_action = "直接"
+                self._mouse_action(action, button, clicks, interval)
+            if delay:
+                _precise_sleep(delay)
             
             # 在最后时刻转换为整数，确保最小精度损失
-            click_x = int(round(actual_x))
-            click_y = int(round(actual_y))
-            final_click_x = int(round(final_x))
-            final_click_y = int(round(final_y))
-            
-            # 执行点击操作，使用更精确的点击方式
-            pyautogui.click(button=button, clicks=clicks, interval=0.03)
-            
-            # 短暂等待，确保点击生效
-            # 如果点击的是任务栏区域（y坐标接近屏幕底部），增加等待时间
-            if actual_y > screen_height * 0.95:  # 任务栏通常在屏幕底部5%区域内
-                time.sleep(0.4)  # 任务栏应用启动需要更长时间
-            else:
-                time.sleep(0.08)
-            
-            return f"{move_action}在坐标 ({click_x}, {click_y}) 处{clicks}次{button}键点击（实际位置: ({final_click_x}, {final_click_y})，移动距离: {int(distance_to_target)}像素，误差: X{int(x_error)}px, Y{int(y_error)}px）"
+            result = f"{moved_text if moved else unmoved_text}在坐标 ({int(round(actual_x))}, {int(round(actual_y))}) 处{action_text}"
+            # 未移动时在当前位置操作，实际位置与目标不同，需要附带详情
+            if not self.verbose and moved:
+                return result
+            return (f"{result}（实际位置: ({int(round(final_x))}, {int(round(final_y))})，移动距离: {int(distance_to_target)}像素，"
+                    f"误差: X{int(x_error)}px, Y{int(y_error)}px）")
         except Exception as e:
-            # 异常情况下的备用点击方式
-            print(f"精确点击失败，使用备用方式: {str(e)}")
+            # 异常情况下改用 pyautogui 移动到目标位置后执行操作
+            logging.warning(f"精确鼠标操作 {action} 失败，使用备用方式: {str(e)}")
             backup_x = int(round(actual_x))
             backup_y = int(round(actual_y))
-            pyautogui.click(backup_x, backup_y, button=button, clicks=clicks)
-            time.sleep(0.1)
-            return f"使用备用方式在坐标 ({backup_x}, {backup_y}) 处{clicks}次{button}键点击"
+            _move_to(backup_x, backup_y, _pause=False)
+            if interval is not None:
+                _click(button=button, clicks=clicks, interval=interval, _pause=False)
+            elif action == 'down':
+                _mouse_down(button=button, _pause=False)
+            elif action == 'up':
+                _mouse_up(button=button, _pause=False)
+            _precise_sleep(delay or 0.1)
+            return f"使用备用方式在坐标 ({backup_x}, {backup_y}) 处{action_text}"
+    
+    @staticmethod
+    def _mouse_action(action, button, clicks, interval):
+        """
+        在当前鼠标位置执行操作，悬停不做任何操作
+        """
+        if interval is not None:
+            input_utils.click(button, clicks, interval)
+        elif action == 'down':
+            input_utils.mouse_down(button)
+        elif action == 'up':
+            input_utils.mouse_up(button)
+    
+    def mouse_click(self, x, y, button="left", clicks=1, adapter_id=None, move_first=True):
+        """
+        鼠标点击工具 - 使用比例坐标 (0-1之间的浮点数)
+        
+        参数:
+        - x, y: 比例坐标
+        - button: 鼠标按钮 (left/right)
+        - clicks: 点击次数 (1/2)
+        - adapter_id: 适配器ID (可选)
+        - move_first: 是否先移动鼠标 (True先移动，False智能判断)
+        """
+        return self._do_action(x, y, 'click', button, clicks, adapter_id, move_first)
     
     def double_click(self, x, y, button="left", adapter_id=None, move_first=True):
         """
@@ -268,89 +579,7 @@ class ToolUtils:
         - adapter_id: 适配器ID (可选)
         - move_first: 是否先移动鼠标 (True先移动，False智能判断)
         """
-        # 应用适配器调整
-        adjusted_x, adjusted_y = self.adapter_utils.apply_adjustment(x, y, adapter_id, 'click')
-        
-        # 将比例坐标转换为实际屏幕坐标，保留更高精度
-        actual_x, actual_y = self.coordinate_converter.convert_proportion_to_actual(adjusted_x, adjusted_y)
-        
-        # 获取屏幕尺寸
-        screen_width, screen_height = pyautogui.size()
-        
-        # 确保坐标在屏幕范围内，使用浮点数计算避免过早损失精度
-        # 添加安全边距，避免触发 PyAutoGUI fail-safe（屏幕角落）
-        safe_margin = 5  # 距离边缘5像素的安全边距
-        actual_x = max(float(safe_margin), min(float(screen_width - safe_margin), actual_x))
-        actual_y = max(float(safe_margin), min(float(screen_height - safe_margin), actual_y))
-        
-        try:
-            # 获取当前鼠标位置（使用浮点数）
-            current_x, current_y = pyautogui.position()
-            distance_to_target = ((current_x - actual_x) ** 2 + (current_y - actual_y) ** 2) ** 0.5
-            
-            # 智能判断是否需要移动鼠标
-            if move_first or distance_to_target > 50:  # 距离超过50像素或明确要求移动
-                # 平滑移动鼠标到目标位置（提高精度），使用亚像素精度
-                # 先移动到接近位置
-                intermediate_x = actual_x + (actual_x - current_x) * 0.8
-                intermediate_y = actual_y + (actual_y - current_y) * 0.8
-                
-                if abs(intermediate_x - current_x) > 10 or abs(intermediate_y - current_y) > 10:
-                    pyautogui.moveTo(intermediate_x, intermediate_y, duration=0.05)
-                
-                # 最终精确移动
-                pyautogui.moveTo(actual_x, actual_y, duration=0.05, tween=pyautogui.easeInOutQuad)
-                
-                # 精确验证鼠标位置（使用更高精度的偏差阈值）
-                final_x, final_y = pyautogui.position()
-                x_error = abs(final_x - actual_x)
-                y_error = abs(final_y - actual_y)
-                
-                # 如果位置偏差超过2像素，进行精细微调
-                if x_error > 2 or y_error > 2:
-                    # 计算修正方向
-                    correction_x = actual_x - final_x
-                    correction_y = actual_y - final_y
-                    
-                    # 分步微调，避免过度校正
-                    steps = max(int(max(x_error, y_error) / 2), 1)  # 每步最多移动2像素
-                    step_x = correction_x / steps
-                    step_y = correction_y / steps
-                    
-                    for i in range(steps):
-                        temp_x = final_x + step_x * (i + 1)
-                        temp_y = final_y + step_y * (i + 1)
-                        pyautogui.moveTo(temp_x, temp_y, duration=0.02)
-                    
-                    # 最终验证
-                    final_x, final_y = pyautogui.position()
-                    
-                move_action = f"高精度移动后"
-            else:
-                final_x, final_y = current_x, current_y
-                move_action = "原地"
-            
-            # 执行双击操作（使用clicks=2）
-            pyautogui.click(button=button, clicks=2, interval=0.05)
-            
-            # 在最后时刻转换为整数，避免早期精度损失
-            click_x = int(round(final_x))
-            click_y = int(round(final_y))
-            final_click_x = int(round(final_x))
-            final_click_y = int(round(final_y))
-            
-            # 短暂等待，确保双击生效
-            time.sleep(0.15)  # 双击后等待稍长一些
-            
-            return f"{move_action}在坐标 ({click_x}, {click_y}) 处进行{button}键双击（实际位置: ({final_click_x}, {final_click_y})，移动距离: {int(distance_to_target)}像素，误差: X{int(x_error)}px, Y{int(y_error)}px）"
-        except Exception as e:
-            # 异常情况下的备用双击方式
-            print(f"精确双击失败，使用备用方式: {str(e)}")
-            backup_x = int(round(actual_x))
-            backup_y = int(round(actual_y))
-            pyautogui.click(backup_x, backup_y, button=button, clicks=2, interval=0.05)
-            time.sleep(0.15)
-            return f"使用备用方式在坐标 ({backup_x}, {backup_y}) 处进行{button}键双击"
+        return self._do_action(x, y, 'double_click', button, 2, adapter_id, move_first)
     
     def scroll_window(self, x, y, direction="up", adapter_id=None):
         """
@@ -361,33 +590,30 @@ class ToolUtils:
         - direction: 滚动方向 (up/down)
         - adapter_id: 适配器ID (可选)
         """
-        # 应用适配器调整
-        adjusted_x, adjusted_y = self.adapter_utils.apply_adjustment(x, y, adapter_id, 'scroll')
-        
-        # 将比例坐标转换为实际屏幕坐标，保留高精度
-        actual_x, actual_y = self.coordinate_converter.convert_proportion_to_actual(adjusted_x, adjusted_y)
+        # 应用适配器调整，将比例坐标转换为实际屏幕坐标，保留高精度
+        actual_x, actual_y = self._to_actual(x, y, adapter_id, 'scroll')
         
         # 获取屏幕尺寸
-        screen_width, screen_height = pyautogui.size()
+        screen_width, screen_height = self._screen_width, self._screen_height
         
         # 确保坐标在屏幕范围内，保留浮点数精度
         # 添加安全边距，避免触发 PyAutoGUI fail-safe（屏幕角落）
         safe_margin = 5  # 距离边缘5像素的安全边距
-        actual_x = max(float(safe_margin), min(float(screen_width - safe_margin), actual_x))
-        actual_y = max(float(safe_margin), min(float(screen_height - safe_margin), actual_y))
+        actual_x = _clamp(actual_x, float(safe_margin), float(screen_width - safe_margin))
+        actual_y = _clamp(actual_y, float(safe_margin), float(screen_height - safe_margin))
         
         # 平滑移动鼠标到指定位置
-        pyautogui.moveTo(actual_x, actual_y, duration=0.05, tween=pyautogui.easeInOutQuad)
+        _move_to(actual_x, actual_y, duration=0.05, tween=_ease_in_out_quad)
         
         # 执行滚动操作
         scroll_amount = 300
         if direction == "down":
             scroll_amount = -scroll_amount
         
-        pyautogui.scroll(scroll_amount)
+        _scroll(scroll_amount)
         
         # 短暂等待
-        time.sleep(0.1)
+        _sleep(self._post_delay['scroll'])
         
         # 在最后时刻转换为整数
         click_x = int(round(actual_x))
@@ -404,66 +630,69 @@ class ToolUtils:
         - text: 要输入的文本
         - adapter_id: 适配器ID (可选)
         """
-        import pyperclip
-        
-        # 应用适配器调整
-        adjusted_x, adjusted_y = self.adapter_utils.apply_adjustment(x, y, adapter_id, 'type')
-        
-        # 将比例坐标转换为实际屏幕坐标，保留高精度
-        actual_x, actual_y = self.coordinate_converter.convert_proportion_to_actual(adjusted_x, adjusted_y)
+        # 应用适配器调整，将比例坐标转换为实际屏幕坐标，保留高精度
+        actual_x, actual_y = self._to_actual(x, y, adapter_id, 'type')
         
         # 获取屏幕尺寸
-        screen_width, screen_height = pyautogui.size()
+        screen_width, screen_height = self._screen_width, self._screen_height
         
         # 确保坐标在屏幕范围内，保留浮点数精度
-        actual_x = max(0.0, min(float(screen_width - 1), actual_x))
-        actual_y = max(0.0, min(float(screen_height - 1), actual_y))
+        actual_x = _clamp(actual_x, 0.0, float(screen_width - 1))
+        actual_y = _clamp(actual_y, 0.0, float(screen_height - 1))
         
         # 平滑移动到指定位置并点击获取焦点
-        pyautogui.moveTo(actual_x, actual_y, duration=0.05, tween=pyautogui.easeInOutQuad)
-        pyautogui.click(button='left', clicks=1, interval=0.02)
-        time.sleep(0.1)
+        _move_to(actual_x, actual_y, duration=0.05, tween=_ease_in_out_quad)
+        _click(button='left', clicks=1, interval=0.02)
+        _sleep(0.1)
+        
+        # 在最后时刻转换为整数
+        click_x = int(round(actual_x))
+        click_y = int(round(actual_y))
+        
+        if self._system == "Windows":
+            # Windows 下直接发送Unicode字符，不占用用户剪贴板，也无需等待剪贴板就绪
+            try:
+                if input_utils.type_unicode(text):
+                    # 与粘贴输入相同，等待目标程序处理输入后再返回，避免下一次截图早于界面刷新
+                    _sleep(self._post_delay['type'])
+                    return f"在坐标 ({click_x}, {click_y}) 处输入文本: {text}（精度: {actual_x:.2f}, {actual_y:.2f}）"
+                logging.warning("SendInput输入被拦截，改用剪贴板粘贴")
+            except Exception as e:
+                logging.warning(f"SendInput输入失败，改用剪贴板粘贴: {e}")
         
         try:
+            import pyperclip
+            
             # 使用pyperclip复制粘贴文本，支持中英文
             pyperclip.copy(text)
-            time.sleep(0.05)
+            _sleep(0.05)
             
-            # 粘贴文本
-            if platform.system() == "Darwin":  # macOS
-                pyautogui.hotkey('command', 'v')
-            else:  # Windows, Linux
-                pyautogui.hotkey('ctrl', 'v')
+            # 粘贴文本（macOS 使用 command+v，Windows、Linux 使用 ctrl+v）
+            _hotkey(*self._paste_hotkey)
             
-            time.sleep(0.1)
-            # 在最后时刻转换为整数
-            click_x = int(round(actual_x))
-            click_y = int(round(actual_y))
+            _sleep(self._post_delay['type'])
             return f"在坐标 ({click_x}, {click_y}) 处输入文本: {text}（精度: {actual_x:.2f}, {actual_y:.2f}）"
         except Exception as e:
             # 如果pyperclip失败，使用备用方案
-            print(f"pyperclip输入失败，使用备用方案: {e}")
+            logging.warning(f"pyperclip输入失败，使用备用方案: {e}")
             return self._type_text_fallback(x, y, text)
     
     def _type_text_fallback(self, x, y, text):
         """
         文本输入备用方案
         """
-        # 应用适配器调整
-        adjusted_x, adjusted_y = self.adapter_utils.apply_adjustment(x, y, None, 'type')
-        
-        # 将比例坐标转换为实际屏幕坐标
-        actual_x, actual_y = self.coordinate_converter.convert_proportion_to_actual(adjusted_x, adjusted_y)
+        # 应用适配器调整，将比例坐标转换为实际屏幕坐标
+        actual_x, actual_y = self._to_actual(x, y, None, 'type')
         
         # 点击指定位置获取焦点
-        pyautogui.click(actual_x, actual_y)
-        time.sleep(0.1)
+        _click(actual_x, actual_y)
+        _sleep(0.1)
         
         # 直接输入文本
-        pyautogui.typewrite(text, interval=0.01)
+        _typewrite(text, interval=0.01)
         
         # 短暂等待
-        time.sleep(0.1)
+        _sleep(self._post_delay['type'])
         
         return f"使用备用方式在坐标 ({actual_x}, {actual_y}) 处输入文本: {text}"
     
@@ -480,14 +709,14 @@ class ToolUtils:
         
         try:
             # 首先尝试点击窗口右上角的关闭按钮
-            pyautogui.click(actual_x, actual_y)
-            time.sleep(0.2)
+            _click(actual_x, actual_y)
+            _sleep(0.2)
             return f"在坐标 ({actual_x}, {actual_y}) 处点击关闭按钮"
         except Exception as e:
             # 如果点击失败，尝试使用Alt+F4关闭窗口
-            print(f"点击关闭按钮失败，尝试使用Alt+F4: {str(e)}")
-            pyautogui.hotkey('alt', 'f4')
-            time.sleep(0.2)
+            logging.warning(f"点击关闭按钮失败，尝试使用Alt+F4: {str(e)}")
+            _hotkey('alt', 'f4')
+            _sleep(0.2)
             return f"使用Alt+F4关闭窗口"
     
     def press_windows_key(self):
@@ -495,8 +724,8 @@ class ToolUtils:
         按下Windows键工具
         """
         # 模拟按下Windows键
-        pyautogui.press('winleft')
-        time.sleep(0.1)
+        _press('winleft')
+        _sleep(0.1)
         
         return "按下Windows键"
     
@@ -504,8 +733,8 @@ class ToolUtils:
         """
         按下回车键
         """
-        pyautogui.press('enter')
-        time.sleep(0.1)
+        _press('enter')
+        _sleep(0.1)
         return "按下回车键"
     
     def delete_text(self, x, y, count=1):
@@ -525,22 +754,22 @@ class ToolUtils:
             actual_y = int(round(actual_y))
             
             # 点击指定位置获取焦点
-            pyautogui.click(actual_x, actual_y)
-            time.sleep(0.1)
+            _click(actual_x, actual_y)
+            _sleep(0.1)
             
             # 执行删除操作
             if count == -1:
                 # 批量删除：先全选再删除
-                pyautogui.hotkey('ctrl', 'a')
-                time.sleep(0.1)
-                pyautogui.press('delete')
+                _hotkey('ctrl', 'a')
+                _sleep(0.1)
+                _press('delete')
                 result_msg = f"在坐标 ({actual_x}, {actual_y}) 处删除所有选中内容"
             else:
                 # 逐个删除
-                pyautogui.press('delete', presses=count)
+                _press('delete', presses=count)
                 result_msg = f"在坐标 ({actual_x}, {actual_y}) 处删除 {count} 个字符"
             
-            time.sleep(0.1)
+            _sleep(0.1)
             
             return result_msg
         except Exception as e:
@@ -555,13 +784,13 @@ class ToolUtils:
         end_actual_x, end_actual_y = self.coordinate_converter.convert_proportion_to_actual(end_x, end_y)
         
         # 获取屏幕尺寸
-        screen_width, screen_height = pyautogui.size()
+        screen_width, screen_height = self._screen_width, self._screen_height
         
         # 确保坐标在屏幕范围内，保留浮点数精度
-        start_actual_x = max(0.0, min(float(screen_width - 1), start_actual_x))
-        start_actual_y = max(0.0, min(float(screen_height - 1), start_actual_y))
-        end_actual_x = max(0.0, min(float(screen_width - 1), end_actual_x))
-        end_actual_y = max(0.0, min(float(screen_height - 1), end_actual_y))
+        start_actual_x = _clamp(start_actual_x, 0.0, float(screen_width - 1))
+        start_actual_y = _clamp(start_actual_y, 0.0, float(screen_height - 1))
+        end_actual_x = _clamp(end_actual_x, 0.0, float(screen_width - 1))
+        end_actual_y = _clamp(end_actual_y, 0.0, float(screen_height - 1))
         
         # 在最后时刻转换为整数，确保最小精度损失
         start_x_int = int(round(start_actual_x))
@@ -570,10 +799,10 @@ class ToolUtils:
         end_y_int = int(round(end_actual_y))
         
         # 平滑移动到起始位置
-        pyautogui.moveTo(start_actual_x, start_actual_y, duration=0.1, tween=pyautogui.easeInOutQuad)
+        _move_to(start_actual_x, start_actual_y, duration=0.1, tween=_ease_in_out_quad)
         
         # 执行高精度拖拽操作
-        pyautogui.dragTo(end_actual_x, end_actual_y, duration=duration, tween=pyautogui.easeInOutQuad)
+        _drag_to(end_actual_x, end_actual_y, duration=duration, tween=_ease_in_out_quad)
         
         return f"从坐标 ({start_x_int}, {start_y_int}) 拖拽到 ({end_x_int}, {end_y_int})（实际精度: {start_actual_x:.2f},{start_actual_y:.2f} → {end_actual_x:.2f},{end_actual_y:.2f}）"
     
@@ -597,79 +826,7 @@ class ToolUtils:
         - adapter_id: 适配器ID (可选)
         - move_first: 是否先移动鼠标 (True先移动，False智能判断)
         """
-        # 应用适配器调整
-        adjusted_x, adjusted_y = self.adapter_utils.apply_adjustment(x, y, adapter_id, 'click')
-        
-        # 将比例坐标转换为实际屏幕坐标，保留更高精度
-        actual_x, actual_y = self.coordinate_converter.convert_proportion_to_actual(adjusted_x, adjusted_y)
-        
-        # 获取屏幕尺寸
-        screen_width, screen_height = pyautogui.size()
-        
-        # 确保坐标在屏幕范围内，使用浮点数计算避免过早损失精度
-        actual_x = max(0.0, min(float(screen_width - 1), actual_x))
-        actual_y = max(0.0, min(float(screen_height - 1), actual_y))
-        
-        try:
-            # 获取当前鼠标位置（使用浮点数）
-            current_x, current_y = pyautogui.position()
-            distance_to_target = ((current_x - actual_x) ** 2 + (current_y - actual_y) ** 2) ** 0.5
-            
-            # 智能判断是否需要移动鼠标
-            if move_first or distance_to_target > 50:  # 距离超过50像素或明确要求移动
-                # 平滑移动鼠标到目标位置（提高精度），使用亚像素精度
-                # 先移动到接近位置
-                intermediate_x = actual_x + (actual_x - current_x) * 0.8
-                intermediate_y = actual_y + (actual_y - current_y) * 0.8
-                
-                if abs(intermediate_x - current_x) > 10 or abs(intermediate_y - current_y) > 10:
-                    pyautogui.moveTo(intermediate_x, intermediate_y, duration=0.05)
-                
-                # 最终精确移动
-                pyautogui.moveTo(actual_x, actual_y, duration=0.05, tween=pyautogui.easeInOutQuad)
-                
-                # 精确验证鼠标位置（使用更高精度的偏差阈值）
-                final_x, final_y = pyautogui.position()
-                x_error = abs(final_x - actual_x)
-                y_error = abs(final_y - actual_y)
-                
-                # 如果位置偏差超过2像素，进行精细微调
-                if x_error > 2 or y_error > 2:
-                    # 计算修正方向
-                    correction_x = actual_x - final_x
-                    correction_y = actual_y - final_y
-                    
-                    # 分步微调，避免过度校正
-                    steps = max(int(max(x_error, y_error) / 2), 1)  # 每步最多移动2像素
-                    step_x = correction_x / steps
-                    step_y = correction_y / steps
-                    
-                    for i in range(steps):
-                        temp_x = final_x + step_x * (i + 1)
-                        temp_y = final_y + step_y * (i + 1)
-                        pyautogui.moveTo(temp_x, temp_y, duration=0.02)
-                    
-                    # 最终验证
-                    final_x, final_y = pyautogui.position()
-                    
-                move_action = f"高精度移动后"
-            else:
-                final_x, final_y = current_x, current_y
-                move_action = "原地"
-            
-            # 在最后时刻转换为整数，避免早期精度损失
-            hover_x = int(round(final_x))
-            hover_y = int(round(final_y))
-            
-            return f"{move_action}在坐标 ({hover_x}, {hover_y}) 处悬停（实际位置: ({final_x}, {final_y})，移动距离: {int(distance_to_target)}像素，误差: X{int(x_error)}px, Y{int(y_error)}px）"
-        except Exception as e:
-            # 异常情况下的备用悬停方式
-            print(f"精确悬停失败，使用备用方式: {str(e)}")
-            backup_x = int(round(actual_x))
-            backup_y = int(round(actual_y))
-            pyautogui.moveTo(backup_x, backup_y)
-            time.sleep(0.1)
-            return f"使用备用方式在坐标 ({backup_x}, {backup_y}) 处悬停"
+        return self._do_action(x, y, 'hover', "left", 1, adapter_id, move_first)
     
     def mouse_down(self, x, y, button="left", adapter_id=None, move_first=True):
         """
@@ -681,86 +838,7 @@ class ToolUtils:
         - adapter_id: 适配器ID (可选)
         - move_first: 是否先移动鼠标 (True先移动，False智能判断)
         """
-        # 应用适配器调整
-        adjusted_x, adjusted_y = self.adapter_utils.apply_adjustment(x, y, adapter_id, 'click')
-        
-        # 将比例坐标转换为实际屏幕坐标，保留更高精度
-        actual_x, actual_y = self.coordinate_converter.convert_proportion_to_actual(adjusted_x, adjusted_y)
-        
-        # 获取屏幕尺寸
-        screen_width, screen_height = pyautogui.size()
-        
-        # 确保坐标在屏幕范围内，使用浮点数计算避免过早损失精度
-        actual_x = max(0.0, min(float(screen_width - 1), actual_x))
-        actual_y = max(0.0, min(float(screen_height - 1), actual_y))
-        
-        try:
-            # 获取当前鼠标位置（使用浮点数）
-            current_x, current_y = pyautogui.position()
-            distance_to_target = ((current_x - actual_x) ** 2 + (current_y - actual_y) ** 2) ** 0.5
-            
-            # 智能判断是否需要移动鼠标
-            if move_first or distance_to_target > 50:  # 距离超过50像素或明确要求移动
-                # 平滑移动鼠标到目标位置（提高精度），使用亚像素精度
-                # 先移动到接近位置
-                intermediate_x = actual_x + (actual_x - current_x) * 0.8
-                intermediate_y = actual_y + (actual_y - current_y) * 0.8
-                
-                if abs(intermediate_x - current_x) > 10 or abs(intermediate_y - current_y) > 10:
-                    pyautogui.moveTo(intermediate_x, intermediate_y, duration=0.05)
-                
-                # 最终精确移动
-                pyautogui.moveTo(actual_x, actual_y, duration=0.05, tween=pyautogui.easeInOutQuad)
-                
-                # 精确验证鼠标位置（使用更高精度的偏差阈值）
-                final_x, final_y = pyautogui.position()
-                x_error = abs(final_x - actual_x)
-                y_error = abs(final_y - actual_y)
-                
-                # 如果位置偏差超过2像素，进行精细微调
-                if x_error > 2 or y_error > 2:
-                    # 计算修正方向
-                    correction_x = actual_x - final_x
-                    correction_y = actual_y - final_y
-                    
-                    # 分步微调，避免过度校正
-                    steps = max(int(max(x_error, y_error) / 2), 1)  # 每步最多移动2像素
-                    step_x = correction_x / steps
-                    step_y = correction_y / steps
-                    
-                    for i in range(steps):
-                        temp_x = final_x + step_x * (i + 1)
-                        temp_y = final_y + step_y * (i + 1)
-                        pyautogui.moveTo(temp_x, temp_y, duration=0.02)
-                    
-                    # 最终验证
-                    final_x, final_y = pyautogui.position()
-                    
-                move_action = f"高精度移动后"
-            else:
-                final_x, final_y = current_x, current_y
-                move_action = "原地"
-            
-            # 执行鼠标按下操作
-            pyautogui.mouseDown(button=button)
-            
-            # 在最后时刻转换为整数，避免早期精度损失
-            down_x = int(round(final_x))
-            down_y = int(round(final_y))
-            
-            # 短暂等待，确保按下生效
-            time.sleep(0.05)
-            
-            return f"{move_action}在坐标 ({down_x}, {down_y}) 处按下{button}键（实际位置: ({final_x}, {final_y})，移动距离: {int(distance_to_target)}像素，误差: X{int(x_error)}px, Y{int(y_error)}px）"
-        except Exception as e:
-            # 异常情况下的备用按下方式
-            print(f"精确按下失败，使用备用方式: {str(e)}")
-            backup_x = int(round(actual_x))
-            backup_y = int(round(actual_y))
-            pyautogui.moveTo(backup_x, backup_y)
-            pyautogui.mouseDown(button=button)
-            time.sleep(0.05)
-            return f"使用备用方式在坐标 ({backup_x}, {backup_y}) 处按下{button}键"
+        return self._do_action(x, y, 'down', button, 1, adapter_id, move_first)
     
     def mouse_up(self, x, y, button="left", adapter_id=None, move_first=True):
         """
@@ -772,133 +850,28 @@ class ToolUtils:
         - adapter_id: 适配器ID (可选)
         - move_first: 是否先移动鼠标 (True先移动，False智能判断)
         """
-        # 应用适配器调整
-        adjusted_x, adjusted_y = self.adapter_utils.apply_adjustment(x, y, adapter_id, 'click')
-        
-        # 将比例坐标转换为实际屏幕坐标，保留更高精度
-        actual_x, actual_y = self.coordinate_converter.convert_proportion_to_actual(adjusted_x, adjusted_y)
-        
-        # 获取屏幕尺寸
-        screen_width, screen_height = pyautogui.size()
-        
-        # 确保坐标在屏幕范围内，使用浮点数计算避免过早损失精度
-        actual_x = max(0.0, min(float(screen_width - 1), actual_x))
-        actual_y = max(0.0, min(float(screen_height - 1), actual_y))
-        
-        try:
-            # 获取当前鼠标位置（使用浮点数）
-            current_x, current_y = pyautogui.position()
-            distance_to_target = ((current_x - actual_x) ** 2 + (current_y - actual_y) ** 2) ** 0.5
-            
-            # 智能判断是否需要移动鼠标
-            if move_first or distance_to_target > 50:  # 距离超过50像素或明确要求移动
-                # 平滑移动鼠标到目标位置（提高精度），使用亚像素精度
-                # 先移动到接近位置
-                intermediate_x = actual_x + (actual_x - current_x) * 0.8
-                intermediate_y = actual_y + (actual_y - current_y) * 0.8
-                
-                if abs(intermediate_x - current_x) > 10 or abs(intermediate_y - current_y) > 10:
-                    pyautogui.moveTo(intermediate_x, intermediate_y, duration=0.05)
-                
-                # 最终精确移动
-                pyautogui.moveTo(actual_x, actual_y, duration=0.05, tween=pyautogui.easeInOutQuad)
-                
-                # 精确验证鼠标位置（使用更高精度的偏差阈值）
-                final_x, final_y = pyautogui.position()
-                x_error = abs(final_x - actual_x)
-                y_error = abs(final_y - actual_y)
-                
-                # 如果位置偏差超过2像素，进行精细微调
-                if x_error > 2 or y_error > 2:
-                    # 计算修正方向
-                    correction_x = actual_x - final_x
-                    correction_y = actual_y - final_y
-                    
-                    # 分步微调，避免过度校正
-                    steps = max(int(max(x_error, y_error) / 2), 1)  # 每步最多移动2像素
-                    step_x = correction_x / steps
-                    step_y = correction_y / steps
-                    
-                    for i in range(steps):
-                        temp_x = final_x + step_x * (i + 1)
-                        temp_y = final_y + step_y * (i + 1)
-                        pyautogui.moveTo(temp_x, temp_y, duration=0.02)
-                    
-                    # 最终验证
-                    final_x, final_y = pyautogui.position()
-                    
-                move_action = f"高精度移动后"
-            else:
-                final_x, final_y = current_x, current_y
-                move_action = "原地"
-            
-            # 执行鼠标释放操作
-            pyautogui.mouseUp(button=button)
-            
-            # 在最后时刻转换为整数，避免早期精度损失
-            up_x = int(round(final_x))
-            up_y = int(round(final_y))
-            
-            # 短暂等待，确保释放生效
-            time.sleep(0.05)
-            
-            return f"{move_action}在坐标 ({up_x}, {up_y}) 处释放{button}键（实际位置: ({final_x}, {final_y})，移动距离: {int(distance_to_target)}像素，误差: X{int(x_error)}px, Y{int(y_error)}px）"
-        except Exception as e:
-            # 异常情况下的备用释放方式
-            print(f"精确释放失败，使用备用方式: {str(e)}")
-            backup_x = int(round(actual_x))
-            backup_y = int(round(actual_y))
-            pyautogui.moveTo(backup_x, backup_y)
-            pyautogui.mouseUp(button=button)
-            time.sleep(0.05)
-            return f"使用备用方式在坐标 ({backup_x}, {backup_y}) 处释放{button}键"
+        return self._do_action(x, y, 'up', button, 1, adapter_id, move_first)
     
     def wait(self, seconds):
         """
         等待工具
         """
-        time.sleep(seconds)
+        _sleep(seconds)
         return f"等待{seconds}秒"
     
     def open_terminal(self, command=""):
         """
         打开终端工具
         """
-        system = platform.system()
+        launcher = _TERMINAL_LAUNCHERS.get(self._system)
+        if launcher is None:
+            return "不支持的操作系统"
         
         try:
-            if system == "Windows":
-                if command:
-                    subprocess.Popen(["cmd.exe", "/k", command])
-                else:
-                    subprocess.Popen(["cmd.exe"])
-            elif system == "Linux":
-                # 尝试打开不同的终端
-                terminals = ["gnome-terminal", "konsole", "xterm", "terminal"]
-                terminal_opened = False
-                
-                for terminal in terminals:
-                    try:
-                        if command:
-                            subprocess.Popen([terminal, "-e", f"bash -c '{command}; exec bash'"])
-                        else:
-                            subprocess.Popen([terminal])
-                        terminal_opened = True
-                        break
-                    except FileNotFoundError:
-                        continue
-                
-                if not terminal_opened:
-                    return "未找到可用的终端"
-            elif system == "Darwin":  # macOS
-                if command:
-                    subprocess.Popen(["open", "-a", "Terminal", "--args", "-c", command])
-                else:
-                    subprocess.Popen(["open", "-a", "Terminal"])
-            else:
-                return "不支持的操作系统"
+            if not launcher(command):
+                return "未找到可用的终端"
             
-            time.sleep(0.5)
+            _sleep(0.5)
             return f"打开终端{(f'并执行命令: {command}' if command else '')}"
         except Exception as e:
             return f"打开终端失败: {str(e)}"
@@ -915,51 +888,43 @@ class ToolUtils:
             actual_x = int(round(actual_x))
             actual_y = int(round(actual_y))
             
-            # 点击指定位置获取焦点
-            pyautogui.click(actual_x, actual_y)
-            time.sleep(0.1)
+            # 标准化按键名称，相同的快捷键只解析一次
+            normalized_parts = _normalize_hotkey(hotkey)
+            is_system_hotkey = 'alt' in normalized_parts and 'f4' in normalized_parts
+            is_batch = normalized_parts in _BATCH_SHORTCUTS
             
-            # 改进快捷键解析，支持多种格式（如"ctrl+a"或"ctrl + a"）
-            hotkey = hotkey.replace(' ', '')  # 移除空格
-            hotkey_parts = hotkey.split('+')
+            # 普通快捷键的点击和按键一次提交，事件之间不会交错，无需等待焦点稳定
+            # 系统级快捷键保留执行前的额外延迟，不合并
+            if not is_system_hotkey and input_utils.click_and_hotkey(actual_x, actual_y, normalized_parts):
+                # 批量操作仍需等待操作完成，其余只留很短的时间让目标程序处理
+                _precise_sleep(0.2 if is_batch else 0.02)
+                return f"在坐标 ({actual_x}, {actual_y}) 处执行快捷键: {hotkey}"
             
-            # 标准化按键名称
-            normalized_parts = []
-            for part in hotkey_parts:
-                part = part.lower()
-                # 处理常见的按键别名
-                if part == 'ctrl':
-                    normalized_parts.append('ctrl')
-                elif part == 'alt':
-                    normalized_parts.append('alt')
-                elif part == 'shift':
-                    normalized_parts.append('shift')
-                elif part == 'win' or part == 'windows':
-                    normalized_parts.append('winleft')
-                else:
-                    normalized_parts.append(part)
+            # 点击指定位置获取焦点
+            input_utils.move_to(actual_x, actual_y)
+            input_utils.click()
+            _precise_sleep(0.1)
             
             # 对系统级快捷键进行特殊处理
-            if 'alt' in normalized_parts and 'f4' in normalized_parts:
-                print(f"警告：检测到系统级快捷键 {hotkey}，正在安全执行...")
-                time.sleep(0.2)  # 额外延迟避免误操作
+            if is_system_hotkey:
+                logging.warning(f"检测到系统级快捷键 {hotkey}，正在安全执行...")
+                _precise_sleep(0.2)  # 额外延迟避免误操作
             
             # 针对批量操作快捷键的特殊优化
-            batch_shortcuts = ['ctrl+a', 'ctrl+c', 'ctrl+v', 'ctrl+x', 'ctrl+z', 'ctrl+y']
-            normalized_hotkey = '+'.join(normalized_parts)
-            if normalized_hotkey in batch_shortcuts:
-                print(f"检测到批量操作快捷键 {normalized_hotkey}，正在执行...")
+            if is_batch:
+                if self._debug:
+                    print(f"检测到批量操作快捷键 {'+'.join(normalized_parts)}，正在执行...")
                 # 确保焦点稳定
-                time.sleep(0.1)
+                _precise_sleep(0.1)
             
             # 执行快捷键操作
-            pyautogui.hotkey(*normalized_parts)
+            _hotkey(*normalized_parts, _pause=False)
             
             # 针对批量操作增加适当延迟，确保操作完成
-            if normalized_hotkey in batch_shortcuts:
-                time.sleep(0.2)
+            if is_batch:
+                _precise_sleep(0.2)
             else:
-                time.sleep(0.1)
+                _precise_sleep(0.1)
             
             return f"在坐标 ({actual_x}, {actual_y}) 处执行快捷键: {hotkey}"
         except Exception as e:
@@ -973,17 +938,17 @@ class ToolUtils:
         - reason: 暂停原因描述
         - adapter_id: 适配器ID (可选)
         """
-        print(f"🔸 任务暂停: {reason}")
-        print(f"请手动完成操作后继续...")
+        # 执行结果由代理输出，这里只写日志，不再逐行打印到控制台
+        logging.info("任务暂停: %s，请手动完成操作后继续", reason)
         
         # 如果有语音工具，使用语音提示
-        if hasattr(self, 'voice_utils') and self.voice_utils:
+        if self.voice_utils:
             try:
                 voice_message = f"检测到{reason}操作，任务已暂停。请手动完成操作后继续。"
                 self.voice_utils.speak(voice_message)
-                print("🔊 语音提示播放完成")
+                logging.info("语音提示已提交后台播放: %s", voice_message)
             except Exception as voice_error:
-                print(f"⚠️ 语音提示播放失败: {voice_error}")
+                logging.warning("语音提示播放失败: %s", voice_error)
         
         # 返回暂停消息，让代理知道需要等待用户
         return f"任务因'{reason}'已暂停，等待用户手动完成操作后继续"
@@ -996,7 +961,7 @@ class ToolUtils:
         - message: 完成消息描述
         - adapter_id: 适配器ID (可选)
         """
-        print(f"✅ 任务完成: {message}")
+        logging.info("任务完成: %s", message)
         
         # 返回完成消息，让代理知道任务已完成
         return f"任务已完成: {message}"
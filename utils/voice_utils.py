@@ -4,35 +4,104 @@
 语音提示工具模块
 """
 
-import pyttsx3
+import os
+import sys
+import queue
+import itertools
 import threading
 import logging
 
+from utils import json_utils
+
+# 播放中驱动语音引擎消息循环的间隔（秒）
+_ITERATE_INTERVAL = 0.02
+
+# 最多积压的异步语音条数，超出时丢弃新的提示，避免提示在用户处理完后还在逐条播放
+_MAX_PENDING_ASYNC = 2
+
+# 异步语音的完成标记，与同步播放的完成事件区分，结束时归还异步语音名额
+_ASYNC = object()
+
+# 选中的中文语音ID缓存文件，下次启动直接使用，省去枚举所有语音（Windows 下需要逐个查询SAPI）
+_VOICE_CACHE_FILE = os.path.join(os.path.expanduser("~"), ".cache", "pcautoagent", "voice.json")
+
+def _load_cached_voice_id():
+    """
+    读取缓存的语音ID，缓存不存在、损坏或来自其他平台时返回None
+    """
+    try:
+        cache = json_utils.load_file(_VOICE_CACHE_FILE)
+        if cache.get('platform') == sys.platform:
+            return cache.get('voice_id')
+    except Exception:
+        pass
+    return None
+
+def _save_cached_voice_id(voice_id):
+    """
+    保存选中的语音ID，写入失败不影响语音播放
+    """
+    try:
+        os.makedirs(os.path.dirname(_VOICE_CACHE_FILE), exist_ok=True)
+        with open(_VOICE_CACHE_FILE, 'wb') as f:
+            f.write(json_utils.dumps({'platform': sys.platform, 'voice_id': voice_id}))
+    except OSError as e:
+        logging.warning(f"保存语音缓存失败: {str(e)}")
+
 class VoiceUtils:
     """
     语音提示工具类，用于在需要用户操作时生成语音告知
     """
     
     def __init__(self):
-        self.engine = pyttsx3.init()
-        self.voice_lock = threading.Lock()
+        # 语音引擎初始化较慢（Windows 下需要建立SAPI连接），在播放线程中首次播放时才创建
+        self.engine = None
         
-        # 配置语音参数
-        self._configure_voice()
+        # 所有语音由同一个后台线程按顺序播放，队列元素为 (文本, 播放完成事件或_ASYNC)
+        self._queue = queue.Queue()
+        # 正在播放的语音: 名称 -> 播放完成事件或_ASYNC，只在播放线程中访问
+        self._playing = {}
+        self._utterance_ids = itertools.count()
+        # 尚未播放完的异步语音名额
+        self._async_slots = threading.BoundedSemaphore(_MAX_PENDING_ASYNC)
+        self._worker_thread = threading.Thread(target=self._worker, daemon=True)
+        self._worker_thread.start()
+    
+    def _ensure_engine(self):
+        """
+        创建并配置语音引擎，只在播放线程中调用
+        """
+        if self.engine is None:
+            # 导入 pyttsx3 会加载SAPI/espeak绑定，不使用语音时不导入
+            import pyttsx3
+            self.engine = pyttsx3.init()
+            # 配置语音参数
+            self._configure_voice()
+        return self.engine
     
     def _configure_voice(self):
         """
         配置语音参数
         """
         try:
-            # 获取所有可用语音
-            voices = self.engine.getProperty('voices')
+            # 优先使用上次选中的语音，语音已被卸载时重新查找
+            voice_id = _load_cached_voice_id()
+            if voice_id is not None:
+                try:
+                    self.engine.setProperty('voice', voice_id)
+                except Exception:
+                    voice_id = None
             
-            # 尝试选择中文语音
-            for voice in voices:
-                if 'zh' in voice.id.lower() or 'chinese' in voice.id.lower():
-                    self.engine.setProperty('voice', voice.id)
-                    break
+            if voice_id is None:
+                # 获取所有可用语音
+                voices = self.engine.getProperty('voices')
+                
+                # 尝试选择中文语音
+                for voice in voices:
+                    if 'zh' in voice.id.lower() or 'chinese' in voice.id.lower():
+                        self.engine.setProperty('voice', voice.id)
+                        _save_cached_voice_id(voice.id)
+                        break
             
             # 设置语速 (100-200)
             self.engine.setProperty('rate', 150)
@@ -43,34 +112,103 @@ class VoiceUtils:
         except Exception as e:
             logging.error(f"配置语音参数失败: {str(e)}")
     
+    def _worker(self):
+        """
+        语音播放线程，以非阻塞方式驱动语音引擎：播放期间可以继续接收新的语音，不会逐条阻塞
+        引擎不支持非阻塞循环时退回为逐条 runAndWait 播放
+        """
+        # 首次播放时才创建引擎
+        text, done = self._queue.get()
+        try:
+            engine = self._ensure_engine()
+            engine.connect('finished-utterance', self._on_utterance_finished)
+            engine.startLoop(False)
+        except Exception as e:
+            logging.warning(f"语音引擎无法以非阻塞方式运行，改为逐条播放: {str(e)}")
+            self._blocking_worker(text, done)
+            return
+        
+        self._start_utterance(engine, text, done)
+        while True:
+            # 空闲时阻塞等待新的语音，播放中按固定间隔驱动引擎
+            try:
+                text, done = self._queue.get(timeout=_ITERATE_INTERVAL if self._playing else None)
+            except queue.Empty:
+                pass
+            else:
+                self._start_utterance(engine, text, done)
+            
+            try:
+                engine.iterate()
+            except Exception as e:
+                logging.error(f"语音播放失败: {str(e)}")
+                # 引擎出错后不会再回调，直接结束正在播放的语音，避免同步播放一直等待
+                for name in list(self._playing):
+                    self._on_utterance_finished(name, False)
+    
+    def _start_utterance(self, engine, text, done):
+        """
+        将语音加入引擎的播放队列
+        """
+        name = f"utterance-{next(self._utterance_ids)}"
+        self._playing[name] = done
+        try:
+            engine.say(text, name)
+        except Exception as e:
+            logging.error(f"语音播放失败: {str(e)}")
+            self._on_utterance_finished(name, False)
+    
+    def _on_utterance_finished(self, name, completed):
+        """
+        语音播放结束的回调，通知等待中的同步播放
+        同一条语音可能已在引擎出错时结束过，重复的回调直接忽略，避免多次归还异步语音名额
+        """
+        if name not in self._playing:
+            return
+        self._finish(self._playing.pop(name))
+    
+    def _finish(self, done):
+        """
+        结束一条语音：通知同步播放，或归还异步语音名额
+        """
+        if done is _ASYNC:
+            self._async_slots.release()
+        else:
+            done.set()
+    
+    def _blocking_worker(self, text, done):
+        """
+        逐条播放队列中的语音，每条都等待播放结束
+        """
+        while True:
+            try:
+                engine = self._ensure_engine()
+                engine.say(text)
+                engine.runAndWait()
+            except Exception as e:
+                logging.error(f"语音播放失败: {str(e)}")
+            finally:
+                self._finish(done)
+            text, done = self._queue.get()
+    
     def speak_async(self, text):
         """
         异步语音播放
         :param text: 要播放的文本
         """
-        def speak_thread():
-            with self.voice_lock:
-                try:
-                    self.engine.say(text)
-                    self.engine.runAndWait()
-                except Exception as e:
-                    logging.error(f"语音播放失败: {str(e)}")
-        
-        thread = threading.Thread(target=speak_thread)
-        thread.daemon = True
-        thread.start()
+        if not self._async_slots.acquire(blocking=False):
+            logging.info(f"语音提示积压过多，跳过: {text}")
+            return
+        self._queue.put((text, _ASYNC))
     
     def speak_sync(self, text):
         """
         同步语音播放
         :param text: 要播放的文本
         """
-        with self.voice_lock:
-            try:
-                self.engine.say(text)
-                self.engine.runAndWait()
-            except Exception as e:
-                logging.error(f"语音播放失败: {str(e)}")
+        done = threading.Event()
+        self._queue.put((text, done))
+        done.wait()
     
     def speak(self, text):
         """
@@ -81,12 +219,15 @@ class VoiceUtils:
 
 # 单例模式
 global_voice_utils = None
+_vu_lock = threading.Lock()
 
 def get_voice_utils():
     """
     获取语音工具实例
     """
     global global_voice_utils
-    if not global_voice_utils:
-        global_voice_utils = VoiceUtils()
+    if global_voice_utils is None:
+        with _vu_lock:
+            if global_voice_utils is None:
+                global_voice_utils = VoiceUtils()
     return global_voice_utils
@@ -7,10 +7,22 @@ VLM代理核心模块
 from openai import OpenAI
 import pyautogui
 import platform
+import re
+import string
 import time
+import traceback
 import logging
 
 import os
+import multiprocessing
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
 
 from utils.coordinate_utils import CoordinateConverter
 from utils.screenshot_utils import ScreenshotUtils
@@ -20,6 +32,183 @@ from utils.adapter_utils import get_adapter_utils
 from model_manager import get_model_manager
 from prompts.prompt_manager import PromptManager
 
+# 发送给模型的消息中保留截图的最近消息数，更早的截图替换为文字占位
+_KEPT_SCREENSHOTS = 2
+
+# 除系统prompt和摘要外保留的最近消息数，更早的消息压缩成摘要
+_MESSAGE_WINDOW = 12
+# 超出窗口的消息达到该数量时才裁剪一次，裁剪之间的请求开头保持不变
+_MESSAGE_WINDOW_SLACK = 6
+# 历史摘要每行的最大长度和最多保留的行数（第一行为任务描述，始终保留）
+_SUMMARY_LINE_LENGTH = 200
+_SUMMARY_MAX_LINES = 40
+# 旧截图的文字占位
+_PRUNED_SCREENSHOT_TEXT = "[旧截图已省略]"
+
+# 等待继续按钮时检查GUI进程状态的间隔（秒）
+_PAUSE_POLL_INTERVAL = 0.5
+
+# 操作历史最多保留的记录数
+_OPERATION_HISTORY_SIZE = 200
+
+# 模型响应中表示需要用户操作的关键词，均为中文，不需要转换大小写
+_NEED_USER_INPUT_RE = re.compile("需要用户|请用户|用户帮忙|用户操作|请输入|请选择|等待|请稍候")
+# 模型响应中第一行不是工具调用或工具执行结果的非空行，作为步骤描述
+_STEP_DESCRIPTION_RE = re.compile(r'^\s*(?!<\|tool_call\|>|工具执行结果)(\S.*)$', re.MULTILINE)
+
+# 任务描述关键词: (类别, 标签, 关键词)，类别为 "applicant"（应用）或 "system"（系统）
+_TASK_KEYWORDS = (
+    ("applicant", "抖音", ("抖音", "douyin", "短视频")),
+    ("applicant", "快手", ("快手", "kuaishou")),
+    ("applicant", "excel", ("excel", "电子表格", "表格", "spreadsheet", "微软表格")),
+    ("system", "Windows", ("windows", "win", "微软")),
+    ("system", "Linux", ("linux", "ubuntu", "centos")),
+)
+
+class TaskAborted(Exception):
+    """
+    任务被中止，如等待继续时GUI进程已退出
+    """
+
+def _build_keyword_automaton():
+    """
+    安装了 pyahocorasick 时把所有关键词编译成一个自动机，一次扫描即可找出全部命中的分组
+    :return: 值为分组下标元组的自动机，未安装时返回None
+    """
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for index, (_, _, words) in enumerate(_TASK_KEYWORDS):
+        for word in words:
+            # 同一关键词出现在多个分组时，保留所有分组
+            automaton.add_word(word, automaton.get(word, ()) + (index,))
+    automaton.make_automaton()
+    return automaton
+
+_keyword_automaton = _build_keyword_automaton()
+
+# 需要用户手动干预（登录/购买等操作）的关键词，导入时去重并转为小写，多个关键词同时出现时按此顺序取第一个
+_MANUAL_INTERVENTION_PATTERNS = tuple(dict.fromkeys(pattern.lower() for pattern in [
+    # 登录相关
+    "登录", "login", "sign in", "登陆", "登录验证", "双因子验证", "2fa",
+    "账号", "密码", "用户名", "user", "password", "account",
+    # 支付购买相关
+    "购买", "支付", "pay", "purchase", "付款", "结算", "确认支付", "支付方式",
+    "订单", "下单", "立即购买", "立即支付", "购物车", "结算",
+    # 安全验证相关
+    "验证码", "captcha", "verification code", "验证", "安全验证", "security check",
+    "拖动验证", "滑块验证", "短信验证", "邮箱验证", "人机验证",
+    # 其他需要用户操作
+    "授权", "permission", "权限", "同意", "accept", "确认授权",
+    "实名认证", "身份验证", "银行卡", "身份证", "实名",
+    "邮箱验证", "手机验证", "绑定手机", "绑定邮箱"
+]))
+# 中文关键词匹配前从响应中删除的标点和空白，使“登 录”等写法也能匹配到关键词
+# 英文关键词仍在原始响应中匹配，避免跨单词拼接出误匹配（如 "you serve" 中的 "user"）
+_INTERVENTION_STRIP_TABLE = str.maketrans("", "", string.punctuation + string.whitespace + "·、，。！？；：“”‘’（）【】《》—…　")
+# 纯ASCII关键词的下标，保持原顺序；纯ASCII的响应不可能包含其他关键词
+_ASCII_INTERVENTION_INDEXES = tuple(index for index, pattern in enumerate(_MANUAL_INTERVENTION_PATTERNS) if pattern.isascii())
+# 其余（含中文）关键词的下标
+_CJK_INTERVENTION_INDEXES = tuple(index for index, pattern in enumerate(_MANUAL_INTERVENTION_PATTERNS) if not pattern.isascii())
+# 实际用于匹配的关键词，与 _MANUAL_INTERVENTION_PATTERNS 一一对应，中文关键词同样删除标点和空白，匹配到后返回原关键词
+_INTERVENTION_MATCH_KEYS = tuple(pattern if pattern.isascii() else pattern.translate(_INTERVENTION_STRIP_TABLE)
+                                 for pattern in _MANUAL_INTERVENTION_PATTERNS)
+
+def _build_intervention_automaton(indexes):
+    """
+    安装了 pyahocorasick 时把一组手动干预关键词编译成一个自动机，一次扫描找出所有出现的关键词
+    :param indexes: 关键词在 _MANUAL_INTERVENTION_PATTERNS 中的下标
+    :return: 值为关键词下标的自动机，未安装时返回None
+    """
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for index in indexes:
+        automaton.add_word(_INTERVENTION_MATCH_KEYS[index], index)
+    automaton.make_automaton()
+    return automaton
+
+_ascii_intervention_automaton = _build_intervention_automaton(_ASCII_INTERVENTION_INDEXES)
+_cjk_intervention_automaton = _build_intervention_automaton(_CJK_INTERVENTION_INDEXES)
+
+@lru_cache(maxsize=64)
+def _detect_manual_intervention(response_lower):
+    """
+    在小写的模型响应中查找手动干预关键词，多个关键词同时出现时返回列表中靠前的关键词
+    英文关键词直接在响应中查找，中文关键词在删除标点和空白后的响应中查找
+    :return: (是否需要手动干预, 匹配到的关键词或None)
+    """
+    # (关键词下标, 自动机, 查找的文本)
+    searches = [(_ASCII_INTERVENTION_INDEXES, _ascii_intervention_automaton, response_lower)]
+    if not response_lower.isascii():
+        searches.append((_CJK_INTERVENTION_INDEXES, _cjk_intervention_automaton,
+                         response_lower.translate(_INTERVENTION_STRIP_TABLE)))
+    
+    if ahocorasick is not None:
+        first_index = min((index for _, automaton, text in searches for _, index in automaton.iter(text)), default=None)
+    else:
+        first_index = min((index for indexes, _, text in searches for index in indexes
+                           if _INTERVENTION_MATCH_KEYS[index] in text), default=None)
+    
+    if first_index is not None:
+        return True, _MANUAL_INTERVENTION_PATTERNS[first_index]
+    return False, None
+
+def _match_task_keywords(task_lower):
+    """
+    识别任务描述中的应用和系统关键词
+    :param task_lower: 小写的任务描述
+    :return: (应用标签列表, 系统标签列表)，按 _TASK_KEYWORDS 中的顺序排列
+    """
+    if _keyword_automaton is not None:
+        matched = set()
+        for _, groups in _keyword_automaton.iter(task_lower):
+            matched.update(groups)
+    else:
+        matched = {index for index, (_, _, words) in enumerate(_TASK_KEYWORDS)
+                   if any(word in task_lower for word in words)}
+    
+    applicant_keywords = []
+    system_keywords = []
+    for index in sorted(matched):
+        category, label, _ = _TASK_KEYWORDS[index]
+        (applicant_keywords if category == "applicant" else system_keywords).append(label)
+    return applicant_keywords, system_keywords
+
+def _summarize_message(message):
+    """
+    将一条消息压缩为一行历史摘要，只保留文字内容
+    """
+    content = message["content"]
+    if not isinstance(content, str):
+        content = " ".join(part["text"] for part in content
+                           if part.get("type") == "text" and part["text"] != _PRUNED_SCREENSHOT_TEXT)
+    role = "模型" if message["role"] == "assistant" else "用户"
+    line = f"{role}: {' '.join(content.split())}"
+    return line[:_SUMMARY_LINE_LENGTH] + "..." if len(line) > _SUMMARY_LINE_LENGTH else line
+
+def _preview_content(content, limit=100):
+    """
+    生成消息内容的日志预览，超过 limit 个字符时截断
+    多模态内容只列出各部分的类型和文本，不把整张 base64 截图转换成字符串
+    """
+    if not isinstance(content, str):
+        content = f"[{len(content)} parts: " + ", ".join(
+            part.get("text", "") if part.get("type") == "text" else part.get("type", "?") for part in content
+        ) + "]"
+    return content[:limit] + "..." if len(content) > limit else content
+
+def _screenshot_content(text, image_url):
+    """
+    构造带截图的用户消息内容
+    :param text: 文字说明
+    :param image_url: 截图的 data URL
+    """
+    return [
+        {"type": "text", "text": text},
+        {"type": "image_url", "image_url": {"url": image_url}}
+    ]
+
 class VLMAgent:
     """
     VLM代理类，用于与LLM交互并控制电脑
@@ -61,6 +250,7 @@ class VLMAgent:
         
         # 获取屏幕分辨率
         self.screen_width, self.screen_height = pyautogui.size()
+        self._max_dim = max(self.screen_width, self.screen_height)
         
         # 设置pyautogui的参数
         pyautogui.FAILSAFE = True  # 启用安全模式，鼠标移到屏幕左上角会停止操作
@@ -73,21 +263,62 @@ class VLMAgent:
         self.voice_utils = get_voice_utils()
         self.adapter_utils = get_adapter_utils()
         
+        # parse_and_execute_tools 的工具表: 工具名 -> (处理函数, ((参数名, 默认值), ...))，只传入表中列出的参数
+        tools = self.tool_utils
+        self._tool_table = {
+            "mouse_click": (tools.mouse_click, (("x", 0.5), ("y", 0.5), ("button", "left"), ("clicks", 1), ("move_first", True))),
+            "type_text": (tools.type_text, (("x", 0.5), ("y", 0.5), ("text", ""))),
+            "scroll_window": (tools.scroll_window, (("x", 0.5), ("y", 0.5), ("direction", "up"))),
+            "close_window": (tools.close_window, (("x", 0.5), ("y", 0.5))),
+            "press_windows_key": (tools.press_windows_key, ()),
+            "press_enter": (tools.press_enter, ()),
+            "delete_text": (tools.delete_text, (("x", 0.5), ("y", 0.5), ("count", 1))),
+            "mouse_drag": (tools.mouse_drag, (("start_x", 0.5), ("start_y", 0.5), ("end_x", 0.5), ("end_y", 0.5), ("duration", 0.5))),
+            "wait": (tools.wait, (("seconds", 1),)),
+            "open_terminal": (tools.open_terminal, (("command", ""),)),
+            "press_hotkey": (tools.press_hotkey, (("x", 0.5), ("y", 0.5), ("hotkey", ""))),
+            "clear_input": (self.clear_input, (("x", 0.5), ("y", 0.5))),
+        }
+        
         # 判断是否需要缩放截图
         self.scale_screenshot = self._should_scale_screenshot()
         
-        # 操作历史记录
-        self.operation_history = []
-        self.last_successful_positions = {}  # 记录成功操作的坐标
+        # 流式接收模型响应，边接收边执行已完整的工具调用；工具按顺序在单独的线程中执行
+        self.stream_tool_calls = True
+        self._tool_pool = ThreadPoolExecutor(max_workers=1)
+        
+        # 后台截图线程池：工具执行后在后台等待操作生效并截图，下一步直接取结果
+        self._io_pool = ThreadPoolExecutor(max_workers=2)
+        self._screenshot_future = None
+        # 最近一次截图: (time.monotonic() 时间戳, capture_screenshot_base64 结果)
+        self._last_capture = None
+        # 最近一次发给模型的截图及其所在的消息，与下一步截图完全相同且该消息仍在窗口内时不再重复上传
+        self._last_sent_image = None
+        self._last_image_message = None
+        # 最近一条模型回复
+        self._last_response = None
+        # 消息窗口裁剪时生成的历史摘要消息及其摘要行，run_task 开始时重置
+        self._summary_message = None
+        self._history_summary = []
+        
+        # 操作历史记录，只保留最近的记录，避免长时间运行时无限增长
+        self.operation_history = deque(maxlen=_OPERATION_HISTORY_SIZE)
+        self.last_successful_positions = {}  # 记录成功操作的坐标: 操作类型 -> deque
+        self._recent_operation_lines = deque(maxlen=5)  # 最近5个操作的摘要行
         
         # 暂停/继续机制
         self.is_paused = False
         self.pause_event = None  # 由外部设置 threading.Event
         self.pause_reason = ""  # 暂停原因
         self.step_update_callback = None  # 由外部设置，用于GUI回调
+        self.log_callback = None  # 由外部设置，用于接收代理的状态输出
         self.current_task_id = None  # 当前任务ID，用于GUI回调
         self.manual_intervention_detected = False  # 标记是否检测到需要手动干预
         
+        # 读取基础prompt模板，多次执行任务时不再重复读取文件
+        self._system = platform.system().lower()
+        self._base_prompt_path, self._base_prompt_template = self._load_base_prompt_template()
+        
         # 初始化Prompt管理器
         try:
             self.prompt_manager = PromptManager()
@@ -96,6 +327,32 @@ class VLMAgent:
             logging.warning(f"Prompt管理器初始化失败: {e}")
             self.prompt_manager = None
     
+    def _load_base_prompt_template(self):
+        """
+        读取当前操作系统的基础prompt模板（未替换变量）
+        :return: (文件路径, 模板内容)，文件不存在或读取失败时模板内容为None
+        """
+        # Linux 使用 linux.txt，其他系统默认使用 Windows prompt
+        prompt_name = "linux.txt" if self._system == "linux" else "windows.txt"
+        prompt_file_path = os.path.join(os.path.dirname(__file__), "prompts", prompt_name)
+        try:
+            with open(prompt_file_path, 'r', encoding='utf-8') as f:
+                return prompt_file_path, f.read()
+        except FileNotFoundError:
+            return prompt_file_path, None
+        except Exception as e:
+            logging.warning(f"读取prompt文件时出错: {e}")
+            return prompt_file_path, None
+    
+    def _log(self, *args):
+        """输出状态信息到控制台，并转发给外部设置的日志回调"""
+        print(*args)
+        if self.log_callback:
+            try:
+                self.log_callback(" ".join(map(str, args)))
+            except Exception:
+                pass
+    
     def record_operation(self, operation_type, position_info, success=True, result_message=""):
         """记录操作历史"""
         operation_record = {
@@ -107,13 +364,34 @@ class VLMAgent:
         }
         self.operation_history.append(operation_record)
         
+        # 预先生成摘要行，获取摘要时直接拼接
+        status = "成功" if success else "失败"
+        position_text = f"坐标({position_info.get('x', 'unknown')}, {position_info.get('y', 'unknown')})" if position_info else "无坐标"
+        self._recent_operation_lines.append(f"{operation_type}: {position_text} - {status}")
+        
         # 记录成功的位置用于后续参考
         if success and position_info:
-            if operation_type not in self.last_successful_positions:
-                self.last_successful_positions[operation_type] = []
-            self.last_successful_positions[operation_type].append(position_info)
             # 只保留最近5个成功的操作位置
-            self.last_successful_positions[operation_type] = self.last_successful_positions[operation_type][-5:]
+            positions = self.last_successful_positions.get(operation_type)
+            if positions is None:
+                positions = self.last_successful_positions[operation_type] = deque(maxlen=5)
+            positions.append(position_info)
+    
+    def _wait_for_resume(self):
+        """
+        等待GUI的继续按钮，没有设置 pause_event 时直接返回
+        按固定间隔分段等待，期间检查启动任务的GUI进程是否仍在运行，GUI异常退出时中止任务，避免代理进程一直等待
+        """
+        if not self.pause_event:
+            return
+        self._log("⏳ 等待用户操作完成后点击'继续'...")
+        parent = multiprocessing.parent_process()
+        while not self.pause_event.wait(timeout=_PAUSE_POLL_INTERVAL):
+            if parent is not None and not parent.is_alive():
+                raise TaskAborted("GUI进程已退出，任务中止")
+        # 重置事件，为下次使用做准备
+        self.pause_event.clear()
+        self._log("✅ 用户已点击继续，继续执行任务")
     
     def check_and_handle_pause(self, step_callback, step):
         """检查暂停状态并处理手动干预"""
@@ -126,18 +404,8 @@ class VLMAgent:
     
     def get_operation_history_summary(self):
         """获取操作历史摘要"""
-        if not self.operation_history:
-            return "无操作历史"
-        
-        recent_operations = self.operation_history[-5:]  # 最近5个操作
-        summary_parts = []
-        
-        for op in recent_operations:
-            status = "成功" if op["success"] else "失败"
-            position_info = f"坐标({op['position'].get('x', 'unknown')}, {op['position'].get('y', 'unknown')})" if op["position"] else "无坐标"
-            summary_parts.append(f"{op['type']}: {position_info} - {status}")
-        
-        return "; ".join(summary_parts)
+        # 最近5个操作的摘要行在 record_operation 中生成
+        return "; ".join(self._recent_operation_lines) or "无操作历史"
     
     def get_similar_positions(self, operation_type, current_x, current_y, threshold=0.1):
         """查找相似的历史操作位置"""
@@ -145,11 +413,14 @@ class VLMAgent:
             return []
         
         similar_positions = []
+        # 比较距离的平方，省去开方
+        max_distance = threshold * self._max_dim
+        max_distance_sq = max_distance * max_distance
         for pos in self.last_successful_positions[operation_type]:
             if "actual_x" in pos and "actual_y" in pos:
-                distance = ((pos["actual_x"] - current_x) ** 2 + (pos["actual_y"] - current_y) ** 2) ** 0.5
-                max_dimension = max(self.screen_width, self.screen_height)
-                if distance < threshold * max_dimension:
+                dx = pos["actual_x"] - current_x
+                dy = pos["actual_y"] - current_y
+                if dx * dx + dy * dy < max_distance_sq:
                     similar_positions.append(pos)
         
         return similar_positions
@@ -166,8 +437,7 @@ class VLMAgent:
         如果屏幕分辨率较小（如1920x1080或更小），则不缩放，使用原始分辨率
         如果屏幕分辨率较大，则缩放到1024以减少API调用数据量
         """
-        max_dimension = max(self.screen_width, self.screen_height)
-        return max_dimension > 1920
+        return self._max_dim > 1920
     
     def capture_screenshot(self):
         """
@@ -175,6 +445,203 @@ class VLMAgent:
         """
         return self.screenshot_utils.capture_screenshot(self.coordinate_converter, self.scale_screenshot)
     
+    def capture_screenshot_base64(self):
+        """
+        截取当前屏幕截图并编码为base64字符串
+        """
+        return self.screenshot_utils.capture_screenshot_base64(self.coordinate_converter, self.scale_screenshot)
+    
+    def _settle_and_capture(self, delay):
+        """
+        等待操作生效后截图并编码，在后台线程中执行
+        """
+        time.sleep(delay)
+        result = self.capture_screenshot_base64()
+        self._last_capture = (time.monotonic(), result)
+        return result
+    
+    def _take_screenshot(self):
+        """
+        获取本步骤的截图：有后台预取的截图时直接取结果（截图异常在此处重新抛出），否则同步截图
+        """
+        future, self._screenshot_future = self._screenshot_future, None
+        if future is not None:
+            return future.result()
+        result = self.capture_screenshot_base64()
+        self._last_capture = (time.monotonic(), result)
+        return result
+    
+    def _recent_screenshot(self, max_age=0.5):
+        """
+        暂停恢复后获取截图：距上次截图不超过 max_age 秒时直接复用，省去重新截图和编码，否则重新截图
+        """
+        last_capture = self._last_capture
+        if last_capture is not None and time.monotonic() - last_capture[0] <= max_age:
+            return last_capture[1]
+        return self._take_screenshot()
+    
+    def _trim_message_window(self, window=_MESSAGE_WINDOW, slack=_MESSAGE_WINDOW_SLACK):
+        """
+        限制发送给模型的消息数，使每次请求的大小不随步骤数增长
+        消息超过 window + slack 条时只保留最近 window 条，更早的消息每条压缩为一行，
+        放在系统prompt之后的摘要消息中。系统prompt保持不变，且不是每一步都裁剪，
+        请求的开头在多个步骤间保持一致，服务端的前缀缓存可以生效
+        """
+        head = 1 if self._summary_message is None else 2
+        if len(self.messages) - head <= window + slack:
+            return
+        start = len(self.messages) - window
+        # 窗口从用户消息开始
+        while start < len(self.messages) and self.messages[start]["role"] == "assistant":
+            start += 1
+        
+        summary = self._history_summary
+        summary.extend(_summarize_message(message) for message in self.messages[head:start])
+        if len(summary) > _SUMMARY_MAX_LINES:
+            # 第一行是任务描述，始终保留
+            del summary[1:len(summary) - _SUMMARY_MAX_LINES + 1]
+        
+        self._summary_message = {"role": "user", "content": "历史摘要:\n" + "\n".join(summary)}
+        self.messages = [self.messages[0], self._summary_message] + self.messages[start:]
+    
+    def _prune_old_screenshots(self, keep=_KEPT_SCREENSHOTS):
+        """
+        将较早消息中的截图替换为文字占位，只保留最近 keep 条带截图的消息，减少每次请求上传的数据量
+        """
+        kept = 0
+        for message in reversed(self.messages):
+            content = message["content"]
+            if message["role"] != "user" or isinstance(content, str):
+                continue
+            has_image = False
+            for part in content:
+                if part.get("type") == "image_url":
+                    if kept >= keep:
+                        part.clear()
+                        part.update({"type": "text", "text": _PRUNED_SCREENSHOT_TEXT})
+                    else:
+                        has_image = True
+            if has_image:
+                kept += 1
+    
+    def _append_screenshot_message(self, text, base64_image):
+        """
+        将带截图的用户消息加入消息历史，并记为最近一次发给模型的截图
+        :param text: 文字说明
+        :param base64_image: base64编码的截图
+        """
+        message = {
+            "role": "user",
+            "content": _screenshot_content(text, f"data:{self.screenshot_utils.mime_type};base64,{base64_image}")
+        }
+        self.messages.append(message)
+        self._last_sent_image = base64_image
+        self._last_image_message = message
+    
+    def _last_image_in_window(self):
+        """
+        上一张截图所在的消息是否仍在消息历史中，且加入本步消息并裁剪窗口后仍会保留
+        截图被裁剪掉后需要重新上传，否则模型看不到当前屏幕
+        """
+        message = self._last_image_message
+        if message is None:
+            return False
+        # 加入本步消息后裁剪只保留最近 _MESSAGE_WINDOW 条，窗口起点还可能因跳过模型消息后移一条
+        oldest_kept = max(len(self.messages) + 2 - _MESSAGE_WINDOW, 0)
+        return any(self.messages[index] is message for index in range(oldest_kept, len(self.messages)))
+    
+    def _request_completion(self):
+        """
+        调用模型获取响应
+        流式接收时，每收到一个闭合的 <|tool_call|>...<|tool_call|> 工具调用就提交到工具线程执行，
+        与后续内容的生成重叠；暂停和完成任务调用及其后的调用留到响应接收完后再处理。
+        流式请求失败且还没有提交任何工具调用时改用普通请求；已提交过工具调用时，
+        先把已接收的部分响应和这些调用的执行结果记入消息历史再抛出异常，已执行的操作不会从历史中丢失
+        :return: (response_text, early_calls)，early_calls 为提前提交的 [(工具调用, Future), ...]
+        """
+        early_calls = []
+        if self.stream_tool_calls:
+            try:
+                stream = self.client.chat.completions.create(
+                    model=self.model_name,
+                    messages=self.messages,
+                    temperature=0.3,
+                    max_tokens=1024,
+                    stream=True
+                )
+                chunks = []
+                dispatching = True
+                for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if not delta:
+                        continue
+                    chunks.append(delta)
+                    # 只有收到标签结尾时才可能有新闭合的工具调用
+                    if dispatching and '>' in delta:
+                        dispatching = self._dispatch_closed_tool_calls("".join(chunks), early_calls)
+                return "".join(chunks), early_calls
+            except Exception as e:
+                if early_calls:
+                    partial_text = "".join(chunks)
+                    tool_result = "\n".join(self._early_call_results(early_calls))
+                    self.messages.append({
+                        "role": "assistant",
+                        "content": partial_text
+                    })
+                    self._last_response = partial_text
+                    self.messages.append({
+                        "role": "user",
+                        "content": f"工具执行结果:\n{tool_result}"
+                    })
+                    self._log(f"流式请求在提交工具调用后失败，已记录已执行的工具调用结果: {e}")
+                    raise
+                self._log(f"流式请求失败，改用普通请求: {e}")
+        
+        response = self.client.chat.completions.create(
+            model=self.model_name,
+            messages=self.messages,
+            temperature=0.3,
+            max_tokens=1024
+        )
+        return response.choices[0].message.content, early_calls
+    
+    def _dispatch_closed_tool_calls(self, partial_text, early_calls):
+        """
+        将已闭合且尚未提交的工具调用提交到工具线程
+        :return: 是否继续提前提交；遇到暂停或完成任务调用后返回False
+        """
+        closed_calls = self.tool_utils.parse_closed_tool_calls(partial_text)
+        for call in closed_calls[len(early_calls):]:
+            if call['name'] in ('pause_task', 'complete_task'):
+                return False
+            early_calls.append((call, self._tool_pool.submit(self.tool_utils.execute_tool_calls, [call])))
+        return True
+    
+    def _early_call_results(self, early_calls):
+        """
+        等待提前提交的工具调用执行完毕
+        :return: 各调用的执行结果列表
+        """
+        return [future.result() for _, future in early_calls]
+    
+    def _execute_tool_calls(self, tool_calls, early_calls):
+        """
+        执行工具调用：提前提交的调用等待其结果，其余调用按顺序执行
+        :return: 执行结果字符串，与一次执行全部调用的结果相同
+        """
+        results = self._early_call_results(early_calls)
+        executed_calls = [call for call, _ in early_calls]
+        remaining = tool_calls[len(executed_calls):]
+        if executed_calls != tool_calls[:len(executed_calls)]:
+            # 提前解析的调用应当是完整解析结果的前缀，不一致时只执行尚未执行过的调用
+            logging.warning("流式解析的工具调用与完整响应的解析结果不一致")
+            remaining = [call for call in tool_calls if call not in executed_calls]
+        if remaining:
+            results.append(self.tool_utils.execute_tool_calls(remaining))
+        return "\n".join(results)
+    
     def encode_image_to_base64(self, image_buffer):
         """
         将图片编码为base64字符串
@@ -223,60 +690,12 @@ class VLMAgent:
                 args = call['arguments']
                 
                 try:
-                    if tool_name == "mouse_click":
-                        x = args.get('x', 0.5)
-                        y = args.get('y', 0.5)
-                        button = args.get('button', 'left')
-                        clicks = args.get('clicks', 1)
-                        move_first = args.get('move_first', True)
-                        result = self.tool_utils.mouse_click(x, y, button, clicks, move_first=move_first)
-                    elif tool_name == "type_text":
-                        x = args.get('x', 0.5)
-                        y = args.get('y', 0.5)
-                        text = args.get('text', '')
-                        result = self.type_text(x, y, text)
-                    elif tool_name == "scroll_window":
-                        x = args.get('x', 0.5)
-                        y = args.get('y', 0.5)
-                        direction = args.get('direction', 'up')
-                        result = self.scroll_window(x, y, direction)
-                    elif tool_name == "close_window":
-                        x = args.get('x', 0.5)
-                        y = args.get('y', 0.5)
-                        result = self.close_window(x, y)
-                    elif tool_name == "press_windows_key":
-                        result = self.press_windows_key()
-                    elif tool_name == "press_enter":
-                        result = self.press_enter()
-                    elif tool_name == "delete_text":
-                        x = args.get('x', 0.5)
-                        y = args.get('y', 0.5)
-                        count = args.get('count', 1)
-                        result = self.delete_text(x, y, count)
-                    elif tool_name == "mouse_drag":
-                        start_x = args.get('start_x', 0.5)
-                        start_y = args.get('start_y', 0.5)
-                        end_x = args.get('end_x', 0.5)
-                        end_y = args.get('end_y', 0.5)
-                        duration = args.get('duration', 0.5)
-                        result = self.mouse_drag(start_x, start_y, end_x, end_y, duration)
-                    elif tool_name == "wait":
-                        seconds = args.get('seconds', 1)
-                        result = self.wait(seconds)
-                    elif tool_name == "open_terminal":
-                        command = args.get('command', '')
-                        result = self.open_terminal(command)
-                    elif tool_name == "press_hotkey":
-                        x = args.get('x', 0.5)
-                        y = args.get('y', 0.5)
-                        hotkey = args.get('hotkey', '')
-                        result = self.press_hotkey(x, y, hotkey)
-                    elif tool_name == "clear_input":
-                        x = args.get('x', 0.5)
-                        y = args.get('y', 0.5)
-                        result = self.clear_input(x, y)
-                    else:
+                    entry = self._tool_table.get(tool_name)
+                    if entry is None:
                         result = f"未知工具: {tool_name}"
+                    else:
+                        handler, params = entry
+                        result = handler(**{name: args.get(name, default) for name, default in params})
                     
                     results.append(result)
                 except Exception as e:
@@ -293,43 +712,26 @@ class VLMAgent:
         :param max_steps: 最大执行步骤数
         :param step_callback: 步骤回调函数，用于向GUI报告每个步骤
         """
-        print(f"开始执行任务: {task_description}")
-        print(f"屏幕分辨率: {self.screen_width} x {self.screen_height}")
+        self._log(f"开始执行任务: {task_description}")
+        self._log(f"屏幕分辨率: {self.screen_width} x {self.screen_height}")
         
         # 添加系统提示词(这个提示词，需要ai修正。。。)
         # 获取操作历史和动态调整信息
         operation_history_summary = self.get_operation_history_summary()
-        successful_positions_info = self.last_successful_positions if self.last_successful_positions else {}
+        successful_positions_info = {op: list(positions) for op, positions in self.last_successful_positions.items()}
         dynamic_adjustment_info = "如果当前操作与历史操作类型相同且位置相近，请参考上次成功位置进行微调。如果之前操作失败，请尝试调整坐标位置。"
         
         # 动态获取相关平台和系统prompt (RAG功能保持不变)
         combined_prompt = ""
         if self.prompt_manager:
             try:
-                # 分析任务描述，识别关键词
-                task_lower = task_description.lower()
-                applicant_keywords = []
-                system_keywords = []
-                
-                # 应用关键词检测
-                if any(word in task_lower for word in ["抖音", "douyin", "短视频"]):
-                    applicant_keywords.append("抖音")
-                if any(word in task_lower for word in ["快手", "kuaishou"]):
-                    applicant_keywords.append("快手")
-                if any(word in task_lower for word in ["excel", "电子表格", "表格", "spreadsheet", "微软表格"]):
-                    applicant_keywords.append("excel")
-                
-                # 系统关键词检测
-                if any(word in task_lower for word in ["windows", "win", "微软"]):
-                    system_keywords.append("Windows")
-                if any(word in task_lower for word in ["linux", "ubuntu", "centos"]):
-                    system_keywords.append("Linux")
+                # 分析任务描述，识别应用和系统关键词
+                applicant_keywords, system_keywords = _match_task_keywords(task_description.lower())
                 
-                # 获取当前操作系统
-                current_system = platform.system()
-                if current_system.lower() == "windows":
+                # 当前操作系统
+                if self._system == "windows":
                     system_keywords.append("Windows")
-                elif current_system.lower() == "linux":
+                elif self._system == "linux":
                     system_keywords.append("Linux")
                 
                 # 获取组合的prompt
@@ -339,87 +741,87 @@ class VLMAgent:
                 )
                 
                 if combined_prompt:
-                    print("已加载相关应用和系统专用prompt")
+                    self._log("已加载相关应用和系统专用prompt")
                 else:
                     combined_prompt = ""
                     
             except Exception as e:
-                print(f"获取prompt时出错: {e}")
+                self._log(f"获取prompt时出错: {e}")
                 combined_prompt = ""
         
-        # 从txt文件读取基础prompt
+        # 基础prompt模板在初始化时已读取，这里只替换变量
         try:
-            current_system = platform.system().lower()
-            if current_system == "windows":
-                prompt_file_path = os.path.join(os.path.dirname(__file__), "prompts", "windows.txt")
-            elif current_system == "linux":
-                prompt_file_path = os.path.join(os.path.dirname(__file__), "prompts", "linux.txt")
-            else:
-                # 默认使用Windows prompt
-                prompt_file_path = os.path.join(os.path.dirname(__file__), "prompts", "windows.txt")
-            
-            if os.path.exists(prompt_file_path):
-                with open(prompt_file_path, 'r', encoding='utf-8') as f:
-                    base_prompt_content = f.read()
-                # 替换变量
-                base_prompt_content = base_prompt_content.format(
+            prompt_file_path = self._base_prompt_path
+            if self._base_prompt_template is not None:
+                base_prompt_content = self._base_prompt_template.format(
                     screen_width=self.screen_width,
                     screen_height=self.screen_height
                 )
-                print(f"已从 {prompt_file_path} 加载系统专用prompt")
+                self._log(f"已从 {prompt_file_path} 加载系统专用prompt")
             else:
-                print(f"Prompt文件不存在: {prompt_file_path}")
+                self._log(f"Prompt文件不存在: {prompt_file_path}")
                 base_prompt_content = ""
                 
         except Exception as e:
-            print(f"读取prompt文件时出错: {e}")
+            self._log(f"读取prompt文件时出错: {e}")
             base_prompt_content = ""
         
+        # 不随任务变化的基础prompt放在最前面，随任务变化的内容放在后面，
+        # 不同任务的请求开头相同，服务端的前缀缓存可以生效
         system_prompt = f"""
+{base_prompt_content}
+
+{combined_prompt}
+
 操作历史信息：
 最近操作历史: {operation_history_summary}
 上次成功操作位置参考: {successful_positions_info}
 动态调整建议: {dynamic_adjustment_info}
-{combined_prompt}
-
-{base_prompt_content}
         """.strip()
         
         self.messages = [
             {"role": "system", "content": system_prompt}
         ]
+        self._summary_message = None
+        self._history_summary = []
         
+        # 丢弃上一次任务遗留的预取截图和截图记录
+        self._screenshot_future = None
+        self._last_capture = None
+        self._last_sent_image = None
+        self._last_image_message = None
+        # 最近一条模型回复，任务结束时直接返回，不必反向查找消息列表
+        self._last_response = None
         step = 0
         while step < max_steps:
             step += 1
-            print(f"\n========== 步骤 {step} 开始 ==========")
+            self._log(f"\n========== 步骤 {step} 开始 ==========")
             
             try:
                 # 获取屏幕截图
-                print("正在获取屏幕截图...")
+                self._log("正在获取屏幕截图...")
                 try:
-                    screenshot_buffer, original_width, original_height, scaled_width, scaled_height = self.capture_screenshot()
-                    base64_image = self.encode_image_to_base64(screenshot_buffer)
+                    base64_image, original_width, original_height, scaled_width, scaled_height = self._take_screenshot()
                     if self.scale_screenshot:
-                        print(f"屏幕截图获取完成，原始尺寸: {original_width}x{original_height}, 已缩放至: {scaled_width}x{scaled_height}")
+                        self._log(f"屏幕截图获取完成，原始尺寸: {original_width}x{original_height}, 已缩放至: {scaled_width}x{scaled_height}")
                     else:
-                        print(f"屏幕截图获取完成，使用原始分辨率: {original_width}x{original_height}")
+                        self._log(f"屏幕截图获取完成，使用原始分辨率: {original_width}x{original_height}")
                 except PermissionError as e:
                     # 屏幕截图权限错误处理
-                    print(f"❌ {str(e)}")
+                    self._log(f"❌ {str(e)}")
                     
                     # 使用语音提示用户
                     try:
                         if self.voice_utils:
                             self.voice_utils.speak("屏幕截图失败，任务已暂停。请手动处理后继续。")
-                            print("🔊 语音提示已播放")
+                            self._log("🔊 语音提示已播放")
                     except Exception as voice_error:
-                        print(f"⚠️ 语音提示播放失败: {voice_error}")
+                        self._log(f"⚠️ 语音提示播放失败: {voice_error}")
                     
-                    print("\n" + "="*50)
-                    print("⏸️  任务已自动变为暂停状态")
-                    print("💡 请手动处理屏幕截图问题后，任务将在任务列表中等待您继续")
-                    print("="*50)
+                    self._log("\n" + "="*50)
+                    self._log("⏸️  任务已自动变为暂停状态")
+                    self._log("💡 请手动处理屏幕截图问题后，任务将在任务列表中等待您继续")
+                    self._log("="*50)
                     
                     # 记录失败操作
                     self.record_operation("screenshot", {"error": str(e)}, False, "屏幕截图失败，任务暂停")
@@ -432,7 +834,7 @@ class VLMAgent:
                     raise
                 except Exception as e:
                     # 其他截图相关错误
-                    print(f"❌ 屏幕截图过程中发生其他错误: {str(e)}")
+                    self._log(f"❌ 屏幕截图过程中发生其他错误: {str(e)}")
                     
                     # 记录失败操作
                     self.record_operation("screenshot", {"error": str(e)}, False, "屏幕截图其他错误")
@@ -442,95 +844,64 @@ class VLMAgent:
                 
                 # 构造消息
                 if step == 1:
-                    content = [
-                        {"type": "text", "text": f"请完成以下任务: {task_description}"},
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/png;base64,{base64_image}"
-                            }
-                        }
-                    ]
-                    print("任务描述: " + f"请完成以下任务: {task_description}")
+                    task_text = f"请完成以下任务: {task_description}"
+                    self._append_screenshot_message(task_text, base64_image)
+                    self._log("任务描述: " + task_text)
+                elif base64_image == self._last_sent_image and self._last_image_in_window():
+                    # 屏幕没有变化，上一张截图仍在消息窗口中，只发送文字说明
+                    self.messages.append({
+                        "role": "user",
+                        "content": [
+                            {"type": "text", "text": "屏幕与上一张截图相同，没有变化，请继续完成任务"}
+                        ]
+                    })
+                    self._log("继续执行任务，屏幕与上一张截图相同，不重复上传截图")
                 else:
-                    content = [
-                        {"type": "text", "text": "这是当前屏幕状态，请继续完成任务"},
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/png;base64,{base64_image}"
-                            }
-                        }
-                    ]
-                    print("继续执行任务，上次操作后需要继续")
-                
-                self.messages.append({
-                    "role": "user",
-                    "content": content
-                })
+                    self._append_screenshot_message("这是当前屏幕状态，请继续完成任务", base64_image)
+                    self._log("继续执行任务，上次操作后需要继续")
                 
                 # 记录模型调用前的消息历史
-                print(f"\n模型调用前的消息历史: {len(self.messages)} 条消息")
+                self._log(f"\n模型调用前的消息历史: {len(self.messages)} 条消息")
                 for i, msg in enumerate(self.messages[-3:]):  # 只显示最近3条消息
                     role = msg["role"]
-                    content_preview = str(msg["content"])[:100] + "..." if len(str(msg["content"])) > 100 else str(msg["content"])
-                    print(f"  消息 {len(self.messages)-3+i+1}: {role}: {content_preview}")
+                    content_preview = _preview_content(msg["content"])
+                    self._log(f"  消息 {len(self.messages)-3+i+1}: {role}: {content_preview}")
                 
-                print(f"\n正在调用模型: {self.model_name}")
-                print(f"模型参数: temperature=0.3, max_tokens=1024")
+                self._log(f"\n正在调用模型: {self.model_name}")
+                self._log(f"模型参数: temperature=0.3, max_tokens=1024")
                 
                 # 调用模型前检查暂停状态
                 if self.check_and_handle_pause(step_callback, step):
-                    # 暂停后已恢复，重新获取截图
-                    screenshot_buffer, original_width, original_height, scaled_width, scaled_height = self.capture_screenshot()
-                    base64_image = self.encode_image_to_base64(screenshot_buffer)
-                    content = [
-                        {"type": "text", "text": "用户已完成操作，请继续执行任务"},
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/png;base64,{base64_image}"
-                            }
-                        }
-                    ]
-                    self.messages.append({
-                        "role": "user",
-                        "content": content
-                    })
-                    print(f"重新构建消息，准备再次调用模型...")
+                    # 暂停后已恢复，刚截过图时直接复用，否则重新获取截图
+                    base64_image, original_width, original_height, scaled_width, scaled_height = self._recent_screenshot()
+                    self._append_screenshot_message("用户已完成操作，请继续执行任务", base64_image)
+                    self._log(f"重新构建消息，准备再次调用模型...")
                 
-                # 调用模型
-                response = self.client.chat.completions.create(
-                    model=self.model_name,
-                    messages=self.messages,
-                    temperature=0.3,
-                    max_tokens=1024
-                )
+                # 只发送最近的消息和截图，更早的消息压缩为摘要，旧截图替换为文字占位
+                self._trim_message_window()
+                self._prune_old_screenshots()
                 
-                response_text = response.choices[0].message.content
+                # 调用模型，流式接收时已闭合的工具调用会提前开始执行
+                response_text, early_calls = self._request_completion()
                 self.messages.append({
                     "role": "assistant",
                     "content": response_text
                 })
+                self._last_response = response_text
                 
-                print(f"\n模型响应完成:")
-                print(f"响应长度: {len(response_text)} 字符")
-                print("="*60)
-                print("模型响应:")
-                print(response_text)
-                print("="*60)
+                self._log(f"\n模型响应完成:")
+                self._log(f"响应长度: {len(response_text)} 字符")
+                self._log("="*60)
+                self._log("模型响应:")
+                self._log(response_text)
+                self._log("="*60)
                 
                 # 如果有回调函数，向GUI报告当前步骤
                 if step_callback:
                     # 提取模型响应中的主要操作描述
-                    lines = response_text.strip().split('\n')
-                    step_description = ""
-                    for line in lines:
-                        line = line.strip()
-                        # 跳过工具调用行，只找描述性文本
-                        if line and not line.startswith('<|tool_call|>') and not line.startswith('工具执行结果'):
-                            step_description = line
-                            break
+                    # 跳过工具调用行，只找第一行描述性文本
+                    description_match = _STEP_DESCRIPTION_RE.search(response_text)
+                    step_description = description_match.group(1).strip() if description_match else ""
                     
                     # 如果没有找到描述性文本，使用默认描述
                     if not step_description:
@@ -548,28 +919,29 @@ class VLMAgent:
                 # ModelManager.last_vision_result = response_text
                 
                 # 解析并执行工具调用
-                print(f"\n开始解析工具调用...")
-                print(f"原始响应文本: {repr(response_text)}")
+                self._log(f"\n开始解析工具调用...")
+                self._log(f"原始响应文本: {repr(response_text)}")
                 
                 tool_calls = self.tool_utils.parse_tool_calls(response_text)
-                print(f"工具调用解析完成，结果: {len(tool_calls)} 个工具调用")
+                self._log(f"工具调用解析完成，结果: {len(tool_calls)} 个工具调用")
                 
-                if tool_calls:
-                    print("\n检测到工具调用:")
+                # 完整解析没有得到工具调用时，提前提交的调用也已经执行，同样需要收集结果
+                if tool_calls or early_calls:
+                    self._log("\n检测到工具调用:")
                     for i, call in enumerate(tool_calls):
-                        print(f"  工具调用 {i+1}: {call['name']}({', '.join([f'{k}={v}' for k, v in call['arguments'].items()])})")
+                        self._log(f"  工具调用 {i+1}: {call['name']}({', '.join([f'{k}={v}' for k, v in call['arguments'].items()])})")
                     
-                    print(f"\n开始执行工具调用...")
+                    self._log(f"\n开始执行工具调用...")
                     try:
-                        tool_result = self.tool_utils.execute_tool_calls(tool_calls)
-                        print(f"工具执行结果:")
-                        print(tool_result)
+                        tool_result = self._execute_tool_calls(tool_calls, early_calls)
+                        self._log(f"工具执行结果:")
+                        self._log(tool_result)
                         
                         # 检查是否有暂停或完成任务调用
                         for call in tool_calls:
                             if call['name'] == 'pause_task':
                                 reason = call['arguments'].get('reason', '用户手动操作')
-                                print(f"检测到暂停任务调用: {reason}")
+                                self._log(f"检测到暂停任务调用: {reason}")
                                 
                                 # 通知GUI暂停
                                 if self.step_update_callback:
@@ -579,37 +951,19 @@ class VLMAgent:
                                         pass
                                 
                                 # 等待GUI继续按钮
-                                if self.pause_event:
-                                    print("⏳ 等待用户操作完成后点击'继续'...")
-                                    self.pause_event.wait()
-                                    self.pause_event.clear()
-                                    print("✅ 用户已点击继续，继续执行任务")
+                                self._wait_for_resume()
                                 
                                 # 获取新的屏幕截图，继续执行任务
-                                screenshot_buffer, original_width, original_height, scaled_width, scaled_height = self.capture_screenshot()
-                                base64_image = self.encode_image_to_base64(screenshot_buffer)
-                                
-                                content = [
-                                    {"type": "text", "text": f"用户已完成{reason}操作，请继续执行任务"},
-                                    {
-                                        "type": "image_url",
-                                        "image_url": {
-                                            "url": f"data:image/png;base64,{base64_image}"
-                                        }
-                                    }
-                                ]
+                                base64_image, original_width, original_height, scaled_width, scaled_height = self.capture_screenshot_base64()
                                 
-                                self.messages.append({
-                                    "role": "user",
-                                    "content": content
-                                })
+                                self._append_screenshot_message(f"用户已完成{reason}操作，请继续执行任务", base64_image)
                                 
                                 # 重新发送请求给模型，继续执行
                                 continue
                                 
                             elif call['name'] == 'complete_task':
                                 message = call['arguments'].get('message', '任务已完成')
-                                print(f"检测到完成任务调用: {message}")
+                                self._log(f"检测到完成任务调用: {message}")
                                 
                                 # 通知GUI任务完成
                                 if self.step_update_callback:
@@ -619,13 +973,14 @@ class VLMAgent:
                                         pass
                                 
                                 # 任务完成，退出循环
-                                print("✅ 任务已完成")
+                                self._log("✅ 任务已完成")
                                 return f"任务已完成: {message}"
                                 
+                    except TaskAborted:
+                        raise
                     except Exception as e:
-                        print(f"工具执行失败: {str(e)}")
-                        import traceback
-                        print(f"错误详情: {traceback.format_exc()}")
+                        self._log(f"工具执行失败: {str(e)}")
+                        self._log(f"错误详情: {traceback.format_exc()}")
                         tool_result = f"工具执行失败: {str(e)}"
                     
                     # 将工具执行结果添加到消息历史中
@@ -634,17 +989,17 @@ class VLMAgent:
                         "content": f"工具执行结果:\n{tool_result}"
                     })
                     
-                    # 短暂等待，让操作生效
-                    time.sleep(0.5)
+                    # 短暂等待让操作生效，等待和下一步的截图放到后台线程进行
+                    self._screenshot_future = self._io_pool.submit(self._settle_and_capture, 0.5)
                 else:
                     # 没有检测到工具调用，可能任务已完成
-                    print("未检测到工具调用，任务可能已完成")
+                    self._log("未检测到工具调用，任务可能已完成")
                     
                     # 检查是否需要用户手动干预
                     manual_intervention_detected, intervention_type = self.detect_manual_intervention_required(response_text)
                     
                     if manual_intervention_detected:
-                        print(f"检测到需要用户手动干预的操作: {intervention_type}")
+                        self._log(f"检测到需要用户手动干预的操作: {intervention_type}")
                         # 设置手动干预标记，下次模型调用前会检查并暂停
                         self.manual_intervention_detected = True
                         self.pause_reason = intervention_type
@@ -657,27 +1012,23 @@ class VLMAgent:
                                 pass
                         
                         # 等待GUI继续按钮
-                        if self.pause_event:
-                            print("⏳ 等待用户操作完成后点击'继续'...")
-                            self.pause_event.wait()
-                            self.pause_event.clear()
-                            print("✅ 用户已点击继续，继续执行任务")
+                        self._wait_for_resume()
                     else:
-                        print("开始检查是否需要用户输入...")
+                        self._log("开始检查是否需要用户输入...")
                         
                         # 检查是否需要用户输入或帮助
-                        need_user_input = any(keyword in response_text.lower() for keyword in ["需要用户", "请用户", "用户帮忙", "用户操作", "请输入", "请选择", "等待", "请稍候"])
-                        print(f"用户输入检查结果: {need_user_input}")
+                        need_user_input = _NEED_USER_INPUT_RE.search(response_text) is not None
+                        self._log(f"用户输入检查结果: {need_user_input}")
                         
                         if need_user_input:
-                            print("检测到需要用户操作，开始语音提示...")
+                            self._log("检测到需要用户操作，开始语音提示...")
                             # 生成语音提示
                             try:
                                 self.voice_utils.speak_async("需要用户操作，请查看屏幕并完成操作，完成后请点击继续")
                             except Exception as e:
-                                print(f"语音提示失败: {e}")
+                                self._log(f"语音提示失败: {e}")
                             
-                            print("需要用户输入或操作，点击GUI中的'继续'按钮继续执行...")
+                            self._log("需要用户输入或操作，点击GUI中的'继续'按钮继续执行...")
                             
                             # 通知GUI暂停
                             if self.step_update_callback:
@@ -687,35 +1038,17 @@ class VLMAgent:
                                     pass
                             
                             # 等待GUI继续按钮
-                            if self.pause_event:
-                                print("⏳ 等待用户操作完成后点击'继续'...")
-                                self.pause_event.wait()
-                                self.pause_event.clear()
-                                print("✅ 用户已点击继续，继续执行任务")
+                            self._wait_for_resume()
                             
-                            print("用户确认继续，获取新的屏幕截图...")
+                            self._log("用户确认继续，获取新的屏幕截图...")
                             # 用户确认继续后，获取当前屏幕截图
-                            screenshot_buffer, original_width, original_height, scaled_width, scaled_height = self.capture_screenshot()
-                            base64_image = self.encode_image_to_base64(screenshot_buffer)
+                            base64_image, original_width, original_height, scaled_width, scaled_height = self._recent_screenshot()
                             
                             # 发送新截图给模型，继续执行任务
-                            content = [
-                                {"type": "text", "text": "用户已完成操作，请继续执行任务"},
-                                {
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": f"data:image/png;base64,{base64_image}"
-                                    }
-                                }
-                            ]
-                            
-                            self.messages.append({
-                                "role": "user",
-                                "content": content
-                            })
+                            self._append_screenshot_message("用户已完成操作，请继续执行任务", base64_image)
                         else:
                             # 真的没有工具调用，任务可能真的完成了
-                            print("没有检测到工具调用，也没有需要用户操作的提示，任务可能已完成")
+                            self._log("没有检测到工具调用，也没有需要用户操作的提示，任务可能已完成")
                             # 添加消息历史记录
                             self.messages.append({
                                 "role": "user",
@@ -724,82 +1057,35 @@ class VLMAgent:
                             # 移除重复的break语句，保持逻辑清晰
                             break
                     
+            except TaskAborted as e:
+                # 主动中止不是执行错误，不输出错误详情
+                self._log(f"任务已中止: {e}")
+                return "任务已中止"
             except Exception as e:
-                print(f"执行步骤时发生错误: {e}")
-                import traceback
-                print(f"错误详情: {traceback.format_exc()}")
+                self._log(f"执行步骤时发生错误: {e}")
+                self._log(f"错误详情: {traceback.format_exc()}")
                 # 询问用户是否继续
                 return "任务执行失败,可能是缺少额度"
         
-        print(f"\n任务执行完成，共执行 {step} 步")
+        self._log(f"\n任务执行完成，共执行 {step} 步")
         
         # 返回最后一个AI的回复
-        for message in reversed(self.messages):
-            if message["role"] == "assistant":
-                return message["content"]
+        if self._last_response is not None:
+            return self._last_response
         
         return "任务已完成，但没有可用的回复内容"
     
     def detect_manual_intervention_required(self, model_response):
         """检测是否需要用户手动干预（登录/购买等操作）"""
-        # 定义需要手动干预的关键词模式
-        manual_intervention_patterns = [
-            # 登录相关
-            "登录", "login", "sign in", "登陆", "登录验证", "双因子验证", "2fa",
-            "账号", "密码", "用户名", "user", "password", "account",
-            # 支付购买相关
-            "购买", "支付", "pay", "purchase", "付款", "结算", "确认支付", "支付方式",
-            "订单", "下单", "立即购买", "立即支付", "购物车", "结算",
-            # 安全验证相关
-            "验证码", "captcha", "verification code", "验证", "安全验证", "security check",
-            "拖动验证", "滑块验证", "短信验证", "邮箱验证", "人机验证",
-            # 其他需要用户操作
-            "授权", "permission", "权限", "同意", "accept", "确认授权",
-            "实名认证", "身份验证", "银行卡", "身份证", "实名",
-            "邮箱验证", "手机验证", "绑定手机", "绑定邮箱"
-        ]
-        
-        # 将模型响应转换为小写进行匹配
-        response_lower = model_response.lower()
-        
-        for pattern in manual_intervention_patterns:
-            if pattern in response_lower:
-                return True, pattern
-        
-        return False, None
+        # 将模型响应转换为小写进行匹配，同一响应再次检测时直接返回缓存的结果
+        return _detect_manual_intervention(model_response.lower())
     
     def handle_manual_intervention_pause(self, intervention_type, step_callback, step):
         """处理需要用户手动干预的暂停状态"""
         # 记录操作历史
         self.record_operation("manual_intervention", {"type": intervention_type}, False, f"检测到需要手动干预: {intervention_type}")
         
-        # 使用语音提示用户
-        voice_played = False
-        try:
-            if self.voice_utils:
-                voice_message = f"检测到{intervention_type}操作，任务已暂停。请手动完成操作后继续。"
-                print(f"🔊 正在播放语音提示: {voice_message}")
-                self.voice_utils.speak(voice_message)
-                voice_played = True
-                print("🔊 语音提示播放完成")
-        except Exception as voice_error:
-            print(f"⚠️ 语音提示播放失败: {voice_error}")
-        
-        if not voice_played:
-            print("⚠️ 未播放语音提示（可能没有安装语音引擎或初始化失败）")
-        
-        print("\n" + "="*60)
-        print("⏸️  任务已自动变为暂停状态")
-        print(f"💡 检测到需要手动操作: {intervention_type}")
-        print("📝 请手动完成以下操作：")
-        print("   1. 执行登录操作（如输入用户名、密码）")
-        print("   2. 完成支付流程（如确认订单、选择支付方式）")
-        print("   3. 通过安全验证（如输入验证码、完成验证）")
-        print("   4. 其他需要人工操作的步骤")
-        print("🎯 操作完成后，请在任务列表中点击'继续'继续执行任务")
-        print("="*60)
-        
-        # 如果有步骤回调函数，通知暂停状态
+        # 先通知暂停状态，GUI更新不必等语音提示
         if step_callback:
             step_callback(f"需要手动操作: {intervention_type}", "paused")
         
@@ -815,13 +1101,34 @@ class VLMAgent:
             except Exception:
                 pass
         
+        # 使用语音提示用户，语音在后台线程播放，不阻塞暂停流程
+        voice_played = False
+        try:
+            if self.voice_utils:
+                voice_message = f"检测到{intervention_type}操作，任务已暂停。请手动完成操作后继续。"
+                self._log(f"🔊 正在播放语音提示: {voice_message}")
+                self.voice_utils.speak(voice_message)
+                voice_played = True
+                self._log("🔊 语音提示已提交后台播放")
+        except Exception as voice_error:
+            self._log(f"⚠️ 语音提示播放失败: {voice_error}")
+        
+        if not voice_played:
+            self._log("⚠️ 未播放语音提示（可能没有安装语音引擎或初始化失败）")
+        
+        self._log("\n" + "="*60)
+        self._log("⏸️  任务已自动变为暂停状态")
+        self._log(f"💡 检测到需要手动操作: {intervention_type}")
+        self._log("📝 请手动完成以下操作：")
+        self._log("   1. 执行登录操作（如输入用户名、密码）")
+        self._log("   2. 完成支付流程（如确认订单、选择支付方式）")
+        self._log("   3. 通过安全验证（如输入验证码、完成验证）")
+        self._log("   4. 其他需要人工操作的步骤")
+        self._log("🎯 操作完成后，请在任务列表中点击'继续'继续执行任务")
+        self._log("="*60)
+        
         # 等待外部事件触发继续
-        if self.pause_event:
-            print("⏳ 等待用户操作完成后点击'继续'...")
-            self.pause_event.wait()
-            # 重置事件，为下次使用做准备
-            self.pause_event.clear()
-            print("✅ 用户已点击继续，任务继续执行")
+        self._wait_for_resume()
         
         self.is_paused = False
         self.pause_reason = ""